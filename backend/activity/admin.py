@@ -0,0 +1,22 @@
+from django.contrib import admin
+from core.pagination import EstimatedCountPaginator
+from .models import ActivityEvent
+
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'actor', 'verb', 'target_type', 'target_repr', 'project_id', 'institution_id')
+    list_filter = ('verb', 'target_type')
+    list_select_related = ('actor',)
+    search_fields = ('target_repr',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # The log is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ActivityConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'activity'
+
+    def ready(self):
+        from . import recorder, signals  # noqa: F401
+        recorder.connect_signals()
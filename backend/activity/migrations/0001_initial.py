@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:56
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=20)),
+                ('target_type', models.CharField(choices=[('project', 'Project'), ('task', 'Task'), ('comment', 'Comment'), ('evidence', 'Evidence')], max_length=20)),
+                ('target_id', models.BigIntegerField()),
+                ('target_repr', models.CharField(max_length=200)),
+                ('project_id', models.BigIntegerField(blank=True, null=True)),
+                ('institution_id', models.BigIntegerField(blank=True, null=True)),
+                ('diff', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['project_id', '-created_at', '-id'], name='activity_project_feed_idx'), models.Index(fields=['institution_id', '-created_at', '-id'], name='activity_institution_feed_idx'), models.Index(fields=['actor', '-created_at', '-id'], name='activity_actor_feed_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+class ActivityEvent(models.Model):
+    """
+    Append-only record of a change to a project, task, comment or evidence.
+    Rows are never updated: they are written in batches by
+    ``activity.recorder`` and read newest first per project, institution or
+    actor through the ``(scope, created_at, id)`` indexes.
+    """
+    VERBS = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    TARGET_TYPES = [
+        ('project', 'Project'),
+        ('task', 'Task'),
+        ('comment', 'Comment'),
+        ('evidence', 'Evidence'),
+    ]
+
+    # No database constraint: deleting a user must not rewrite their history
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    verb = models.CharField(max_length=20, choices=VERBS)
+    target_type = models.CharField(max_length=20, choices=TARGET_TYPES)
+    target_id = models.BigIntegerField()
+    # Title at the time of the event; the target may be gone
+    target_repr = models.CharField(max_length=200)
+    # Feed scopes, plain ids so history outlives the project or institution
+    project_id = models.BigIntegerField(null=True, blank=True)
+    institution_id = models.BigIntegerField(null=True, blank=True)
+    # {field: [old, new]} for updates
+    diff = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['project_id', '-created_at', '-id'], name='activity_project_feed_idx'),
+            models.Index(fields=['institution_id', '-created_at', '-id'], name='activity_institution_feed_idx'),
+            models.Index(fields=['actor', '-created_at', '-id'], name='activity_actor_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.verb} {self.target_type} {self.target_repr}"
@@ -0,0 +1,162 @@
+"""
+Buffered writer for the activity log.
+
+``record()`` builds an ``ActivityEvent`` and queues it once the surrounding
+transaction commits, so rolled back changes leave no trace. During a request,
+queued events are written with one ``bulk_create`` when the request finishes,
+when ``BUFFER_SIZE`` events are waiting, or on ``flush()``. Outside a request
+(shells, management commands, consumers) nothing flushes at a known point, so
+events are written as soon as their transaction commits; whatever is still
+queued when the process exits is flushed then. The actor is the authenticated
+user of the current request, or the user given to ``acting_as()``.
+"""
+
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import transaction
+from django.utils import timezone
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BUFFER_SIZE': 500,
+}
+
+_buffer = []
+_lock = threading.Lock()
+_request = ContextVar('activity_request', default=None)
+_actor = ContextVar('activity_actor', default=None)
+
+
+def get_activity_setting(name):
+    return getattr(settings, 'ACTIVITY', {}).get(name, DEFAULTS[name])
+
+
+@contextmanager
+def acting_as(user):
+    """Attribute the events recorded in this block to ``user``"""
+    token = _actor.set(user)
+    try:
+        yield
+    finally:
+        _actor.reset(token)
+
+
+def current_actor_id():
+    actor = _actor.get()
+    if actor is not None:
+        return actor.pk
+    request = _request.get()
+    # DRF stores the user it authenticated on the underlying request
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def record(verb, target_type, target_id, target_repr, project_id=None, institution_id=None, diff=None):
+    """Queue an event for writing after the current transaction commits"""
+    from .models import ActivityEvent
+
+    if not get_activity_setting('ENABLED'):
+        return
+    event = ActivityEvent(
+        actor_id=current_actor_id(),
+        verb=verb,
+        target_type=target_type,
+        target_id=target_id,
+        target_repr=str(target_repr)[:200],
+        project_id=project_id,
+        institution_id=institution_id,
+        diff=diff or {},
+        created_at=timezone.now(),
+    )
+    transaction.on_commit(lambda: _append(event))
+
+
+def _append(event):
+    with _lock:
+        _buffer.append(event)
+        full = len(_buffer) >= get_activity_setting('BUFFER_SIZE')
+    if full or not in_request():
+        flush()
+
+
+def pending():
+    with _lock:
+        return len(_buffer)
+
+
+def flush():
+    """Write the queued events; returns how many were written"""
+    from .models import ActivityEvent
+
+    with _lock:
+        events = _buffer[:]
+        _buffer.clear()
+    if not events:
+        return 0
+    try:
+        ActivityEvent.objects.bulk_create(events, batch_size=get_activity_setting('BUFFER_SIZE'))
+    except Exception:
+        # The change itself is committed; losing its log entry must not fail the request
+        logger.exception('Dropped %d activity events', len(events))
+        metrics.increment('activity_events_dropped_total', len(events))
+        return 0
+    metrics.increment('activity_events_written_total', len(events))
+    return len(events)
+
+
+def in_request():
+    """Whether ``ActivityMiddleware`` is handling a request in this thread or task"""
+    return _request.get() is not None
+
+
+def reset():
+    """Discard the queued events"""
+    with _lock:
+        _buffer.clear()
+
+
+class ActivityMiddleware:
+    """Makes the request's user available to ``record()`` as the actor"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+def _request_finished(sender, **kwargs):
+    flush()
+
+
+def connect_signals():
+    request_finished.connect(_request_finished, dispatch_uid='activity.recorder.request_finished')
+    atexit.register(flush)
@@ -0,0 +1,13 @@
+from rest_framework import serializers
+from .models import ActivityEvent
+
+class ActivityEventSerializer(serializers.ModelSerializer):
+    actor_name = serializers.CharField(source='actor.full_name', read_only=True)
+
+    class Meta:
+        model = ActivityEvent
+        fields = [
+            'id', 'actor', 'actor_name', 'verb', 'target_type', 'target_id', 'target_repr',
+            'project_id', 'institution_id', 'diff', 'created_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,106 @@
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from projects.models import Project
+from tasks.models import Task, TaskComment, TaskEvidence
+from .recorder import record
+
+# Fields whose changes are logged, per model
+TRACKED_FIELDS = {
+    Project: ['title', 'description', 'status', 'start_date', 'end_date', 'budget', 'created_by_id'],
+    Task: ['title', 'description', 'status', 'progress', 'assignee_id', 'institution_id', 'due_date', 'project_id'],
+    TaskComment: ['content'],
+    TaskEvidence: ['file_name', 'file_url', 'file_type', 'description'],
+}
+TARGET_TYPES = {
+    Project: 'project',
+    Task: 'task',
+    TaskComment: 'comment',
+    TaskEvidence: 'evidence',
+}
+# Long text is cut short in diffs
+MAX_VALUE_LENGTH = 200
+
+
+def _value(value):
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + '…'
+    return value
+
+
+def previous_values(instance):
+    """Tracked values ``instance`` had before the save being handled, for other post_save receivers"""
+    return getattr(instance, '_activity_previous', None) or {}
+
+
+def _describe(instance):
+    """(target_repr, project_id, institution_id) without loading other rows when possible"""
+    if isinstance(instance, Project):
+        return instance.title, instance.pk, None
+    if isinstance(instance, Task):
+        return instance.title, instance.project_id, instance.institution_id
+    if type(instance).task.is_cached(instance):
+        scope = (instance.task.project_id, instance.task.institution_id)
+    else:
+        scope = Task.objects.filter(pk=instance.task_id).values_list('project_id', 'institution_id').first()
+    project_id, institution_id = scope or (None, None)
+    label = instance.content if isinstance(instance, TaskComment) else instance.file_name
+    return label, project_id, institution_id
+
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=TaskComment)
+@receiver(pre_save, sender=TaskEvidence)
+def activity_saving(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None or instance._state.adding:
+        instance._activity_previous = None
+        return
+    fields = TRACKED_FIELDS[sender]
+    if update_fields is not None:
+        fields = [field for field in fields if field.removesuffix('_id') in update_fields or field in update_fields]
+    previous = sender._base_manager.filter(pk=instance.pk).values(*fields).first() if fields else {}
+    instance._activity_previous = previous
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=TaskComment)
+@receiver(post_save, sender=TaskEvidence)
+def activity_saved(sender, instance, created, **kwargs):
+    if created:
+        diff = {}
+    else:
+        previous = getattr(instance, '_activity_previous', None) or {}
+        diff = {
+            field: [_value(old), _value(getattr(instance, field))]
+            for field, old in previous.items()
+            if old != getattr(instance, field)
+        }
+        if not diff:
+            # Saved without a tracked change (e.g. only updated_at)
+            return
+    target_repr, project_id, institution_id = _describe(instance)
+    record(
+        'created' if created else 'updated', TARGET_TYPES[sender], instance.pk, target_repr,
+        project_id=project_id, institution_id=institution_id, diff=diff,
+    )
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_delete, sender=TaskEvidence)
+def activity_deleted(sender, instance, origin=None, **kwargs):
+    # Rows removed by the cascade of a deleted project or task are covered by its event
+    if isinstance(origin, Model):
+        if origin is not instance:
+            return
+    elif origin is not None and origin.model is not sender:
+        return
+    target_repr, project_id, institution_id = _describe(instance)
+    record(
+        'deleted', TARGET_TYPES[sender], instance.pk, target_repr,
+        project_id=project_id, institution_id=institution_id,
+    )
+
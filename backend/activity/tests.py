@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from institutions.models import Institution
+from projects.models import Project, ProjectAccess
+from tasks.models import Task, TaskComment
+from users.models import User
+from users.views import CustomTokenObtainPairSerializer
+from notifications import dispatch
+from . import recorder
+from .models import ActivityEvent
+
+
+class ActivityRecorderTests(TestCase):
+    def setUp(self):
+        self.addCleanup(recorder.reset)
+        self.addCleanup(dispatch.reset)
+        self.user = User.objects.create_user('worker', role='supervisor')
+        self.institution = Institution.objects.create(name='Inst')
+        self.project = Project.objects.create(title='Project', description='', created_by=self.user)
+        self.task = Task.objects.create(
+            project=self.project, title='Task', description='', institution=self.institution,
+        )
+
+    def test_events_are_written_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with recorder.acting_as(self.user):
+                self.task.status = 'completed'
+                self.task.progress = 100
+                self.task.save()
+        # Outside a request nothing would flush the buffer: written on commit
+        self.assertEqual(recorder.pending(), 0)
+
+        event = ActivityEvent.objects.get()
+        self.assertEqual(event.actor, self.user)
+        self.assertEqual((event.verb, event.target_type, event.target_id), ('updated', 'task', self.task.pk))
+        self.assertEqual(event.diff, {'status': ['initial', 'completed'], 'progress': [0, 100]})
+        self.assertEqual((event.project_id, event.institution_id), (self.project.pk, self.institution.pk))
+
+    def test_request_user_is_the_actor(self):
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        recorder.flush()
+        event = ActivityEvent.objects.get()
+        self.assertEqual((event.actor_id, event.diff), (self.user.pk, {'title': ['Task', 'Renamed']}))
+
+    def test_uncommitted_and_unchanged_saves_are_not_logged(self):
+        # setUp's inserts never commit inside the test transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.save()
+        self.assertEqual(recorder.pending(), 0)
+
+    def test_cascades_are_covered_by_one_event(self):
+        TaskComment.objects.create(task=self.task, author=self.user, content='Looks good')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.delete()
+        recorder.flush()
+        event = ActivityEvent.objects.get()
+        self.assertEqual((event.verb, event.target_type, event.target_repr), ('deleted', 'project', 'Project'))
+
+    def test_requests_buffer_until_full(self):
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                for n in range(3):
+                    TaskComment.objects.create(task=self.task, author=self.user, content=f'Comment {n}')
+            return HttpResponse()
+
+        with override_settings(ACTIVITY={'BUFFER_SIZE': 2}):
+            recorder.ActivityMiddleware(view)(RequestFactory().get('/api/tasks/'))
+            self.assertEqual(ActivityEvent.objects.count(), 2)
+            self.assertEqual(recorder.pending(), 1)
+
+    def test_saves_read_the_previous_row_once(self):
+        assignee = User.objects.create_user('assignee', role='employee')
+        with CaptureQueriesContext(connection) as queries:
+            self.task.assignee = assignee
+            self.task.save()
+        snapshots = [
+            query for query in queries
+            if query['sql'].startswith('SELECT') and '"tasks_task"."id" = ' in query['sql']
+        ]
+        self.assertEqual(len(snapshots), 1)
+        # projects.signals saw the assignee change in that snapshot
+        self.assertTrue(ProjectAccess.objects.filter(user=assignee, project=self.project).exists())
+
+
+class ActivityFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Record the user's version, as the commit would
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.user = User.objects.create_user('reader', role='admin')
+        cls.project = Project.objects.create(title='Project', description='', created_by=cls.user)
+        now = timezone.now()
+        ActivityEvent.objects.bulk_create([
+            ActivityEvent(
+                actor=cls.user, verb='updated', target_type='task', target_id=n, target_repr=f'Task {n}',
+                project_id=cls.project.pk if n % 2 else None, created_at=now - timedelta(minutes=n),
+            )
+            for n in range(1, 31)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_project_feed_pages_by_cursor(self):
+        seen = []
+        url = f'/api/projects/{self.project.pk}/activity/?page_size=4'
+        while url:
+            # The project and one page, never a COUNT
+            with self.assertNumQueries(2):
+                page = self.client.get(url).json()
+            seen += [event['target_id'] for event in page['results']]
+            url = page['next']
+        self.assertEqual(seen, list(range(1, 31, 2)))
+
+    def test_user_feed(self):
+        response = self.client.get(f'/api/users/{self.user.pk}/activity/')
+        results = response.json()['results']
+        self.assertEqual(len(results), 30)
+        self.assertEqual(results[0]['actor_name'], 'reader')
@@ -0,0 +1,19 @@
+from rest_framework.pagination import CursorPagination
+from .models import ActivityEvent
+from .serializers import ActivityEventSerializer
+
+
+class ActivityPagination(CursorPagination):
+    """Keyset pagination: each page seeks on the feed index, however deep"""
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+def activity_feed(request, **scope):
+    """Response with one page of the events matching ``scope``, newest first (?cursor=)"""
+    events = ActivityEvent.objects.filter(**scope).select_related('actor')
+    paginator = ActivityPagination()
+    page = paginator.paginate_queryset(events, request)
+    return paginator.get_paginated_response(ActivityEventSerializer(page, many=True).data)
@@ -1,10 +1,16 @@
 from django.contrib import admin
+from core.pagination import EstimatedCountPaginator
 from .models import ChatMessage
 
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
     list_display = ('sender_name', 'recipient', 'chat_type', 'timestamp', 'is_read')
     list_filter = ('chat_type', 'timestamp', 'is_read')
+    list_select_related = ('sender', 'recipient')
     search_fields = ('content', 'sender__username', 'recipient__username')
     ordering = ('-timestamp',)
     readonly_fields = ('sender_name', 'sender_role', 'timestamp')
+    autocomplete_fields = ('sender', 'recipient')
+    # Large table: no COUNT(*) of the whole table per page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -1,17 +1,43 @@
 import json
+import time
+from urllib.parse import parse_qs
 from asgiref.sync import async_to_sync
 from channels.generic.websocket import WebsocketConsumer
 from django.contrib.auth import get_user_model
+from core import metrics
+from core.instrumentation import instrument_event
+from core.sqlite import writer
 from .models import ChatMessage
+from .presence import presence
 from .serializers import ChatMessageSerializer
+from .throttling import TokenBucket, get_throttle_setting, get_user_buckets
 
 User = get_user_model()
 
 
 class ChatConsumer(WebsocketConsumer):
+    def websocket_connect(self, message):
+        with instrument_event('chat', 'connect'):
+            super().websocket_connect(message)
+
+    def websocket_receive(self, message):
+        with instrument_event('chat', 'receive'):
+            super().websocket_receive(message)
+
     def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = f'chat_{self.room_name}'
+        self.bucket = TokenBucket(
+            get_throttle_setting('CONNECTION_RATE'),
+            get_throttle_setting('CONNECTION_BURST'),
+        )
+        # Heartbeats and typing frames have their own allowance: typing must not use up the messages'
+        self.presence_bucket = TokenBucket(
+            get_throttle_setting('PRESENCE_RATE'),
+            get_throttle_setting('PRESENCE_BURST'),
+        )
+        self.violations = 0
+        self.presence_user = None
 
         # Join room group
         async_to_sync(self.channel_layer.group_add)(
@@ -21,27 +47,82 @@ class ChatConsumer(WebsocketConsumer):
 
         self.accept()
 
+        # Announce presence if we already know who is connecting
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            self.identify(user.pk)
+        else:
+            query = parse_qs(self.scope.get('query_string', b'').decode())
+            self.identify(query.get('user_id', [None])[0])
+        async_to_sync(presence.ensure_running)(self.channel_layer)
+        self.send_presence()
+
     def disconnect(self, close_code):
+        presence.leave(self.room_name, self.channel_name)
+
         # Leave room group
         async_to_sync(self.channel_layer.group_discard)(
             self.room_group_name,
             self.channel_name
         )
 
-    def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message_content = text_data_json['message']
+    def receive(self, text_data=None, bytes_data=None):
+        if text_data is None:
+            return
+
+        if len(text_data.encode()) > get_throttle_setting('MAX_MESSAGE_BYTES'):
+            self.reject('Message too large', 'size')
+            return
+
+        # Throttle before touching the database; frames are small enough to parse first
+        try:
+            text_data_json = json.loads(text_data)
+            frame_type = text_data_json.get('type', 'message')
+            if frame_type == 'message':
+                message_content = text_data_json['message']
+        except (ValueError, AttributeError, KeyError):
+            if not self.bucket.consume():
+                self.reject('Rate limit exceeded', 'connection', self.bucket.retry_after())
+                return
+            self.send(text_data=json.dumps({
+                'error': 'Invalid message format'
+            }))
+            return
+
+        if frame_type != 'message':
+            if not self.presence_bucket.consume():
+                self.reject('Rate limit exceeded', 'presence', self.presence_bucket.retry_after())
+                return
+            self.receive_presence(frame_type, text_data_json)
+            return
+
+        if not self.bucket.consume():
+            self.reject('Rate limit exceeded', 'connection', self.bucket.retry_after())
+            return
+
         sender_id = text_data_json.get('sender_id')
         recipient_id = text_data_json.get('recipient_id')
         chat_type = text_data_json.get('chat_type', 'group')
-        
+
+        user_bucket = get_user_buckets().get(self.get_throttle_key())
+        if not user_bucket.consume():
+            self.reject('Rate limit exceeded', 'user', user_bucket.retry_after())
+            return
+        self.violations = 0
+
+        # Sending a message is a heartbeat and ends the typing indicator
+        self.identify(sender_id)
+        if self.presence_user is not None:
+            presence.set_typing(self.room_name, self.presence_user, False)
+
         try:
             # Get the sender user
             sender = User.objects.get(id=sender_id) if sender_id else None
             recipient = User.objects.get(id=recipient_id) if recipient_id else None
             
-            # Create the message in the database
-            message = ChatMessage.objects.create(
+            # Create the message in the database (through the SQLite writer queue when enabled)
+            message = writer.run(
+                ChatMessage.objects.create,
                 sender=sender,
                 recipient=recipient,
                 content=message_content,
@@ -56,7 +137,8 @@ class ChatConsumer(WebsocketConsumer):
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': serializer.data
+                    'message': serializer.data,
+                    'sent_at': time.time(),
                 }
             )
         except Exception as e:
@@ -65,11 +147,85 @@ class ChatConsumer(WebsocketConsumer):
                 'error': str(e)
             }))
 
+    def receive_presence(self, frame_type, data):
+        """Handle heartbeat, typing and presence query frames without the database"""
+        self.identify(data.get('user_id'))
+        if frame_type == 'typing':
+            if self.presence_user is not None:
+                presence.set_typing(self.room_name, self.presence_user, bool(data.get('typing', True)))
+        elif frame_type == 'presence':
+            self.send_presence()
+        elif frame_type != 'heartbeat':
+            self.send(text_data=json.dumps({
+                'error': 'Unknown frame type'
+            }))
+
+    def identify(self, user_id):
+        """Register the socket with the presence service and refresh its heartbeat"""
+        if self.presence_user is None and user_id:
+            self.presence_user = str(user_id)
+        if self.presence_user is not None:
+            presence.touch(self.room_name, self.channel_name, self.presence_user)
+
+    def send_presence(self):
+        online, typing = presence.room_state(self.room_name)
+        self.send(text_data=json.dumps({
+            'type': 'presence',
+            'online': sorted(online),
+            'typing': sorted(typing),
+        }))
+
+    def get_throttle_key(self):
+        """Identify the user a frame is charged to: the authenticated user, else the client address"""
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user.pk
+        # sender_id is whatever the client says: keyed by it, a client could
+        # drain another user's bucket or rotate ids to dodge the limit
+        client = self.scope.get('client')
+        if client:
+            return f'ip:{client[0]}'
+        return f'channel:{self.channel_name}'
+
+    def reject(self, reason, scope, retry_after=None):
+        """Tell the client a frame was throttled, closing after repeated violations"""
+        metrics.increment('chat_throttled_total', labels={'scope': scope})
+        self.violations += 1
+        if self.violations >= get_throttle_setting('MAX_VIOLATIONS'):
+            metrics.increment('chat_throttle_disconnects_total')
+            self.close(code=4008)
+            return
+
+        payload = {'type': 'error', 'error': reason}
+        if retry_after is not None:
+            payload['retry_after'] = round(retry_after, 3)
+        self.send(text_data=json.dumps(payload))
+
     def chat_message(self, event):
         message = event['message']
 
+        # A client this far behind is not keeping up with the room
+        sent_at = event.get('sent_at')
+        if sent_at is not None:
+            metrics.observe('channels_fanout_lag_seconds', time.time() - sent_at, {'consumer': 'chat'})
+        if sent_at is not None and time.time() - sent_at > get_throttle_setting('OUTBOUND_MAX_LAG'):
+            if get_throttle_setting('OUTBOUND_POLICY') == 'close':
+                metrics.increment('chat_slow_consumer_total', labels={'policy': 'close'})
+                self.close(code=4009)
+                return
+            metrics.increment('chat_slow_consumer_total', labels={'policy': 'drop'})
+            return
+
         # Send message to WebSocket
         self.send(text_data=json.dumps({
             'type': 'message',
             'message': message
         }))
+
+    def presence_diff(self, event):
+        self.send(text_data=json.dumps({
+            'type': 'presence',
+            'joined': event['joined'],
+            'left': event['left'],
+            'typing': event['typing'],
+        }))
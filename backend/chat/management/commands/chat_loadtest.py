@@ -0,0 +1,251 @@
+import asyncio
+import json
+import math
+import random
+import resource
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from channels.testing import WebsocketCommunicator
+from chat.models import ChatMessage
+
+User = get_user_model()
+
+LOAD_MARKER = 'loadtest:'
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    index = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[index]
+
+
+def current_rss_kb():
+    """Resident set size of this process from /proc, in kilobytes"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure chat capacity by driving ChatConsumer from core.asgi with simulated '
+        'WebSocket clients over the in-memory channel layer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help='Number of connected sockets')
+        parser.add_argument('--senders', type=int, help='How many of the clients send messages (default: all)')
+        parser.add_argument('--rate', type=float, default=1.0, help='Messages per second per sender')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to send for')
+        parser.add_argument('--drain', type=float, default=2.0, help='Seconds to wait for in-flight fan-out')
+        parser.add_argument('--room', default='loadtest', help='Chat room to load')
+        parser.add_argument('--throttle', action='store_true', help='Keep CHAT_THROTTLE limits enabled')
+        parser.add_argument('--keep-data', action='store_true', help='Do not delete the generated users and messages')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        layers = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 10000}}}
+        overrides = {'CHANNEL_LAYERS': layers}
+        if not options['throttle']:
+            overrides['CHAT_THROTTLE'] = {
+                'CONNECTION_RATE': 1e9, 'CONNECTION_BURST': 1e9,
+                'USER_RATE': 1e9, 'USER_BURST': 1e9,
+            }
+
+        users, created_ids = self.get_users(options['clients'])
+        try:
+            with override_settings(**overrides):
+                from chat.throttling import reset_user_buckets
+                reset_user_buckets()
+                report = asyncio.run(self.run(users, options))
+        finally:
+            if not options['keep_data']:
+                ChatMessage.objects.filter(content__startswith=LOAD_MARKER).delete()
+                User.objects.filter(id__in=created_ids).delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def get_users(self, count):
+        """Return ``count`` load-test users, creating the missing ones"""
+        usernames = [f'loadtest_{i}' for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        new_users = [User(username=name, first_name='Load', last_name=name.split('_')[1])
+                     for name in usernames if name not in existing]
+        for user in new_users:
+            user.set_unusable_password()
+        User.objects.bulk_create(new_users)
+        users = list(User.objects.filter(username__in=usernames).order_by('id'))
+        created_ids = [user.id for user in users if user.username not in existing]
+        return users, created_ids
+
+    async def run(self, users, options):
+        from core.asgi import application
+
+        room = options['room']
+        senders = options['senders'] if options['senders'] is not None else len(users)
+        rss_start = current_rss_kb()
+        rss_peak = rss_start
+        latencies = []
+        connect_times = []
+        counters = {'sent': 0, 'delivered': 0, 'errors': 0, 'closed': 0}
+        stop = asyncio.Event()
+
+        async def sample_rss():
+            nonlocal rss_peak
+            while not stop.is_set():
+                rss_peak = max(rss_peak, current_rss_kb())
+                await asyncio.sleep(0.25)
+
+        async def connect(user):
+            communicator = WebsocketCommunicator(
+                application,
+                f'/ws/chat/{room}/?user_id={user.id}',
+                headers=[(b'origin', b'http://localhost')],
+            )
+            started = time.perf_counter()
+            connected, _ = await communicator.connect(timeout=30)
+            connect_times.append(time.perf_counter() - started)
+            if not connected:
+                raise RuntimeError(f'Connection refused for {user.username}')
+            return communicator
+
+        async def receive(communicator):
+            # Read the output queue directly; receive_from() cancels the app on timeout
+            while True:
+                try:
+                    event = await asyncio.wait_for(communicator.output_queue.get(), 0.2)
+                except asyncio.TimeoutError:
+                    if stop.is_set():
+                        return
+                    continue
+                if event['type'] == 'websocket.close':
+                    counters['closed'] += 1
+                    return
+                data = json.loads(event.get('text') or '{}')
+                if data.get('type') == 'message':
+                    content = data['message']['content']
+                    if content.startswith(LOAD_MARKER):
+                        sent_at = float(content.rsplit(':', 1)[1])
+                        latencies.append(time.perf_counter() - sent_at)
+                        counters['delivered'] += 1
+                elif 'error' in data:
+                    counters['errors'] += 1
+
+        async def send(communicator, user, deadline):
+            interval = 1 / options['rate']
+            await asyncio.sleep(random.uniform(0, interval))
+            seq = 0
+            while time.perf_counter() < deadline:
+                seq += 1
+                await communicator.send_to(text_data=json.dumps({
+                    'message': f'{LOAD_MARKER}{user.id}:{seq}:{time.perf_counter()}',
+                    'sender_id': user.id,
+                    'chat_type': 'group',
+                }))
+                counters['sent'] += 1
+                await asyncio.sleep(interval)
+
+        monitor = asyncio.ensure_future(sample_rss())
+        connect_started = time.perf_counter()
+        communicators = await asyncio.gather(*(connect(user) for user in users))
+        connect_wall = time.perf_counter() - connect_started
+        rss_connected = current_rss_kb()
+
+        receivers = [asyncio.ensure_future(receive(c)) for c in communicators]
+        send_started = time.perf_counter()
+        deadline = send_started + options['duration']
+        await asyncio.gather(*(
+            send(communicator, user, deadline)
+            for communicator, user in list(zip(communicators, users))[:senders]
+        ))
+        send_wall = time.perf_counter() - send_started
+        await asyncio.sleep(options['drain'])
+        stop.set()
+        await asyncio.gather(*receivers)
+        await monitor
+        rss_end = current_rss_kb()
+        for communicator in communicators:
+            await communicator.disconnect()
+
+        connect_times.sort()
+        latencies.sort()
+        expected = counters['sent'] * len(communicators)
+        return {
+            'clients': len(communicators),
+            'senders': senders,
+            'rate_per_sender': options['rate'],
+            'duration_s': round(send_wall, 3),
+            'connect': {
+                'total_s': round(connect_wall, 3),
+                'p50_ms': self.ms(percentile(connect_times, 50)),
+                'p95_ms': self.ms(percentile(connect_times, 95)),
+                'p99_ms': self.ms(percentile(connect_times, 99)),
+                'max_ms': self.ms(connect_times[-1] if connect_times else None),
+            },
+            'messages': {
+                'sent': counters['sent'],
+                'sent_per_s': round(counters['sent'] / send_wall, 1) if send_wall else 0,
+                'delivered': counters['delivered'],
+                'delivered_per_s': round(counters['delivered'] / send_wall, 1) if send_wall else 0,
+                'delivery_ratio': round(counters['delivered'] / expected, 4) if expected else None,
+                'errors': counters['errors'],
+                'closed': counters['closed'],
+            },
+            'fanout_latency': {
+                'p50_ms': self.ms(percentile(latencies, 50)),
+                'p95_ms': self.ms(percentile(latencies, 95)),
+                'p99_ms': self.ms(percentile(latencies, 99)),
+                'max_ms': self.ms(latencies[-1] if latencies else None),
+            },
+            'rss_kb': {
+                'start': rss_start,
+                'connected': rss_connected,
+                'peak': rss_peak,
+                'end': rss_end,
+            },
+        }
+
+    @staticmethod
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 2)
+
+    def print_report(self, report):
+        connect = report['connect']
+        messages = report['messages']
+        latency = report['fanout_latency']
+        rss = report['rss_kb']
+        self.stdout.write(
+            f"Clients: {report['clients']} ({report['senders']} sending at "
+            f"{report['rate_per_sender']}/s for {report['duration_s']}s)"
+        )
+        self.stdout.write(
+            f"Connect: {connect['total_s']}s total, p50 {connect['p50_ms']}ms, "
+            f"p95 {connect['p95_ms']}ms, p99 {connect['p99_ms']}ms"
+        )
+        self.stdout.write(
+            f"Messages: {messages['sent']} sent ({messages['sent_per_s']}/s), "
+            f"{messages['delivered']} delivered ({messages['delivered_per_s']}/s), "
+            f"delivery ratio {messages['delivery_ratio']}, {messages['errors']} errors"
+        )
+        self.stdout.write(
+            f"Fan-out latency: p50 {latency['p50_ms']}ms, p95 {latency['p95_ms']}ms, "
+            f"p99 {latency['p99_ms']}ms, max {latency['max_ms']}ms"
+        )
+        self.stdout.write(
+            f"RSS: {rss['start']} kB at start, {rss['connected']} kB connected, "
+            f"{rss['peak']} kB peak, {rss['end']} kB at end"
+        )
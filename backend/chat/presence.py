@@ -0,0 +1,224 @@
+"""
+Room presence and typing indicators.
+
+Every worker process tracks the sockets it serves in memory. Heartbeats only
+refresh a timestamp; once per tick the service expires stale entries, sends a
+single diff per changed room to the room group and publishes its view of the
+room to the cache so that any process can answer online-user queries. Nothing
+here reads or writes the database.
+
+Each worker claims one of ``MAX_WORKERS`` slots with ``cache.add`` and writes
+its view of a room under its own slot's key, so workers never overwrite each
+other; readers fetch every slot's key for the room in one ``get_many``.
+"""
+
+import logging
+
+import asyncio
+import threading
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Seconds between diff broadcasts
+    'TICK': 1.0,
+    # A socket without a heartbeat for this long is considered gone
+    'TTL': 30.0,
+    # Typing indicators expire unless refreshed within this many seconds
+    'TYPING_TTL': 5.0,
+    # Worker processes that can publish presence at the same time
+    'MAX_WORKERS': 64,
+}
+
+CACHE_PREFIX = 'chat_presence'
+
+
+def get_presence_setting(name):
+    return getattr(settings, 'CHAT_PRESENCE', {}).get(name, DEFAULTS[name])
+
+
+class PresenceService:
+    """Per-process presence state for chat rooms"""
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        # room -> {channel_name: [user_id, last_seen]}
+        self._sockets = {}
+        # room -> {user_id: expires_at}
+        self._typing = {}
+        # room -> (online, typing) as last broadcast
+        self._broadcast = {}
+        # room -> wall-clock time of the last cache publish
+        self._published = {}
+        self._slot = None
+        self._task = None
+
+    def join(self, room, channel_name, user_id):
+        with self._lock:
+            self._sockets.setdefault(room, {})[channel_name] = [user_id, time.monotonic()]
+
+    def touch(self, room, channel_name, user_id):
+        """Record a heartbeat; the change is picked up on the next tick"""
+        with self._lock:
+            sockets = self._sockets.setdefault(room, {})
+            entry = sockets.get(channel_name)
+            if entry is not None:
+                entry[1] = time.monotonic()
+            else:
+                # Expired while the client was quiet
+                sockets[channel_name] = [user_id, time.monotonic()]
+
+    def leave(self, room, channel_name):
+        with self._lock:
+            sockets = self._sockets.get(room)
+            if not sockets:
+                return
+            entry = sockets.pop(channel_name, None)
+            if entry is not None and not any(uid == entry[0] for uid, _ in sockets.values()):
+                self._typing.get(room, {}).pop(entry[0], None)
+
+    def set_typing(self, room, user_id, typing):
+        with self._lock:
+            if typing:
+                expires = time.monotonic() + get_presence_setting('TYPING_TTL')
+                self._typing.setdefault(room, {})[user_id] = expires
+            else:
+                self._typing.get(room, {}).pop(user_id, None)
+
+    def _state(self, room):
+        online = frozenset(uid for uid, _ in self._sockets.get(room, {}).values())
+        typing = frozenset(uid for uid in self._typing.get(room, {}) if uid in online)
+        return online, typing
+
+    def _expire(self, now):
+        ttl = get_presence_setting('TTL')
+        for room in list(self._sockets):
+            sockets = self._sockets[room]
+            for channel_name, (_, last_seen) in list(sockets.items()):
+                if now - last_seen > ttl:
+                    del sockets[channel_name]
+        for room in list(self._typing):
+            typing = self._typing[room]
+            for user_id, expires in list(typing.items()):
+                if expires < now:
+                    del typing[user_id]
+            if not typing:
+                del self._typing[room]
+
+    def tick(self):
+        """Expire stale state and return ``[(room, diff)]`` for rooms that changed"""
+        diffs = []
+        with self._lock:
+            self._expire(time.monotonic())
+            rooms = set(self._sockets) | set(self._broadcast)
+            states = {room: self._state(room) for room in rooms}
+            for room, (online, typing) in states.items():
+                previous_online, previous_typing = self._broadcast.get(room, (frozenset(), frozenset()))
+                if online == previous_online and typing == previous_typing:
+                    continue
+                diffs.append((room, {
+                    'joined': sorted(online - previous_online),
+                    'left': sorted(previous_online - online),
+                    'typing': sorted(typing),
+                }))
+                if online:
+                    self._broadcast[room] = (online, typing)
+                else:
+                    self._broadcast.pop(room, None)
+            for room in [room for room, sockets in self._sockets.items() if not sockets]:
+                del self._sockets[room]
+
+        self._publish(states, changed={room for room, _ in diffs})
+        for room, diff in diffs:
+            if diff['left']:
+                # The user may still be connected through another worker
+                still_online = self.online_users(room)
+                diff['left'] = [uid for uid in diff['left'] if uid not in still_online]
+        return diffs
+
+    def _claim_slot(self, ttl):
+        """This worker's slot, kept for ``ttl`` more seconds; None if every slot is taken"""
+        if self._slot is not None:
+            key = f'{CACHE_PREFIX}:slot:{self._slot}'
+            if cache.get(key) == self.worker_id:
+                cache.touch(key, ttl)
+                return self._slot
+        self._slot = None
+        for slot in range(get_presence_setting('MAX_WORKERS')):
+            key = f'{CACHE_PREFIX}:slot:{slot}'
+            # add() only succeeds for one worker
+            if cache.add(key, self.worker_id, ttl) or cache.get(key) == self.worker_id:
+                self._slot = slot
+                return slot
+        logger.warning('No free presence slot; raise CHAT_PRESENCE MAX_WORKERS')
+        return None
+
+    def _publish(self, states, changed):
+        """Share this worker's view of each room through the cache"""
+        ttl = get_presence_setting('TTL')
+        now = time.time()
+        rooms = [
+            room for room in states
+            if room in changed or now - self._published.get(room, 0) >= ttl / 2
+        ]
+        if not rooms:
+            return
+        slot = self._claim_slot(ttl)
+        if slot is None:
+            return
+        for room in rooms:
+            online, typing = states[room]
+            key = f'{CACHE_PREFIX}:{room}:{slot}'
+            if online:
+                # Expires with the slot at the latest, so a worker taking it over never shows stale users
+                cache.set(key, {'worker': self.worker_id, 'online': list(online), 'typing': list(typing)}, ttl)
+                self._published[room] = now
+            else:
+                cache.delete(key)
+                self._published.pop(room, None)
+
+    def online_users(self, room):
+        """User ids connected to ``room`` on any worker"""
+        online, _ = self.room_state(room)
+        return online
+
+    def room_state(self, room):
+        """Return ``(online, typing)`` sets for ``room`` across all workers"""
+        with self._lock:
+            online, typing = self._state(room)
+        online, typing = set(online), set(typing)
+        keys = [f'{CACHE_PREFIX}:{room}:{slot}' for slot in range(get_presence_setting('MAX_WORKERS'))]
+        for snapshot in cache.get_many(keys).values():
+            if snapshot['worker'] == self.worker_id:
+                continue
+            online.update(snapshot['online'])
+            typing.update(snapshot['typing'])
+        return online, typing
+
+    async def ensure_running(self, channel_layer):
+        """Start the broadcast loop on the server's event loop if it is not running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(channel_layer))
+
+    async def _run(self, channel_layer):
+        while True:
+            await asyncio.sleep(get_presence_setting('TICK'))
+            diffs = await sync_to_async(self.tick, thread_sensitive=False)()
+            for room, diff in diffs:
+                await channel_layer.group_send(f'chat_{room}', {
+                    'type': 'presence_diff',
+                    'room': room,
+                    **diff,
+                })
+            if not self._sockets and not self._broadcast:
+                break
+
+
+presence = PresenceService()
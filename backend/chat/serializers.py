@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from core.fastread import Computed, ValuesSerializer, full_name
 from .models import ChatMessage
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -13,4 +15,25 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             'recipient_name', 'content', 'chat_type', 'timestamp', 'is_read'
         ]
         read_only_fields = ['id', 'sender', 'timestamp']
-        
\ No newline at end of file
+        
+
+
+def _recipient_name(row, context):
+    if row['recipient'] is None:
+        # Like DRF, which leaves out a dotted source through an empty relation
+        raise SkipField()
+    return full_name(row['recipient__first_name'], row['recipient__last_name'], row['recipient__username'])
+
+class ChatMessageValuesSerializer(ValuesSerializer):
+    """values()-based ``ChatMessageSerializer`` for list responses"""
+    serializer_class = ChatMessageSerializer
+    computed = {
+        'sender_name': Computed(
+            ['sender__first_name', 'sender__last_name', 'sender__username'],
+            lambda row, context: full_name(row['sender__first_name'], row['sender__last_name'], row['sender__username']),
+        ),
+        'sender_role': Computed(['sender__role'], lambda row, context: row['sender__role']),
+        'recipient_name': Computed(
+            ['recipient', 'recipient__first_name', 'recipient__last_name', 'recipient__username'], _recipient_name
+        ),
+    }
@@ -1,3 +1,161 @@
-from django.test import TestCase
+import json
+import threading
 
-# Create your tests here.
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from core.benchmarks import EndpointBenchmarkMixin
+from users.models import User
+from .management.commands.chat_loadtest import percentile
+from .models import ChatMessage
+from .presence import PresenceService
+from .routing import websocket_urlpatterns
+from .serializers import ChatMessageSerializer, ChatMessageValuesSerializer
+from .throttling import reset_user_buckets
+
+
+class ChatEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    def test_message_list(self):
+        self.benchmark('/api/chat/messages/', budget=2, user=self.data['employee'], name='chat-messages-list')
+
+    def test_group_message_list(self):
+        self.benchmark('/api/chat/messages/?chat_type=group', budget=2, user=self.data['employee'], name='chat-messages-group')
+
+    def test_admin_changelist(self):
+        client = self.admin_client_for(self.data['admin'])
+        self.benchmark('/admin/chat/chatmessage/', budget=4, client=client, name='admin-chat-changelist')
+
+
+
+class ChatMessageValuesSerializerTests(EndpointBenchmarkMixin, TestCase):
+    def test_output_matches_the_model_serializer(self):
+        # Group messages have no recipient, so recipient_name is left out of them
+        queryset = ChatMessage.objects.select_related('sender', 'recipient').order_by('pk')
+        expected = ChatMessageSerializer(queryset, many=True).data
+        actual = ChatMessageValuesSerializer.render(ChatMessageValuesSerializer.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoint_matches(self):
+        client = self.client_for(self.data['employee'])
+        fast = client.get('/api/chat/messages/')
+        with override_settings(FAST_READ={'ENABLED': False}):
+            slow = client.get('/api/chat/messages/')
+        self.assertEqual(fast.content, slow.content)
+
+
+@override_settings(CHAT_THROTTLE={'CONNECTION_BURST': 3, 'CONNECTION_RATE': 0.01, 'USER_BURST': 4, 'USER_RATE': 0.01})
+class ChatThrottlingTests(TestCase):
+    def setUp(self):
+        reset_user_buckets()
+        self.addCleanup(reset_user_buckets)
+        self.sender = User.objects.create_user('sender', role='employee')
+
+    async def connect(self, client='10.0.0.1', room='lobby'):
+        # A room each: the messages of one socket are not broadcast to the others
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{room}/')
+        communicator.scope['client'] = (client, 50000)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'presence')
+        return communicator
+
+    async def send(self, communicator, sender_id=None):
+        await communicator.send_to(text_data=json.dumps({'message': 'Hi', 'sender_id': sender_id or self.sender.pk}))
+        reply = await communicator.receive_json_from()
+        while reply.get('type') == 'presence':
+            reply = await communicator.receive_json_from()
+        return reply
+
+    async def test_bursts_are_rejected(self):
+        communicator = await self.connect()
+        replies = [await self.send(communicator) for _ in range(4)]
+        self.assertEqual([reply['type'] for reply in replies], ['message', 'message', 'message', 'error'])
+        self.assertEqual(replies[-1]['error'], 'Rate limit exceeded')
+        self.assertGreater(replies[-1]['retry_after'], 0)
+        await communicator.disconnect()
+
+    async def test_anonymous_sockets_share_a_bucket_by_address(self):
+        others = [await User.objects.acreate(username=f'other{n}') for n in range(2)]
+        first, second = await self.connect(room='first'), await self.connect(room='second')
+        elsewhere = await self.connect('10.0.0.2', room='elsewhere')
+        # Claiming other sender ids does not buy a fresh bucket
+        replies = [await self.send(first, user.pk) for user in (self.sender, *others)]
+        replies += [await self.send(second), await self.send(second)]
+        self.assertEqual([reply['type'] for reply in replies], ['message'] * 4 + ['error'])
+        # Nor does it drain the bucket of the clients it names
+        self.assertEqual((await self.send(elsewhere))['type'], 'message')
+        for communicator in (first, second, elsewhere):
+            await communicator.disconnect()
+
+    @override_settings(CHAT_THROTTLE={'CONNECTION_BURST': 1, 'CONNECTION_RATE': 0.01})
+    async def test_typing_does_not_use_up_the_message_allowance(self):
+        communicator = await self.connect()
+        for typing in (True, False) * 3:
+            await communicator.send_json_to({'type': 'typing', 'user_id': self.sender.pk, 'typing': typing})
+        self.assertEqual((await self.send(communicator))['type'], 'message')
+        await communicator.disconnect()
+
+    @override_settings(CHAT_THROTTLE={'MAX_MESSAGE_BYTES': 40})
+    async def test_oversize_frames_are_rejected_by_bytes(self):
+        communicator = await self.connect()
+        # 29 characters, 43 bytes
+        await communicator.send_to(text_data=json.dumps({'message': 'é' * 14}, ensure_ascii=False))
+        reply = await communicator.receive_json_from()
+        self.assertEqual(reply, {'type': 'error', 'error': 'Message too large'})
+        await communicator.disconnect()
+
+
+class PresenceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_workers_publish_without_overwriting_each_other(self):
+        workers = [PresenceService() for _ in range(8)]
+        for number, worker in enumerate(workers):
+            worker.join('lobby', f'channel{number}', str(number))
+        barrier = threading.Barrier(len(workers))
+
+        def tick(worker):
+            barrier.wait()
+            worker.tick()
+
+        threads = [threading.Thread(target=tick, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({worker._slot for worker in workers}), 8)
+        self.assertEqual(PresenceService().online_users('lobby'), {str(number) for number in range(8)})
+
+        workers[3].leave('lobby', 'channel3')
+        workers[3].tick()
+        self.assertEqual(PresenceService().online_users('lobby'), {str(number) for number in range(8)} - {'3'})
+
+    @override_settings(CHAT_PRESENCE={'MAX_WORKERS': 1})
+    def test_slots_are_released_with_their_worker(self):
+        first, second = PresenceService(), PresenceService()
+        first.join('lobby', 'a', '1')
+        second.join('lobby', 'b', '2')
+        first.tick()
+        with self.assertLogs('chat.presence', 'WARNING'):
+            second.tick()
+        # Only one slot: the second worker is not published until the first one's expires
+        self.assertEqual(PresenceService().online_users('lobby'), {'1'})
+        cache.clear()
+        second.tick()
+        self.assertEqual(PresenceService().online_users('lobby'), {'2'})
+
+
+class PercentileTests(SimpleTestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual(
+            [percentile(values, pct) for pct in (0, 10, 50, 51, 90, 95, 99, 100)],
+            [1, 1, 5, 6, 9, 10, 10, 10],
+        )
+        self.assertEqual(percentile([7], 50), 7)
+        self.assertIsNone(percentile([], 50))
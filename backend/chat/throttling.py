@@ -0,0 +1,123 @@
+"""
+Token-bucket throttling for the chat consumer.
+
+Each WebSocket connection owns a bucket for messages and one for presence
+frames (heartbeats, typing), and connections belonging to the same
+user share a second bucket held in a bounded in-process registry. Sockets
+without an authenticated user share it by client address. Limits are
+read from ``settings.CHAT_THROTTLE``.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Messages per second a single connection may send, and the burst allowance
+    'CONNECTION_RATE': 5,
+    'CONNECTION_BURST': 10,
+    # Messages per second shared by every connection of one user
+    'USER_RATE': 10,
+    'USER_BURST': 20,
+    # Heartbeat, typing and presence frames per second a connection may send,
+    # counted apart from messages
+    'PRESENCE_RATE': 5,
+    'PRESENCE_BURST': 20,
+    # Frames larger than this (UTF-8 encoded) are rejected before they are parsed
+    'MAX_MESSAGE_BYTES': 8192,
+    # Close the socket after this many throttled frames in a row
+    'MAX_VIOLATIONS': 20,
+    # Fan-out events older than this (seconds) mean the client is not keeping up
+    'OUTBOUND_MAX_LAG': 5.0,
+    # What to do with a lagging client: 'drop' stale messages or 'close' the socket
+    'OUTBOUND_POLICY': 'drop',
+    # Number of user buckets kept in memory per process
+    'USER_BUCKETS': 10000,
+}
+
+
+def get_throttle_setting(name):
+    return getattr(settings, 'CHAT_THROTTLE', {}).get(name, DEFAULTS[name])
+
+
+class TokenBucket:
+    """Classic token bucket refilled lazily on each call"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'lock')
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, tokens=1):
+        """Take ``tokens`` from the bucket; return True if they were available"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def retry_after(self, tokens=1):
+        """Seconds until ``tokens`` would be available"""
+        missing = tokens - self.tokens
+        if missing <= 0 or self.rate <= 0:
+            return 0
+        return missing / self.rate
+
+
+class BucketRegistry:
+    """Bounded LRU of token buckets keyed by an arbitrary identifier"""
+
+    def __init__(self, rate, capacity, max_size):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_size:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+_user_buckets = None
+_user_buckets_lock = threading.Lock()
+
+
+def get_user_buckets():
+    global _user_buckets
+    if _user_buckets is None:
+        with _user_buckets_lock:
+            if _user_buckets is None:
+                _user_buckets = BucketRegistry(
+                    get_throttle_setting('USER_RATE'),
+                    get_throttle_setting('USER_BURST'),
+                    get_throttle_setting('USER_BUCKETS'),
+                )
+    return _user_buckets
+
+
+def reset_user_buckets():
+    global _user_buckets
+    with _user_buckets_lock:
+        _user_buckets = None
@@ -1,15 +1,18 @@
 from django.shortcuts import render
 from django.db import models
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from core.fastread import FastListMixin
 from .models import ChatMessage
-from .serializers import ChatMessageSerializer
+from .presence import presence
+from .serializers import ChatMessageSerializer, ChatMessageValuesSerializer
 
 # Create your views here.
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+class ChatMessageViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = ChatMessageSerializer
+    values_serializer_class = ChatMessageValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -41,3 +44,15 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(sender=self.request.user)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def online_users_view(request, room_name):
+    """Users currently connected to a chat room, answered from the presence cache"""
+    online, typing = presence.room_state(room_name)
+    return Response({
+        'room': room_name,
+        'online': sorted(online),
+        'typing': sorted(typing),
+    })
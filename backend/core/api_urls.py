@@ -4,7 +4,11 @@ from projects.views import ProjectViewSet
 from institutions.views import InstitutionViewSet
 from tasks.views import TaskViewSet
 from users.views import UserViewSet
-from chat.views import ChatMessageViewSet
+from chat.views import ChatMessageViewSet, online_users_view
+from notifications.views import NotificationViewSet
+from sync.views import sync_view
+from .batch import batch_view
+from .views import database_status_view
 
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet)
@@ -12,8 +16,13 @@ router.register(r'institutions', InstitutionViewSet)
 router.register(r'tasks', TaskViewSet)
 router.register(r'users', UserViewSet)
 router.register(r'chat/messages', ChatMessageViewSet, basename='chatmessage')
+router.register(r'notifications', NotificationViewSet, basename='notification')
 
 urlpatterns = [
     path('auth/', include('users.auth_urls')),
+    path('health/db/', database_status_view, name='database_status'),
+    path('batch/', batch_view, name='batch'),
+    path('sync/', sync_view, name='sync'),
+    path('chat/rooms/<str:room_name>/online/', online_users_view, name='chat_online_users'),
     path('', include(router.urls)),
 ]
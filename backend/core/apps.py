@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        # Model version counters behind cached API responses, connection metrics
+        from . import cache, db
+        cache.connect_signals()
+        db.connect_signals()
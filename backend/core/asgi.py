@@ -8,27 +8,31 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
 import os
-import django
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-# Initialize Django before importing anything that uses models
-django.setup()
-
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from channels.security.websocket import AllowedHostsOriginValidator
-from chat.routing import websocket_urlpatterns
-
-# Get the Django ASGI application early to ensure the AppRegistry is populated
+# Sets Django up (apps, models, middleware) before anything that uses models is imported
 django_asgi_app = get_asgi_application()
 
-application = ProtocolTypeRouter({
-    "http": django_asgi_app,
-    "websocket": AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
-            URLRouter(websocket_urlpatterns)
-        )
-    ),
-})
+from django.conf import settings
+
+if settings.API_ONLY:
+    # API worker pods serve HTTP only: Channels and the websocket consumers are never imported
+    application = django_asgi_app
+else:
+    from channels.routing import ProtocolTypeRouter, URLRouter
+    from channels.auth import AuthMiddlewareStack
+    from channels.security.websocket import AllowedHostsOriginValidator
+    from chat.routing import websocket_urlpatterns
+    from notifications.routing import websocket_urlpatterns as notification_urlpatterns
+
+    application = ProtocolTypeRouter({
+        "http": django_asgi_app,
+        "websocket": AllowedHostsOriginValidator(
+            AuthMiddlewareStack(
+                URLRouter(websocket_urlpatterns + notification_urlpatterns)
+            )
+        ),
+    })
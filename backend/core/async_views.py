@@ -0,0 +1,145 @@
+"""
+Async API views whose independent queries run concurrently.
+
+DRF views are synchronous: under ASGI each one runs on the thread Django keeps
+for sync code, one query after another. ``async_api_view`` serves a plain
+coroutine view instead. It authenticates the JWT (or the session) itself,
+allows GET only and renders the returned data as JSON with DRF's renderer,
+so the request stays on the event loop from the middleware to the response.
+
+The async ORM alone does not make queries concurrent: ``acount()`` and
+friends hand every query to the same thread-sensitive executor, so gathering
+them still runs them in turn. ``gather_queries()`` runs each group of queries
+on a worker thread with a connection of its own, and the view waits about as
+long as its slowest group. Workers open and close connections around each
+group the way a request does, so ``CONN_MAX_AGE`` or the pool decide whether
+connections are reused. An in-memory SQLite database is not visible from a
+second connection; with one configured (as in tests), or with
+``ASYNC_VIEWS_CONCURRENT=false``, the groups run in turn on the sync thread.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections, connections
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from users.authentication import ClaimsJWTAuthentication
+
+DEFAULTS = {
+    'CONCURRENT': True,
+    'MAX_WORKERS': 8,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_async_views_setting(name):
+    return getattr(settings, 'ASYNC_VIEWS', {}).get(name, DEFAULTS[name])
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_async_views_setting('MAX_WORKERS'),
+                thread_name_prefix='query-group',
+            )
+        return _executor
+
+
+def concurrent_queries():
+    """Whether query groups may run on connections of their own"""
+    if not get_async_views_setting('CONCURRENT'):
+        return False
+    return not any(
+        connections[alias].vendor == 'sqlite' and connections[alias].is_in_memory_db()
+        for alias in settings.DATABASES
+    )
+
+
+def _run_group(group):
+    close_old_connections()
+    try:
+        return group()
+    finally:
+        close_old_connections()
+
+
+async def gather_queries(*groups):
+    """Results of calling each of the sync callables ``groups``, run concurrently"""
+    if not concurrent_queries():
+        return [await sync_to_async(group)() for group in groups]
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    # Each group runs in a copy of the request's context: replica routing and
+    # query instrumentation follow it onto the worker thread
+    return await asyncio.gather(*(
+        loop.run_in_executor(executor, contextvars.copy_context().run, _run_group, group)
+        for group in groups
+    ))
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        headers=headers,
+        content_type='application/json',
+    )
+
+
+async def authenticate(request):
+    """The user of the request's JWT, else of its session, else AnonymousUser"""
+    # Batch sub-requests carry the user the batch authenticated as
+    forced = getattr(request, '_force_auth_user', None)
+    if forced is not None:
+        return forced
+    result = await ClaimsJWTAuthentication().aauthenticate(request)
+    if result is not None:
+        return result[0]
+    # API-only workers have no AuthenticationMiddleware
+    if hasattr(request, 'auser'):
+        return await request.auser()
+    return AnonymousUser()
+
+
+def async_api_view(view):
+    """
+    Serve the coroutine ``view(request, ...)`` to authenticated GET requests.
+    ``request.user`` is set before it runs; it returns data to render as JSON
+    or a response. Errors have the shape of DRF's.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return json_response(
+                {'detail': f'Method "{request.method}" not allowed.'},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                headers={'Allow': 'GET, HEAD'},
+            )
+        challenge = {'WWW-Authenticate': ClaimsJWTAuthentication().authenticate_header(request)}
+        try:
+            request.user = await authenticate(request)
+        except AuthenticationFailed as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+            return json_response(detail, status=exc.status_code, headers=challenge)
+        if not request.user.is_authenticated:
+            return json_response(
+                {'detail': NotAuthenticated.default_detail},
+                status=status.HTTP_401_UNAUTHORIZED,
+                headers=challenge,
+            )
+        result = await view(request, *args, **kwargs)
+        return result if isinstance(result, HttpResponse) else json_response(result)
+    return wrapper
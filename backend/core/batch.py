@@ -0,0 +1,180 @@
+"""
+``POST /api/batch/``: several API requests in one round trip.
+
+A page that needs the dashboard stats, projects, tasks and users would
+otherwise pay for four requests, each going through TLS, the middleware
+stack and authentication. The batch endpoint takes the list instead::
+
+    {"requests": [
+        {"id": "stats", "path": "/api/auth/dashboard-stats/"},
+        {"id": "tasks", "path": "/api/tasks/?project=3"},
+        {"id": "done", "method": "PATCH", "path": "/api/tasks/7/", "body": {"status": "completed"}}
+     ],
+     "concurrent": true}
+
+and answers with one entry per sub-request, in order::
+
+    {"responses": [{"id": "stats", "status": 200, "body": {...}}, ...]}
+
+Sub-requests are dispatched in-process to the views of ``/api/`` routes, as
+the user the batch request authenticated as, with JSON bodies only. They
+run in order on the batch request's thread and database connection; a
+failing sub-request gets its error status and does not stop the others.
+With ``concurrent``, consecutive GET sub-requests run at once on
+connections of their own (see ``core.async_views.gather_queries``); a write
+waits for the reads before it, and the reads after it wait for the write.
+From the first write on, sub-requests read from the primary.
+"""
+
+import io
+import json
+import logging
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, serializers, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .async_views import gather_queries
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_REQUESTS': 20,
+}
+
+API_PREFIX = '/api/'
+READ_METHODS = ('GET', 'HEAD')
+# Set per sub-request; its other headers are the batch request's
+SUBREQUEST_META = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'REQUEST_METHOD', 'PATH_INFO', 'QUERY_STRING')
+
+
+def get_batch_setting(name):
+    return getattr(settings, 'BATCH', {}).get(name, DEFAULTS[name])
+
+
+class BatchItemSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=100)
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    concurrent = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        limit = get_batch_setting('MAX_REQUESTS')
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} requests per batch.')
+        return value
+
+
+def subrequest(request, item, path, query):
+    """An HttpRequest for ``item``, authenticated as ``request`` was"""
+    body = json.dumps(item['body']).encode() if 'body' in item else b''
+    sub = HttpRequest()
+    sub.method = item['method']
+    sub.path = sub.path_info = path
+    sub.META = {key: value for key, value in request.META.items() if key not in SUBREQUEST_META}
+    sub.META.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+    })
+    sub.GET = QueryDict(query)
+    sub.COOKIES = request.COOKIES
+    sub._stream = io.BytesIO(body)
+    sub._read_started = False
+    # Read by DRF's Request and by async_api_view instead of authenticating again
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    sub.user = request.user
+    return sub
+
+
+def _body(response):
+    if isinstance(response, Response):
+        return response.data
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content) if content else None
+    return content.decode(response.charset)
+
+
+def dispatch(request, item):
+    """(status, body) of running ``item`` as a request to its view"""
+    path, _, query = item['path'].partition('?')
+    try:
+        if not path.startswith(API_PREFIX):
+            raise Resolver404
+        match = resolve(path)
+    except Resolver404:
+        return status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+    if match.func is batch_view:
+        return status.HTTP_400_BAD_REQUEST, {'detail': 'Batches cannot be nested.'}
+
+    if item['method'] not in READ_METHODS:
+        # Whatever a write reads, it saves back: not from a replica that lags
+        use_primary()
+    sub = subrequest(request, item, path, query)
+    sub.resolver_match = match
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    try:
+        response = view(sub, *match.args, **match.kwargs)
+    except Http404:
+        return status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+    except PermissionDenied:
+        return status.HTTP_403_FORBIDDEN, {'detail': 'You do not have permission to perform this action.'}
+    except Exception:
+        # One failing sub-request does not fail the batch
+        logger.exception('Batch sub-request %s %s failed', item['method'], item['path'])
+        return status.HTTP_500_INTERNAL_SERVER_ERROR, {'detail': 'A server error occurred.'}
+    return response.status_code, _body(response)
+
+
+def _run(request, items, concurrent):
+    """(status, body) per item, in order"""
+    results = []
+    reads = []
+
+    def flush():
+        if len(reads) > 1:
+            results.extend(async_to_sync(gather_queries)(*(
+                (lambda item=item: dispatch(request, item)) for item in reads
+            )))
+        else:
+            results.extend(dispatch(request, item) for item in reads)
+        reads.clear()
+
+    for item in items:
+        if concurrent and item['method'] in READ_METHODS:
+            reads.append(item)
+            continue
+        flush()
+        results.append(dispatch(request, item))
+    flush()
+    return results
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_view(request):
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    items = serializer.validated_data['requests']
+    results = _run(request, items, serializer.validated_data['concurrent'])
+    responses = []
+    for item, (code, body) in zip(items, results):
+        entry = {'id': item['id']} if 'id' in item else {}
+        entry.update({'status': code, 'body': body})
+        responses.append(entry)
+    return Response({'responses': responses})
@@ -0,0 +1,130 @@
+"""
+Shared helpers for the API benchmark tests in each app's ``tests.py``.
+
+A deterministic dataset is seeded once per test class with ``core.datagen``
+at the scale named by the ``BENCHMARK_SCALE`` environment variable. Every
+benchmarked request is timed and its SQL queries are counted against a
+per-endpoint budget: a fixed base plus an optional allowance per returned
+row, so the limit does not depend on the scale. The results are collected
+into a JSON report, written to the path in ``BENCHMARK_REPORT`` when it is
+set, that can be diffed between commits.
+"""
+
+import json
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from core import datagen
+from users.views import CustomTokenObtainPairSerializer
+
+_report = {}
+
+
+def get_scale():
+    return os.environ.get('BENCHMARK_SCALE', 'small')
+
+
+def seed_dataset(scale='small', seed=42):
+    """Generate the benchmark dataset and return the rows the tests request"""
+    from institutions.models import Institution
+    from projects.models import Project
+    from tasks.models import Task
+    from users.models import User
+
+    summary = datagen.generate(scale, seed=seed)
+    users = User.objects.in_bulk([
+        summary['admin'], summary['observer'], summary['supervisor'], summary['employee'],
+    ])
+    return {
+        'admin': users[summary['admin']],
+        'observer': users[summary['observer']],
+        'supervisor': users[summary['supervisor']],
+        'employee': users[summary['employee']],
+        'institution': Institution.objects.get(pk=summary['institution']),
+        'project': Project.objects.get(pk=summary['project']),
+        'task': Task.objects.get(pk=summary['task']),
+    }
+
+
+def write_report():
+    path = os.environ.get('BENCHMARK_REPORT')
+    if not path:
+        return
+    with open(path, 'w') as report:
+        json.dump({
+            'scale': get_scale(),
+            'database': connection.vendor,
+            'results': _report,
+        }, report, indent=2, sort_keys=True)
+        report.write('\n')
+
+
+class EndpointBenchmarkMixin:
+    """
+    Seeds the benchmark dataset and provides ``benchmark()`` for timing a
+    request and checking its query budget.
+    """
+
+    repeat = int(os.environ.get('BENCHMARK_REPEAT', 5))
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.scale = get_scale()
+        cls.data = seed_dataset(cls.scale)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        write_report()
+
+    def client_for(self, user):
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def admin_client_for(self, user):
+        """Session client for the admin site; ``user`` needs ``is_staff``"""
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def benchmark(self, path, budget, per_row=0, user=None, name=None, client=None):
+        """GET ``path`` repeatedly, record timings and enforce the query budget"""
+        client = client or self.client_for(user or self.data['admin'])
+        timings = []
+        # Budgets are for the uncached path; response caching is tested separately
+        with override_settings(API_CACHE={**getattr(settings, 'API_CACHE', {}), 'ENABLED': False}):
+            for _ in range(self.repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    timings.append((time.perf_counter() - started) * 1000)
+                self.assertEqual(response.status_code, 200, response.content[:500])
+
+        data = response.json() if response['Content-Type'] == 'application/json' else None
+        rows = len(data['results']) if isinstance(data, dict) and 'results' in data else 0
+        limit = budget + per_row * rows
+        key = name or f'GET {path}'
+        _report[key] = {
+            'queries': len(queries),
+            'budget': limit,
+            'rows': rows,
+            'median_ms': round(statistics.median(timings), 2),
+            'min_ms': round(min(timings), 2),
+            'bytes': len(response.content),
+        }
+        self.assertLessEqual(
+            len(queries), limit,
+            f'{key} ran {len(queries)} queries for {rows} rows, budget is {limit}:\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries),
+        )
+        return response
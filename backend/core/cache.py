@@ -0,0 +1,128 @@
+"""
+Model-versioned response caching for DRF viewsets.
+
+Every model has a version counter in the cache that ``post_save`` and
+``post_delete`` bump once the surrounding transaction commits; bumping
+earlier would let a concurrent request cache the uncommitted (or replica
+stale) rows under the new version. ``CachedViewSetMixin`` keys list and detail responses
+by the versions of the models they are built from, so a write to any of
+those models makes the old entries unreachable instead of having to find and
+delete them. Writes that skip signals (``bulk_create``, ``QuerySet.update``)
+do not bump versions; call ``bump_model_version`` after they commit.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+from . import metrics
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TIMEOUT': 300,
+}
+
+VERSION_KEY = 'model_version:{}'
+
+
+def get_cache_setting(name):
+    return getattr(settings, 'API_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def bump_model_version(model):
+    key = _version_key(model)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Start from the clock so an evicted counter never reuses an old version
+        version = time.time_ns()
+        cache.set(key, version, None)
+        return version
+
+
+def model_versions(models):
+    """Current versions of ``models``, in order, with one cache round trip"""
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key, model in zip(keys, models):
+        if key not in versions:
+            versions[key] = bump_model_version(model)
+    return [versions[key] for key in keys]
+
+
+def _model_changed(sender, update_fields=None, using=None, **kwargs):
+    if sender._meta.auto_created:
+        return
+    # Logins only touch last_login
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: bump_model_version(sender), using=using)
+
+
+def connect_signals():
+    post_save.connect(_model_changed, dispatch_uid='core.cache.model_saved')
+    post_delete.connect(_model_changed, dispatch_uid='core.cache.model_deleted')
+
+
+class CachedViewSetMixin:
+    """
+    Cache serialized ``list`` and ``retrieve`` responses.
+
+    ``cache_models`` lists every model the response is built from (the
+    queryset's model is always included). Entries are keyed by the user's
+    scope (``get_cache_scope``), the query string, the object pk and the
+    versions of those models.
+    """
+    cache_models = ()
+    cache_timeout = None
+
+    def get_cache_scope(self):
+        user = self.request.user
+        # Admins and observers see the same data, everyone else may be scoped
+        if user.is_superuser or user.role in ('admin', 'observer'):
+            return 'all'
+        return f'user:{user.pk}'
+
+    def get_cache_key(self):
+        model = self.get_queryset().model
+        models = [model] + [m for m in self.cache_models if m is not model]
+        versions = '.'.join(str(version) for version in model_versions(models))
+        params = '&'.join(f'{key}={value}' for key, value in sorted(self.request.query_params.lists()))
+        target = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')
+        digest = hashlib.md5(f'{self.get_cache_scope()}|{target}|{params}|{versions}'.encode()).hexdigest()
+        return f'api:{model._meta.label_lower}:{self.action}:{digest}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not get_cache_setting('ENABLED'):
+            return handler(request, *args, **kwargs)
+        labels = {'view': self.basename, 'action': self.action}
+        key = self.get_cache_key()
+        data = cache.get(key)
+        if data is not None:
+            metrics.increment('api_cache_requests_total', labels={**labels, 'result': 'hit'})
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        metrics.increment('api_cache_requests_total', labels={**labels, 'result': 'miss'})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout or get_cache_setting('TIMEOUT'))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
@@ -0,0 +1,292 @@
+"""
+Synthetic data generation for demos, benchmarks and load tests.
+
+Rows are inserted with batched ``bulk_create`` from a seeded random generator,
+so the same scale and seed always produce the same dataset. Tasks, comments,
+evidence and chat messages are streamed batch by batch and only the primary
+keys of parent rows are kept in memory, which keeps generating millions of
+rows within a modest footprint.
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_model_version
+
+SCALES = {
+    'small': {
+        'institutions': 3,
+        'users_per_institution': 10,
+        'projects': 20,
+        'tasks_per_project': 10,
+        'comments_per_task': 2,
+        'evidence_per_task': 1,
+        'messages': 200,
+    },
+    'medium': {
+        'institutions': 10,
+        'users_per_institution': 50,
+        'projects': 200,
+        'tasks_per_project': 25,
+        'comments_per_task': 3,
+        'evidence_per_task': 1,
+        'messages': 5000,
+    },
+    'large': {
+        'institutions': 30,
+        'users_per_institution': 200,
+        'projects': 1000,
+        'tasks_per_project': 50,
+        'comments_per_task': 4,
+        'evidence_per_task': 2,
+        'messages': 50000,
+    },
+    'xlarge': {
+        'institutions': 100,
+        'users_per_institution': 500,
+        'projects': 20000,
+        'tasks_per_project': 50,
+        'comments_per_task': 3,
+        'evidence_per_task': 1,
+        'messages': 2000000,
+    },
+}
+
+DEFAULT_PASSWORD = 'password123'
+
+TASK_STATUSES = ['initial', 'in_progress', 'completed']
+TASK_STATUS_WEIGHTS = [3, 4, 3]
+PROJECT_STATUSES = ['active', 'completed', 'paused']
+PROJECT_STATUS_WEIGHTS = [6, 3, 1]
+FILE_TYPES = ['document', 'image', 'link']
+FILE_TYPE_WEIGHTS = [5, 3, 2]
+
+
+def username_prefix(seed):
+    return f'gen{seed}_'
+
+
+def _due_date(rng, status, now):
+    """Completed tasks are mostly in the past, some open tasks are overdue"""
+    if rng.random() < 0.1:
+        return None
+    if status == 'completed':
+        return now - timedelta(days=rng.randint(0, 180))
+    if rng.random() < 0.15:
+        return now - timedelta(days=rng.randint(1, 30))
+    return now + timedelta(days=rng.randint(1, 120))
+
+
+def generate(scale='small', seed=42, batch_size=2000, password=DEFAULT_PASSWORD, log=None):
+    """
+    Generate a dataset of the given scale and return a summary with row counts
+    and the ids of a few representative rows.
+    """
+    from chat.models import ChatMessage
+    from institutions.models import Institution
+    from projects.access import rebuild_access
+    from projects.models import Project, ProjectAccess
+    from sync.models import reset_clients
+    from tasks.models import Task, TaskComment, TaskEvidence
+    from users.directory import bump_directory_version
+    from users.models import User
+
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    now = timezone.now()
+    prefix = username_prefix(seed)
+    # Hash once; every generated user shares the same precomputed hash
+    password_hash = make_password(password)
+    counts = {}
+    started = time.perf_counter()
+
+    def progress(model, count):
+        counts[model] = counts.get(model, 0) + count
+        if log:
+            log(f'{model}: {counts[model]} rows ({time.perf_counter() - started:.1f}s)')
+
+    with transaction.atomic():
+        admin = User.objects.create(
+            username=f'{prefix}admin', first_name='Generated', last_name='Admin',
+            email=f'{prefix}admin@example.com', role='admin',
+            is_staff=True, is_superuser=True, password=password_hash,
+        )
+        observer = User.objects.create(
+            username=f'{prefix}observer', first_name='Generated', last_name='Observer',
+            email=f'{prefix}observer@example.com', role='observer', password=password_hash,
+        )
+        progress('users', 2)
+
+        institutions = Institution.objects.bulk_create([
+            Institution(
+                name=f'Institution {seed}-{i}',
+                description=f'Generated institution {i}',
+                address=f'{i} Generated Street',
+                phone=f'555-{i:04d}',
+                email=f'{prefix}institution{i}@example.com',
+            )
+            for i in range(sizes['institutions'])
+        ], batch_size=batch_size)
+        progress('institutions', len(institutions))
+
+    supervisors = []
+    employees_by_institution = {}
+    user_ids = [admin.pk, observer.pk]
+    users = []
+    for institution in institutions:
+        for j in range(sizes['users_per_institution']):
+            if j == 0:
+                role = 'supervisor'
+            elif j % 50 == 49:
+                role = 'observer'
+            else:
+                role = 'employee'
+            username = f'{prefix}{institution.pk}_{j}'
+            users.append(User(
+                username=username, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                email=f'{username}@example.com', role=role,
+                institution_id=institution.pk, password=password_hash,
+            ))
+    for start in range(0, len(users), batch_size):
+        with transaction.atomic():
+            created = User.objects.bulk_create(users[start:start + batch_size])
+        for user in created:
+            user_ids.append(user.pk)
+            if user.role == 'supervisor':
+                supervisors.append(user)
+            elif user.role == 'employee':
+                employees_by_institution.setdefault(user.institution_id, []).append(user.pk)
+        progress('users', len(created))
+    del users
+
+    for institution, supervisor in zip(institutions, supervisors):
+        institution.supervisor_id = supervisor.pk
+    Institution.objects.bulk_update(institutions, ['supervisor'], batch_size=batch_size)
+
+    institution_ids = [institution.pk for institution in institutions]
+    creators = [supervisor.pk for supervisor in supervisors] + [admin.pk]
+    projects = []
+    for i in range(sizes['projects']):
+        projects.append(Project(
+            title=f'Project {seed}-{i}',
+            description=f'Generated project {i}',
+            status=rng.choices(PROJECT_STATUSES, weights=PROJECT_STATUS_WEIGHTS)[0],
+            created_by_id=rng.choice(creators),
+            start_date=(now - timedelta(days=rng.randint(0, 365))).date(),
+            budget=rng.randint(1000, 100000),
+        ))
+    project_ids = []
+    for start in range(0, len(projects), batch_size):
+        with transaction.atomic():
+            created = Project.objects.bulk_create(projects[start:start + batch_size])
+        project_ids.extend(project.pk for project in created)
+        progress('projects', len(created))
+    del projects
+
+    first_task_id = None
+    projects_per_batch = max(1, batch_size // max(1, sizes['tasks_per_project']))
+    for start in range(0, len(project_ids), projects_per_batch):
+        tasks = []
+        for project_id in project_ids[start:start + projects_per_batch]:
+            home = rng.choice(institution_ids)
+            for k in range(sizes['tasks_per_project']):
+                institution_id = home if rng.random() < 0.8 else rng.choice(institution_ids)
+                status = rng.choices(TASK_STATUSES, weights=TASK_STATUS_WEIGHTS)[0]
+                candidates = employees_by_institution.get(institution_id)
+                tasks.append(Task(
+                    project_id=project_id,
+                    title=f'Task {project_id}-{k}',
+                    description='Generated task',
+                    assignee_id=rng.choice(candidates) if candidates and rng.random() < 0.95 else None,
+                    institution_id=institution_id,
+                    status=status,
+                    progress={'initial': 0, 'in_progress': rng.randint(1, 99), 'completed': 100}[status],
+                    due_date=_due_date(rng, status, now),
+                ))
+        with transaction.atomic():
+            tasks = Task.objects.bulk_create(tasks)
+            if first_task_id is None:
+                first_task_id = tasks[0].pk
+            comments = [
+                TaskComment(
+                    task_id=task.pk,
+                    author_id=task.assignee_id or rng.choice(creators),
+                    content=f'Update {n} on task {task.pk}',
+                )
+                for task in tasks
+                for n in range(sizes['comments_per_task'])
+            ]
+            TaskComment.objects.bulk_create(comments, batch_size=batch_size)
+            evidence = []
+            for task in tasks:
+                for n in range(sizes['evidence_per_task']):
+                    file_type = rng.choices(FILE_TYPES, weights=FILE_TYPE_WEIGHTS)[0]
+                    evidence.append(TaskEvidence(
+                        task_id=task.pk,
+                        file_name=f'evidence-{task.pk}-{n}',
+                        file_url=f'https://example.com/evidence/{task.pk}/{n}',
+                        file_type=file_type,
+                        uploaded_by_id=task.assignee_id or rng.choice(creators),
+                    ))
+            TaskEvidence.objects.bulk_create(evidence, batch_size=batch_size)
+        progress('tasks', len(tasks))
+        progress('comments', len(comments))
+        progress('evidence', len(evidence))
+
+    for start in range(0, sizes['messages'], batch_size):
+        messages = []
+        for n in range(start, min(start + batch_size, sizes['messages'])):
+            sender_id = rng.choice(user_ids)
+            if rng.random() < 0.25:
+                messages.append(ChatMessage(
+                    sender_id=sender_id, recipient_id=rng.choice(user_ids),
+                    content=f'Private message {n}', chat_type='private',
+                    is_read=rng.random() < 0.7,
+                ))
+            else:
+                messages.append(ChatMessage(
+                    sender_id=sender_id, content=f'Group message {n}', chat_type='group',
+                ))
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(messages)
+        progress('messages', len(messages))
+
+    # bulk_create skips the signals that maintain project visibility
+    progress('project access', rebuild_access(batch_size))
+    # and that stamp rows for the sync API
+    reset_clients()
+
+    def bump_versions():
+        for model in (Institution, User, Project, ProjectAccess, Task, TaskComment, TaskEvidence, ChatMessage):
+            bump_model_version(model)
+        bump_directory_version()
+
+    # and that invalidate cached API responses and directory searches
+    transaction.on_commit(bump_versions)
+
+    return {
+        'counts': counts,
+        'seconds': round(time.perf_counter() - started, 2),
+        'admin': admin.pk,
+        'observer': observer.pk,
+        'supervisor': supervisors[0].pk,
+        'employee': next(iter(employees_by_institution.values()))[0],
+        'institution': institution_ids[0],
+        'project': project_ids[0],
+        'task': first_task_id,
+    }
+
+
+FIRST_NAMES = [
+    'Alice', 'Amani', 'Ben', 'Chloe', 'David', 'Esther', 'Grace', 'Hannah', 'Isaac', 'James',
+    'Joy', 'Kevin', 'Lydia', 'Mary', 'Noah', 'Olivia', 'Peter', 'Ruth', 'Samuel', 'Tina',
+]
+LAST_NAMES = [
+    'Brown', 'Clark', 'Davis', 'Evans', 'Garcia', 'Hall', 'Irakoze', 'Johnson', 'King', 'Lee',
+    'Mugisha', 'Nelson', 'Owens', 'Parker', 'Quinn', 'Roberts', 'Smith', 'Turner', 'Uwase', 'Walker',
+]
@@ -0,0 +1,295 @@
+"""
+Streaming JSONL export and import of model data.
+
+An export is a directory with one ``<app_label>.<model>.jsonl`` file per model
+and a ``manifest.json`` listing the models in dependency order. Each line holds
+one row keyed by column attname, so rows can be written and read without
+materialising a table in memory.
+
+Foreign keys that form a cycle (``User.institution`` and
+``Institution.supervisor``) are broken by deferring one nullable side: the
+column is written as NULL on the first pass and filled in by a second pass once
+both tables are loaded.
+"""
+
+import datetime
+import gzip
+import json
+import os
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import ForeignKey
+
+DEFAULT_APPS = ['users', 'institutions', 'projects', 'tasks', 'chat', 'activity', 'notifications', 'sync']
+MANIFEST = 'manifest.json'
+STATE = 'import-state.json'
+FORMAT_VERSION = 1
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """``DjangoJSONEncoder`` keeping microseconds, which it cuts to milliseconds"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_models(app_labels):
+    """Concrete models of the given apps plus M2M tables linking them"""
+    models = []
+    for label in app_labels:
+        for model in apps.get_app_config(label).get_models():
+            if not model._meta.proxy and model._meta.managed:
+                models.append(model)
+    for model in list(models):
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created and field.related_model in models and through not in models:
+                models.append(through)
+    return models
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def _foreign_keys(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, ForeignKey)]
+
+
+def dependency_order(models, counts=None):
+    """
+    Sort ``models`` so referenced tables come first. Returns
+    ``[(model, deferred_attnames)]``; cycles are broken by deferring nullable
+    foreign keys of the model with the fewest rows.
+    """
+    counts = counts or {}
+    remaining = list(models)
+    ordered = []
+    deferred = {model: [] for model in models}
+
+    for model in models:
+        for field in _foreign_keys(model):
+            if field.related_model is model and field.null:
+                deferred[model].append(field.attname)
+
+    while remaining:
+        done = set(ordered)
+        ready = [
+            model for model in remaining
+            if all(
+                field.related_model in done or field.related_model not in remaining
+                or field.related_model is model
+                for field in _foreign_keys(model)
+            )
+        ]
+        if not ready:
+            candidates = [
+                model for model in remaining
+                if all(
+                    field.null for field in _foreign_keys(model)
+                    if field.related_model in remaining and field.related_model is not model
+                )
+            ]
+            if not candidates:
+                raise ValueError(
+                    'Cannot order models, non-nullable foreign key cycle between: '
+                    + ', '.join(model_label(model) for model in remaining)
+                )
+            model = min(candidates, key=lambda m: counts.get(m, 0))
+            deferred[model].extend(
+                field.attname for field in _foreign_keys(model)
+                if field.related_model in remaining and field.related_model is not model
+            )
+            ready = [model]
+        for model in ready:
+            ordered.append(model)
+            remaining.remove(model)
+
+    return [(model, deferred[model]) for model in ordered]
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def export_models(directory, app_labels=None, batch_size=5000, compress=False, log=None):
+    """Write every row of the selected models to ``directory``"""
+    os.makedirs(directory, exist_ok=True)
+    models = get_models(app_labels or DEFAULT_APPS)
+    counts = {model: model._base_manager.count() for model in models}
+    entries = []
+
+    for model, deferred in dependency_order(models, counts):
+        label = model_label(model)
+        filename = f'{label}.jsonl' + ('.gz' if compress else '')
+        attnames = [field.attname for field in model._meta.concrete_fields]
+        rows = model._base_manager.order_by('pk').values_list(*attnames)
+        written = 0
+        with _open(os.path.join(directory, filename), 'w') as output:
+            for values in rows.iterator(chunk_size=batch_size):
+                output.write(json.dumps(dict(zip(attnames, values)), cls=ExportEncoder))
+                output.write('\n')
+                written += 1
+                if log and written % batch_size == 0:
+                    log(f'{label}: {written}/{counts[model]}')
+        if log:
+            log(f'{label}: {written} rows exported')
+        entries.append({'model': label, 'file': filename, 'count': written, 'deferred': deferred})
+
+    with open(os.path.join(directory, MANIFEST), 'w') as manifest:
+        json.dump({'version': FORMAT_VERSION, 'models': entries}, manifest, indent=2)
+    return entries
+
+
+def _read_rows(path, skip=0):
+    with _open(path, 'r') as source:
+        for number, line in enumerate(source):
+            if number >= skip and line.strip():
+                yield json.loads(line)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@contextmanager
+def _exported_timestamps(model):
+    """Insert the exported ``auto_now``/``auto_now_add`` values instead of the time of the load"""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Importer:
+    """
+    Loads an export directory with batched ``bulk_create``. Progress is saved
+    to ``import-state.json`` after every committed batch so an interrupted
+    import picks up where it stopped.
+    """
+
+    def __init__(self, directory, batch_size=2000, fresh=False, log=None):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        with open(os.path.join(directory, MANIFEST)) as manifest:
+            self.manifest = json.load(manifest)
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported export version {self.manifest.get('version')}")
+        self._fields = {}
+        self.state_path = os.path.join(directory, STATE)
+        self.state = {'rows': {}, 'fixups': {}}
+        if not fresh and os.path.exists(self.state_path):
+            with open(self.state_path) as state:
+                self.state = json.load(state)
+
+    def save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as state:
+            json.dump(self.state, state)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self):
+        models = []
+        with connection.constraint_checks_disabled():
+            for entry in self.manifest['models']:
+                model = apps.get_model(entry['model'])
+                models.append(model)
+                self.load(model, entry)
+            for entry in self.manifest['models']:
+                if entry['deferred']:
+                    self.fix_up(apps.get_model(entry['model']), entry)
+
+        # Foreign keys were not enforced while loading; verify them all at once
+        connection.check_constraints(table_names=[model._meta.db_table for model in models])
+        self.reset_sequences(models)
+        # Rows were loaded without signals, synced clients start over
+        from sync.models import reset_clients
+        reset_clients()
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return {entry['model']: entry['count'] for entry in self.manifest['models']}
+
+    def _convert(self, model, row, deferred=()):
+        fields = self._fields.get(model)
+        if fields is None:
+            fields = self._fields[model] = {field.attname: field for field in model._meta.concrete_fields}
+        values = {}
+        for attname, value in row.items():
+            if attname in deferred:
+                value = None
+            elif value is not None:
+                value = fields[attname].to_python(value)
+            values[attname] = value
+        return model(**values)
+
+    def load(self, model, entry):
+        label = entry['model']
+        done = self.state['rows'].get(label, 0)
+        if done >= entry['count']:
+            self.log(f'{label}: already imported')
+            return
+
+        path = os.path.join(self.directory, entry['file'])
+        # The batch after a restart may have been committed before the state was saved
+        ignore_conflicts = done > 0
+        for batch in _batches(_read_rows(path, skip=done), self.batch_size):
+            objects = [self._convert(model, row, entry['deferred']) for row in batch]
+            with transaction.atomic(), _exported_timestamps(model):
+                model._base_manager.bulk_create(objects, ignore_conflicts=ignore_conflicts)
+            ignore_conflicts = False
+            done += len(batch)
+            self.state['rows'][label] = done
+            self.save_state()
+            self.log(f'{label}: {done}/{entry["count"]}')
+
+    def fix_up(self, model, entry):
+        """Fill in deferred foreign keys once their targets exist"""
+        label = entry['model']
+        done = self.state['fixups'].get(label, 0)
+        path = os.path.join(self.directory, entry['file'])
+        pk_name = model._meta.pk.attname
+        for batch in _batches(_read_rows(path, skip=done), self.batch_size):
+            objects = [
+                self._convert(model, {pk_name: row[pk_name], **{name: row[name] for name in entry['deferred']}})
+                for row in batch
+                if any(row[name] is not None for name in entry['deferred'])
+            ]
+            if objects:
+                with transaction.atomic():
+                    model._base_manager.bulk_update(objects, entry['deferred'])
+            done += len(batch)
+            self.state['fixups'][label] = done
+            self.save_state()
+        self.log(f'{label}: deferred {", ".join(entry["deferred"])} restored')
+
+    def reset_sequences(self, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
@@ -0,0 +1,55 @@
+"""
+Database connection reporting.
+
+Counts the connections each process opens (a steady climb means connections
+are not being reused) and reads the psycopg pool statistics when
+``DB_POOL`` is enabled.
+"""
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+# psycopg_pool.ConnectionPool.get_stats() keys reported as gauges
+POOL_GAUGES = {
+    'pool_size': 'db_pool_size',
+    'pool_available': 'db_pool_available',
+    'requests_waiting': 'db_pool_requests_waiting',
+    'pool_max': 'db_pool_max_size',
+}
+
+
+def _connection_created(sender, connection, **kwargs):
+    metrics.increment('db_connections_opened_total', labels={'alias': connection.alias})
+
+
+def connect_signals():
+    connection_created.connect(_connection_created, dispatch_uid='core.db.connection_created')
+
+
+def pool_stats(alias='default'):
+    """psycopg pool statistics for ``alias``, or None if it is not pooled"""
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    for key, name in POOL_GAUGES.items():
+        if key in stats:
+            metrics.set_gauge(name, stats[key], labels={'alias': alias})
+    return stats
+
+
+def database_status():
+    """Connection settings, opened connections and pool usage per alias"""
+    status = {}
+    for alias in connections:
+        settings_dict = connections.settings[alias]
+        status[alias] = {
+            'vendor': connections[alias].vendor,
+            'conn_max_age': settings_dict.get('CONN_MAX_AGE', 0),
+            'health_checks': settings_dict.get('CONN_HEALTH_CHECKS', False),
+            'connections_opened': metrics.get_counter('db_connections_opened_total', {'alias': alias}),
+            'pool': pool_stats(alias),
+        }
+    return status
@@ -0,0 +1,231 @@
+"""
+Read-only list rendering from ``.values()`` rows.
+
+On large list responses most of the CPU goes to building a model instance
+per row and walking a ``ModelSerializer``'s fields for each of them.
+``ValuesSerializer`` compiles the fields of an existing serializer once into
+a plan of ``values()`` lookups (following the joins its dotted sources need)
+and converters, then maps plain row dicts straight to the output that
+serializer would have produced, key order included. Nested ``many=True``
+serializers are fetched with one query per relation, like
+``prefetch_related``. Properties the serializer reads from the model have no
+column to select: declare them in ``computed`` as functions of the row.
+
+``FastListMixin`` serves a viewset's ``list`` action this way; detail views
+and writes keep using the regular serializer. Disable with
+``FAST_READ_ENABLED=false``.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+DEFAULTS = {
+    'ENABLED': True,
+}
+
+# Fields whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+# Parent ids per nested query, below every backend's parameter limit
+NESTED_BATCH_SIZE = 900
+
+VALUE, COMPUTED, NESTED = range(3)
+
+
+def get_fastread_setting(name):
+    return getattr(settings, 'FAST_READ', {}).get(name, DEFAULTS[name])
+
+
+def full_name(first_name, last_name, username):
+    """``User.full_name`` from its columns"""
+    return f'{first_name} {last_name}'.strip() or username
+
+
+class Computed:
+    """
+    A field the model computes: ``function(row, context)`` given the row with
+    ``lookups`` selected. Raise ``SkipField`` to leave the key out, as DRF
+    does for a dotted source through a null relation.
+    """
+
+    def __init__(self, lookups, function):
+        self.lookups = list(lookups)
+        self.function = function
+
+
+class ValuesSerializer:
+    """Renders ``serializer_class``'s output from ``values()`` rows"""
+    serializer_class = None
+    # Output name -> Computed, for properties and methods
+    computed = {}
+    # Output name -> ValuesSerializer subclass, for many=True nested serializers
+    nested = {}
+
+    @classmethod
+    def plan(cls):
+        """(values() lookups, steps), compiled on first use"""
+        if '_plan' not in cls.__dict__:
+            cls._plan = cls.compile()
+        return cls._plan
+
+    @classmethod
+    def compile(cls):
+        serializer = cls.serializer_class()
+        model = serializer.Meta.model
+        lookups = ['pk']
+        steps = []
+        for field in serializer._readable_fields:
+            name = field.field_name
+            if name in cls.computed:
+                lookups += cls.computed[name].lookups
+                steps.append((name, COMPUTED, cls.computed[name].function, None, ()))
+            elif name in cls.nested:
+                relation = model._meta.get_field(field.source)
+                steps.append((name, NESTED, cls.nested[name], relation.field.attname, ()))
+            else:
+                lookup, guards, model_field = cls.resolve(model, field)
+                lookups += [lookup, *guards]
+                steps.append((name, VALUE, lookup, cls.converter(field, model_field), guards))
+        return list(dict.fromkeys(lookups)), steps
+
+    @classmethod
+    def resolve(cls, model, field):
+        """values() lookup for a field's source, and the nullable relations on its way"""
+        opts = model._meta
+        parts, guards = [], []
+        for position, attr in enumerate(field.source_attrs):
+            try:
+                model_field = opts.get_field(attr)
+            except FieldDoesNotExist:
+                model_field = None
+            last = position == len(field.source_attrs) - 1
+            if model_field is None or (not last and not (model_field.many_to_one or model_field.one_to_one)):
+                raise ImproperlyConfigured(
+                    f'{cls.__name__}: {field.field_name!r} reads {field.source!r}, which is not a column; '
+                    f'declare it in computed'
+                )
+            parts.append(attr)
+            if not last:
+                if model_field.null:
+                    # DRF leaves the key out when the relation is empty
+                    guards.append('__'.join(parts))
+                opts = model_field.related_model._meta
+        return '__'.join(parts), guards, model_field
+
+    @staticmethod
+    def converter(field, model_field):
+        """``convert(value, context)``, or None when the value is used as is"""
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            return None
+        if isinstance(field, IDENTITY_FIELDS):
+            return None
+        if isinstance(field, serializers.ChoiceField) and all(isinstance(key, str) for key in field.choices):
+            return None
+        if (
+            isinstance(field, serializers.DateTimeField)
+            and not hasattr(field, 'timezone')
+            and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601
+        ):
+            # DateTimeField.to_representation looks the time zone up for every value
+            def iso_datetime(value, context):
+                zone = context['timezone']
+                if zone is None or value.tzinfo is None:
+                    return field.to_representation(value)
+                text = value.astimezone(zone).isoformat()
+                return text[:-6] + 'Z' if text.endswith('+00:00') else text
+            return iso_datetime
+        if isinstance(field, serializers.FileField):
+            storage = model_field.storage
+            use_url = getattr(field, 'use_url', True)
+
+            def file_url(value, context):
+                if not value:
+                    return None
+                if not use_url:
+                    return value
+                url = storage.url(value)
+                request = context.get('request')
+                return request.build_absolute_uri(url) if request is not None else url
+            return file_url
+        return lambda value, context: field.to_representation(value)
+
+    @classmethod
+    def values(cls, queryset):
+        """``queryset`` selecting the plan's lookups"""
+        return queryset.prefetch_related(None).values(*cls.plan()[0])
+
+    @classmethod
+    def render(cls, rows, request=None):
+        """Output dicts for ``rows`` of ``values()``, in order"""
+        context = {
+            'request': request,
+            'now': timezone.now(),
+            'timezone': timezone.get_current_timezone() if settings.USE_TZ else None,
+        }
+        return cls.render_rows(list(rows), context)
+
+    @classmethod
+    def render_rows(cls, rows, context):
+        _, steps = cls.plan()
+        children = {}
+        for name, kind, nested, link, _ in steps:
+            if kind == NESTED:
+                children[name] = nested.fetch(link, [row['pk'] for row in rows], context)
+
+        output = []
+        for row in rows:
+            item = {}
+            for name, kind, source, convert, guards in steps:
+                if kind == VALUE:
+                    value = row[source]
+                    if guards and any(row[guard] is None for guard in guards):
+                        continue
+                    item[name] = value if convert is None or value is None else convert(value, context)
+                elif kind == COMPUTED:
+                    try:
+                        item[name] = source(row, context)
+                    except SkipField:
+                        continue
+                else:
+                    item[name] = children[name].get(row['pk'], [])
+            output.append(item)
+        return output
+
+    @classmethod
+    def fetch(cls, link, parent_ids, context):
+        """Rendered rows of this serializer's model per ``link`` (parent id), in default order"""
+        model = cls.serializer_class.Meta.model
+        grouped = defaultdict(list)
+        lookups = cls.plan()[0]
+        for start in range(0, len(parent_ids), NESTED_BATCH_SIZE):
+            batch = parent_ids[start:start + NESTED_BATCH_SIZE]
+            rows = list(model._default_manager.filter(**{f'{link}__in': batch}).values(*dict.fromkeys([link, *lookups])))
+            for row, item in zip(rows, cls.render_rows(rows, context)):
+                grouped[row[link]].append(item)
+        return grouped
+
+
+class FastListMixin:
+    """Serves the ``list`` action with ``values_serializer_class``"""
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.values_serializer_class is None or not get_fastread_setting('ENABLED'):
+            return super().list(request, *args, **kwargs)
+        fast = self.values_serializer_class
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.render(page, request))
+        return Response(fast.render(queryset, request))
@@ -0,0 +1,435 @@
+"""
+Index advice from a captured query workload.
+
+The workload is the statements the app runs, grouped by shape: literals and
+placeholders are replaced, so ``WHERE id = 1`` and ``WHERE id = 2`` are one
+statement and ``IN`` lists of any length match. It is read from the
+instrumentation's ``QUERY_LOG`` (live traffic, or ``manage.py test`` run
+with ``QUERY_LOG`` set) or from a ``django.db.backends`` debug log.
+
+The example of each statement is planned with ``EXPLAIN QUERY PLAN`` on
+SQLite or ``EXPLAIN (FORMAT JSON)`` on PostgreSQL, against the configured
+database, where the data is. A table the plan reads in full, holding at
+least ``min_rows`` rows, gets an index proposed from the statement's own
+predicates on it: equality columns, then the ORDER BY columns, then one
+range column, unless an existing index already starts with those columns.
+Its benefit is estimated as the rows read per call before (the table) and
+after (the table over the distinct values of the equality columns, or the
+LIMIT), times the calls in the workload; an index serving a range only is
+not estimated. ``verify()`` builds the index in a transaction that is rolled
+back, and plans and times the statement again.
+"""
+
+import json
+import math
+import re
+import time
+
+from django.apps import apps
+from django.db import DatabaseError, NotSupportedError, connections, models, transaction
+from django.db.migrations import AddIndex, Migration
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from .pagination import estimated_count
+
+# Statements EXPLAIN can plan without running them
+ANALYZED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'(?<![\w"])\d+(?:\.\d+)?(?![\w"])')
+PLACEHOLDER_LIST = re.compile(r'IN \(\?(?:, \?)*\)')
+# django.db.backends debug output: "(0.002) SELECT ...; args=(1,); alias=default"
+DJANGO_LOG_LINE = re.compile(r'\((?P<time>\d+\.\d+)\) (?P<sql>.+?); args=.*?(?:; alias=\w+)?$')
+
+# "table"."column", or T3."column" for a table Django aliased
+COLUMN = r'(?:"(?P<table>\w+)"|(?P<alias>T\d+))\."(?P<column>\w+)"'
+VALUE = r"(?:%s|\?|'|-?\d|TRUE\b|FALSE\b)"
+EQUALITY = re.compile(COLUMN + rf' (?:= {VALUE}|IN \(|IS NULL)', re.IGNORECASE)
+RANGE = re.compile(COLUMN + rf' (?:[<>]=? {VALUE}|BETWEEN )', re.IGNORECASE)
+ORDER_BY = re.compile(r' ORDER BY (?P<terms>.+?)(?= LIMIT | OFFSET | FOR UPDATE|\)|$)')
+ORDER_TERM = re.compile(rf'^{COLUMN}(?: (?P<direction>ASC|DESC))?(?: NULLS (?:FIRST|LAST))?$')
+LIMIT = re.compile(r' LIMIT (\d+)')
+ALIAS = re.compile(r'"(\w+)" (T\d+)\b')
+CONDITIONAL = re.compile(r'FILTER \(WHERE |CASE WHEN ')
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+# Columns of a proposed index
+MAX_COLUMNS = 3
+
+
+def normalize(sql):
+    """The shape of ``sql``: literals and placeholders as ``?``, whitespace collapsed"""
+    text = NUMBER.sub('?', STRING_LITERAL.sub('?', sql).replace('%s', '?'))
+    return PLACEHOLDER_LIST.sub('IN (...)', ' '.join(text.split()))
+
+
+class Statement:
+    """A statement shape in the workload, with one example to plan"""
+
+    def __init__(self, fingerprint, sql, params):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.params = params
+        self.calls = 0
+        self.time = 0.0
+        self.sources = set()
+        self.plan = []
+        self.cost = None
+        self.error = None
+
+
+class Workload:
+    def __init__(self):
+        self.statements = {}
+        self.ignored = 0
+
+    def add(self, sql, params=None, calls=1, seconds=0.0, source=None):
+        if not sql.lstrip().upper().startswith(ANALYZED):
+            self.ignored += calls
+            return
+        fingerprint = normalize(sql)
+        statement = self.statements.get(fingerprint)
+        if statement is None:
+            statement = self.statements[fingerprint] = Statement(fingerprint, sql, params)
+        statement.calls += calls
+        statement.time += seconds
+        if source:
+            statement.sources.add(source)
+
+    def read(self, lines):
+        """Add the statements of a QUERY_LOG file or of a django.db.backends debug log"""
+        for line in lines:
+            line = line.strip()
+            if line.startswith('{'):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get('sql'):
+                    self.add(
+                        record['sql'], record.get('params'), record.get('calls', 1),
+                        record.get('time', 0.0), record.get('source'),
+                    )
+                continue
+            match = DJANGO_LOG_LINE.search(line)
+            if match:
+                # Logged with the parameters already in the SQL
+                self.add(match['sql'], None, 1, float(match['time']))
+
+    def __len__(self):
+        return len(self.statements)
+
+
+def explain(connection, statement):
+    """Plan ``statement``; returns the tables it reads in full"""
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (FORMAT JSON) '
+    else:
+        raise NotSupportedError(f'index_advisor supports SQLite and PostgreSQL, not {connection.vendor}')
+    try:
+        # A savepoint: a failed EXPLAIN must not break the connection's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + statement.sql, statement.params)
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        statement.error = str(exc).strip()
+        return []
+
+    aliases = dict((alias, table) for table, alias in ALIAS.findall(statement.sql))
+    scanned = []
+    if connection.vendor == 'sqlite':
+        statement.plan = [row[-1] for row in rows]
+        for detail in statement.plan:
+            match = SQLITE_SCAN.match(detail)
+            if match:
+                scanned.append(aliases.get(match[1], match[1]))
+    else:
+        plan = rows[0][0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        root = plan[0]['Plan']
+        statement.cost = root['Total Cost']
+        statement.plan = []
+
+        def walk(node, depth):
+            relation = f' on {node["Relation Name"]}' if 'Relation Name' in node else ''
+            index = f' using {node["Index Name"]}' if 'Index Name' in node else ''
+            statement.plan.append(
+                f'{"  " * depth}{node["Node Type"]}{relation}{index} '
+                f'(cost={node["Total Cost"]} rows={node["Plan Rows"]})'
+            )
+            if node['Node Type'] == 'Seq Scan':
+                scanned.append(node['Relation Name'])
+            for child in node.get('Plans', []):
+                walk(child, depth + 1)
+        walk(root, 0)
+    return list(dict.fromkeys(scanned))
+
+
+def _row_filters(sql):
+    """``sql`` without conditions that do not filter rows: aggregate FILTERs and CASE WHENs"""
+    parts = []
+    position = 0
+    for match in CONDITIONAL.finditer(sql):
+        if match.start() < position:
+            continue
+        parts.append(sql[position:match.start()])
+        if match[0] == 'CASE WHEN ':
+            end = sql.find(' END', match.end())
+            position = len(sql) if end == -1 else end + len(' END')
+            continue
+        depth = 1
+        position = match.end()
+        while position < len(sql) and depth:
+            depth += {'(': 1, ')': -1}.get(sql[position], 0)
+            position += 1
+    parts.append(sql[position:])
+    return ''.join(parts)
+
+
+def predicates(sql, table):
+    """(equality, order by, range) columns of ``table`` in ``sql``"""
+    aliases = dict((alias, name) for name, alias in ALIAS.findall(sql))
+    sql = _row_filters(sql)
+
+    def on_table(match):
+        return (match['table'] or aliases.get(match['alias'])) == table
+
+    equality = list(dict.fromkeys(match['column'] for match in EQUALITY.finditer(sql) if on_table(match)))
+    ranges = [match['column'] for match in RANGE.finditer(sql) if on_table(match)]
+    order = []
+    clauses = ORDER_BY.findall(sql)
+    if clauses:
+        # The outermost ORDER BY; an index serves it only up to the first other table's column
+        for term in clauses[-1].split(', '):
+            match = ORDER_TERM.match(term.strip())
+            if match is None or not on_table(match):
+                break
+            order.append((match['column'], (match['direction'] or 'ASC').upper() == 'DESC'))
+    return equality, order, ranges
+
+
+class Proposal:
+    """An index for ``model`` and the statements it would serve"""
+
+    def __init__(self, model, fields, rows):
+        self.model = model
+        self.fields = fields
+        self.index = models.Index(fields=fields)
+        self.index.set_name_with_model(model)
+        self.rows = rows
+        # statement -> estimated rows read per call with the index, None if unknown
+        self.served = {}
+        self.verified = None
+
+    @property
+    def statements(self):
+        return list(self.served)
+
+    @property
+    def calls(self):
+        return sum(statement.calls for statement in self.served)
+
+    @property
+    def rows_after(self):
+        """Rows read per call by the statement served worst, None if unknown for all"""
+        known = [rows for rows in self.served.values() if rows is not None]
+        return max(known) if known else None
+
+    @property
+    def rows_saved(self):
+        """Rows not read over the whole workload, as far as estimated"""
+        return sum(
+            (self.rows - rows) * statement.calls for statement, rows in self.served.items() if rows is not None
+        )
+
+    def serves(self, other):
+        """Whether this index also serves the statements of ``other``"""
+        return other.model is self.model and self.fields[:len(other.fields)] == other.fields
+
+    def declaration(self):
+        fields = ', '.join(repr(field) for field in self.fields)
+        return f'models.Index(fields=[{fields}], name={self.index.name!r})'
+
+
+def _existing_indexes(connection, table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        constraint['columns'] for constraint in constraints.values()
+        if constraint['columns'] and (constraint['index'] or constraint['primary_key'] or constraint['unique'])
+    ]
+
+
+def _row_count(model, using):
+    queryset = model._base_manager.using(using).all()
+    estimate = estimated_count(queryset)
+    return estimate if estimate is not None else queryset.count()
+
+
+class Finding:
+    """A statement reading ``table`` in full; ``proposal`` is None when no index is proposed, see ``reason``"""
+
+    def __init__(self, statement, table, rows, proposal=None, reason=''):
+        self.statement = statement
+        self.table = table
+        self.rows = rows
+        self.proposal = proposal
+        self.reason = reason
+
+
+def propose(connection, statement, model, rows):
+    """(fields, estimated rows read per call or None) of an index for ``statement`` on ``model``, or (None, reason)"""
+    table = model._meta.db_table
+    if model._meta.auto_created:
+        return None, 'table of a many-to-many field'
+    equality, order, ranges = predicates(statement.sql, table)
+    columns = list(equality)
+    directions = {}
+    for column, descending in order:
+        if column not in columns:
+            columns.append(column)
+            directions[column] = descending
+    for column in ranges:
+        if column not in columns:
+            columns.append(column)
+            break
+    columns = columns[:MAX_COLUMNS]
+    if not columns:
+        return None, 'no filter or ordering on this table to index'
+
+    by_column = {field.column: field for field in model._meta.concrete_fields}
+    if any(column not in by_column for column in columns):
+        return None, 'filters on columns the model does not define'
+    for existing in _existing_indexes(connection, table):
+        if existing[:len(columns)] == columns:
+            return None, f'an index on ({", ".join(existing)}) exists; the planner prefers the scan'
+
+    fields = [('-' if directions.get(column) else '') + by_column[column].name for column in columns]
+    leading = [by_column[column].name for column in columns if column in equality]
+    limit = LIMIT.search(statement.sql)
+    if leading:
+        distinct = model._base_manager.using(connection.alias).values(*leading).distinct().count()
+        rows_after = math.ceil(rows / max(distinct, 1))
+    elif limit and order:
+        rows_after = min(int(limit[1]), rows)
+    else:
+        # Depends on the range's bounds
+        rows_after = None
+    return fields, rows_after
+
+
+def analyze(workload, using='default', min_rows=1000, min_calls=1):
+    """(findings, proposals best first) for the statements of ``workload``"""
+    connection = connections[using]
+    models_by_table = {model._meta.db_table: model for model in apps.get_models(include_auto_created=True)}
+    rows_by_table = {}
+    findings = []
+    proposals = {}
+    for statement in sorted(workload.statements.values(), key=lambda statement: -statement.calls):
+        if statement.calls < min_calls:
+            continue
+        for table in explain(connection, statement):
+            model = models_by_table.get(table)
+            if model is None:
+                continue
+            if table not in rows_by_table:
+                rows_by_table[table] = _row_count(model, using)
+            rows = rows_by_table[table]
+            if rows < min_rows:
+                continue
+            fields, estimate = propose(connection, statement, model, rows)
+            if fields is None:
+                # The estimate is the reason no index is proposed
+                findings.append(Finding(statement, table, rows, reason=estimate))
+                continue
+            # Statements asking for the same index share one proposal
+            proposal = proposals.setdefault((model, tuple(fields)), Proposal(model, fields, rows))
+            proposal.served[statement] = estimate
+            findings.append(Finding(statement, table, rows, proposal))
+
+    # An index whose fields start another proposal's is not needed next to it
+    merged = {}
+    for proposal in sorted(proposals.values(), key=lambda proposal: -len(proposal.fields)):
+        wider = next((kept for kept in merged.values() if kept.serves(proposal)), None)
+        if wider is None:
+            merged[id(proposal)] = proposal
+        else:
+            for statement, rows_after in proposal.served.items():
+                wider.served.setdefault(statement, rows_after)
+            merged[id(proposal)] = wider
+    for finding in findings:
+        if finding.proposal is not None:
+            finding.proposal = merged[id(finding.proposal)]
+    kept = list({id(proposal): proposal for proposal in merged.values()}.values())
+    return findings, sorted(kept, key=lambda proposal: (-proposal.rows_saved, -proposal.calls))
+
+
+def _time_statement(connection, statement, repeat=3):
+    best = None
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(statement.sql, statement.params)
+            cursor.fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def verify(proposal, using='default'):
+    """
+    Build the proposed index in a transaction that is rolled back, plan the
+    statements again and time the first SELECT before and after. Building an
+    index locks the table against writes: run it on a copy of production.
+    """
+    connection = connections[using]
+    statement = proposal.statements[0]
+    selects = statement.sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+    result = {'uses_index': False, 'before_ms': None, 'after_ms': None, 'plan': []}
+    with transaction.atomic(using=using):
+        if selects:
+            result['before_ms'] = round(_time_statement(connection, statement) * 1000, 2)
+        editor = connection.schema_editor()
+        editor.add_index(proposal.model, proposal.index)
+        replanned = Statement(statement.fingerprint, statement.sql, statement.params)
+        explain(connection, replanned)
+        result['plan'] = replanned.plan
+        result['uses_index'] = any(proposal.index.name in line for line in replanned.plan)
+        if selects:
+            result['after_ms'] = round(_time_statement(connection, statement) * 1000, 2)
+        transaction.set_rollback(True, using=using)
+    proposal.verified = result
+    return result
+
+
+def migration_snippets(proposals, using='default'):
+    """{app_label: migration file text} adding the proposed indexes"""
+    connection = connections[using]
+    loader = MigrationLoader(connection, ignore_no_migrations=True)
+    concurrently = connection.vendor == 'postgresql'
+    if concurrently:
+        # Builds without locking the table against writes
+        from django.contrib.postgres.operations import AddIndexConcurrently as operation
+    else:
+        operation = AddIndex
+
+    by_app = {}
+    for proposal in proposals:
+        by_app.setdefault(proposal.model._meta.app_label, []).append(proposal)
+    snippets = {}
+    for app_label, items in by_app.items():
+        migration = Migration('index_advisor', app_label)
+        migration.dependencies = sorted(loader.graph.leaf_nodes(app_label))
+        migration.operations = [
+            operation(model_name=proposal.model._meta.model_name, index=proposal.index) for proposal in items
+        ]
+        text = MigrationWriter(migration, include_header=False).as_string()
+        if concurrently:
+            text = text.replace(
+                'class Migration(migrations.Migration):\n',
+                'class Migration(migrations.Migration):\n    atomic = False\n',
+                1,
+            )
+        snippets[app_label] = text
+    return snippets
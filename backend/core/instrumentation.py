@@ -0,0 +1,261 @@
+"""
+Per-request and per-consumer-event instrumentation.
+
+While a request (or a Channels consumer event) runs, every SQL query passes
+through an ``execute_wrapper`` that counts it, times it and tallies its SQL
+text. The wrapper is installed on every connection and finds the profile in
+a context variable, so queries that an async view or a sync view under ASGI
+runs on another thread are counted too. Parameters are sent separately, so a query repeated with different ids
+has the same text; a text seen ``N_PLUS_ONE_THRESHOLD`` times or more is
+reported as a likely N+1. Serializer time is the time spent producing
+``serializer.data``.
+
+Results go into the histograms of ``core.metrics`` (served at ``/metrics``)
+and, for HTTP with ``SERVER_TIMING`` on, a ``Server-Timing`` response header.
+It is off by default: every client could read the query counts and timings
+of every view. Consumer events can also be sampled by ``core.profiling``.
+
+With ``QUERY_LOG`` set to a file path, each request and event also appends
+one JSON line per distinct query to it (an example with its parameters, the
+number of calls and their time), the workload ``index_advisor`` reads. The
+parameters are real values: capture on staging or during a test run.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': False,
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'QUERY_LOG': '',
+}
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# "IN (%s, %s, %s)" is one signature whatever the number of ids
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_profile = ContextVar('request_profile', default=None)
+
+
+def get_instrumentation_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+class Profile:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.signatures = {}
+        # signature -> [sql, params, seconds], kept for the query log
+        self.examples = {} if get_instrumentation_setting('QUERY_LOG') else None
+        # Queries of one request can run on several threads at once
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            signature = IN_LIST.sub('IN (...)', sql)
+            with self._lock:
+                self.db_time += elapsed
+                self.queries += 1
+                self.signatures[signature] = self.signatures.get(signature, 0) + 1
+                if self.examples is not None and not many:
+                    example = self.examples.setdefault(signature, [sql, params, 0.0])
+                    example[2] += elapsed
+
+    def repeated(self):
+        """``{signature: count}`` of the queries that look like an N+1"""
+        threshold = get_instrumentation_setting('N_PLUS_ONE_THRESHOLD')
+        return {sql: count for sql, count in self.signatures.items() if count >= threshold}
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+connection_created.connect(_connection_created, dispatch_uid='core.instrumentation.connection_created')
+
+
+@contextmanager
+def profile_queries():
+    """Record the queries run in this block, on any thread, on every configured database"""
+    # Connections opened before this module was imported
+    for alias in connections:
+        install_query_recorder(connections[alias])
+    profile = Profile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+
+
+# (labels, signature) pairs already logged by this process
+_logged = set()
+
+
+def _report_repeated(profile, labels):
+    repeated = profile.repeated()
+    if repeated:
+        metrics.increment('n_plus_one_total', labels=labels)
+        for sql, count in repeated.items():
+            key = (tuple(sorted(labels.items())), sql)
+            if key not in _logged:
+                _logged.add(key)
+                logger.warning('Repeated query (%d times) in %s: %s', count, labels, sql[:300])
+    return repeated
+
+
+_query_log_lock = threading.Lock()
+
+
+def _write_query_log(profile, source):
+    """Append ``profile``'s queries to the QUERY_LOG file"""
+    if not profile.examples:
+        return
+    lines = [
+        json.dumps({
+            'source': source,
+            'sql': sql,
+            'params': list(params) if isinstance(params, (list, tuple)) else params,
+            'calls': profile.signatures[signature],
+            'time': round(seconds, 6),
+        }, cls=DjangoJSONEncoder)
+        for signature, (sql, params, seconds) in profile.examples.items()
+    ]
+    try:
+        with _query_log_lock, open(get_instrumentation_setting('QUERY_LOG'), 'a') as log:
+            log.write('\n'.join(lines) + '\n')
+    except (OSError, TypeError, ValueError):
+        logger.exception('Could not write the query log')
+
+
+@contextmanager
+def instrument_event(consumer, event):
+    """Time a Channels consumer event and record its queries"""
+    if not get_instrumentation_setting('ENABLED'):
+        yield None
+        return
+    labels = {'consumer': consumer, 'event': event}
+    started = time.perf_counter()
+    with profiling.profile(f'{consumer}.{event}'), profile_queries() as profile:
+        yield profile
+    metrics.observe('channels_event_duration_seconds', time.perf_counter() - started, labels)
+    metrics.observe('channels_event_db_seconds', profile.db_time, labels)
+    metrics.observe('channels_event_queries', profile.queries, labels, buckets=QUERY_BUCKETS)
+    _report_repeated(profile, labels)
+    _write_query_log(profile, f'{consumer}.{event}')
+
+
+def _timed_data(getter):
+    def data(self):
+        profile = _profile.get()
+        if profile is None or profile.serializer_depth:
+            return getter(self)
+        # Only the outermost .data; nested serializers are part of it
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            profile.serializer_depth -= 1
+            profile.serializer_time += time.perf_counter() - started
+    return property(data)
+
+
+def install_serializer_timing():
+    """Time ``Serializer.data``/``ListSerializer.data`` while a profile is active"""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, '_instrumented', False):
+            cls.data = _timed_data(cls.data.fget)
+            cls.data.fget._instrumented = True
+
+
+class InstrumentationMiddleware:
+    """Server-Timing header and per-route request histograms"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not get_instrumentation_setting('ENABLED'):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with profile_queries() as profile:
+            response = self.get_response(request)
+        return self.record(request, response, profile, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not get_instrumentation_setting('ENABLED'):
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        with profile_queries() as profile:
+            response = await self.get_response(request)
+        return self.record(request, response, profile, time.perf_counter() - started)
+
+    def record(self, request, response, profile, total):
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match is not None else 'unmatched'
+        labels = {'route': route, 'method': request.method}
+        metrics.increment('http_requests_total', labels={**labels, 'status': response.status_code})
+        metrics.observe('http_request_duration_seconds', total, labels)
+        metrics.observe('http_request_db_seconds', profile.db_time, labels)
+        metrics.observe('http_request_serializer_seconds', profile.serializer_time, labels)
+        metrics.observe('http_request_queries', profile.queries, labels, buckets=QUERY_BUCKETS)
+        repeated = _report_repeated(profile, labels)
+        _write_query_log(profile, f'{request.method} {route}')
+
+        if get_instrumentation_setting('SERVER_TIMING'):
+            timings = [
+                f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries"',
+                f'serialize;dur={profile.serializer_time * 1000:.2f}',
+                f'total;dur={total * 1000:.2f}',
+            ]
+            if repeated:
+                timings.append(f'nplusone;desc="{sum(repeated.values())} repeated queries"')
+            response['Server-Timing'] = ', '.join(timings)
+        return response
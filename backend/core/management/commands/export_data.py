@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from core import dataio
+
+
+class Command(BaseCommand):
+    help = 'Stream model data to a directory of JSONL files, one per model, in dependency order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory to write the export to')
+        parser.add_argument(
+            '--apps', nargs='+', default=dataio.DEFAULT_APPS,
+            help='App labels to export (default: %(default)s)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows fetched per query')
+        parser.add_argument('--compress', action='store_true', help='Gzip the JSONL files')
+
+    def handle(self, *args, **options):
+        entries = dataio.export_models(
+            options['directory'],
+            app_labels=options['apps'],
+            batch_size=options['batch_size'],
+            compress=options['compress'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        for entry in entries:
+            self.stdout.write(f"{entry['model']}: {entry['count']} rows")
+        self.stdout.write(self.style.SUCCESS(f"Exported {len(entries)} models to {options['directory']}"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from core import dataio
+
+
+class Command(BaseCommand):
+    help = 'Load a directory written by export_data using batched bulk inserts; re-run to resume'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory written by export_data')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+        parser.add_argument('--fresh', action='store_true', help='Ignore saved progress and start over')
+
+    def handle(self, *args, **options):
+        try:
+            importer = dataio.Importer(
+                options['directory'],
+                batch_size=options['batch_size'],
+                fresh=options['fresh'],
+                log=self.stdout.write if options['verbosity'] > 0 else None,
+            )
+            counts = importer.run()
+        except (OSError, ValueError, IntegrityError) as e:
+            raise CommandError(f'Import failed: {e}')
+
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} rows across {len(counts)} models'))
@@ -0,0 +1,150 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from core.index_advisor import Workload, analyze, migration_snippets, verify
+
+SQL_PREVIEW = 160
+
+
+class Command(BaseCommand):
+    help = (
+        'Plan the statements of a captured query workload and propose indexes for the large '
+        'tables they read in full. Capture with INSTRUMENTATION QUERY_LOG=<file> (on a server, '
+        'or "QUERY_LOG=<file> manage.py test"), or pass a django.db.backends debug log. '
+        'Statements are planned against the configured database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('logs', nargs='+', help='QUERY_LOG files or django.db.backends debug logs')
+        parser.add_argument('--database', default='default', help='Database to plan against')
+        parser.add_argument('--min-rows', type=int, default=1000, help='Ignore full scans of smaller tables')
+        parser.add_argument('--min-calls', type=int, default=1, help='Ignore statements run fewer times')
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Build each index in a rolled back transaction and time the statement with it '
+                 '(locks the table while building: use a copy of production)',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        workload = Workload()
+        for path in options['logs']:
+            try:
+                with open(path) as log:
+                    workload.read(log)
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+        if not len(workload):
+            raise CommandError('No SELECT, UPDATE or DELETE statements in the logs')
+
+        try:
+            findings, proposals = analyze(
+                workload, using=options['database'], min_rows=options['min_rows'], min_calls=options['min_calls'],
+            )
+        except NotSupportedError as exc:
+            raise CommandError(str(exc))
+        if options['verify']:
+            for proposal in proposals:
+                verify(proposal, using=options['database'])
+        snippets = migration_snippets(proposals, using=options['database'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(self.report(workload, findings, proposals, snippets), indent=2))
+        else:
+            self.print_report(workload, findings, proposals, snippets, options['verbosity'])
+
+    def report(self, workload, findings, proposals, snippets):
+        return {
+            'statements': len(workload),
+            'calls': sum(statement.calls for statement in workload.statements.values()),
+            'failed': [
+                {'sql': statement.fingerprint, 'error': statement.error}
+                for statement in workload.statements.values() if statement.error
+            ],
+            'scans': [
+                {
+                    'table': finding.table,
+                    'rows': finding.rows,
+                    'sql': finding.statement.fingerprint,
+                    'calls': finding.statement.calls,
+                    'plan': finding.statement.plan,
+                    'cost': finding.statement.cost,
+                    'index': finding.proposal.index.name if finding.proposal else None,
+                    'reason': finding.reason,
+                }
+                for finding in findings
+            ],
+            'proposals': [
+                {
+                    'model': proposal.model._meta.label,
+                    'name': proposal.index.name,
+                    'fields': proposal.fields,
+                    'calls': proposal.calls,
+                    'rows': proposal.rows,
+                    'rows_after': proposal.rows_after,
+                    'rows_saved': proposal.rows_saved,
+                    'statements': [statement.fingerprint for statement in proposal.statements],
+                    'verified': proposal.verified,
+                }
+                for proposal in proposals
+            ],
+            'migrations': snippets,
+        }
+
+    def print_report(self, workload, findings, proposals, snippets, verbosity):
+        statements = workload.statements.values()
+        failed = [statement for statement in statements if statement.error]
+        self.stdout.write(
+            f'{len(workload)} statements, {sum(statement.calls for statement in statements):,} calls; '
+            f'{len(failed)} could not be planned, {workload.ignored:,} other statements ignored'
+        )
+        if verbosity > 1:
+            for statement in failed:
+                self.stdout.write(f'  {statement.error}: {statement.fingerprint[:SQL_PREVIEW]}')
+
+        if not findings:
+            self.stdout.write(self.style.SUCCESS('No full scans of large tables'))
+            return
+        self.stdout.write('\nFull scans of large tables:')
+        for finding in findings:
+            statement = finding.statement
+            self.stdout.write(
+                f'  {finding.table} ({finding.rows:,} rows), {statement.calls:,} calls, '
+                f'{statement.time * 1000:.1f} ms: {statement.fingerprint[:SQL_PREVIEW]}'
+            )
+            if verbosity > 1:
+                for line in statement.plan:
+                    self.stdout.write(f'      {line}')
+            outcome = f'index {finding.proposal.index.name}' if finding.proposal else finding.reason
+            self.stdout.write(f'    -> {outcome}')
+
+        if not proposals:
+            return
+        self.stdout.write('\nProposed indexes, most rows saved first:')
+        for number, proposal in enumerate(proposals, 1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{number}. {proposal.model._meta.label}: {proposal.declaration()}'
+            ))
+            if proposal.rows_after is None:
+                estimate = 'rows read per call depend on the range bounds, see --verify'
+            else:
+                estimate = (
+                    f'rows read per call {proposal.rows:,} -> ~{proposal.rows_after:,} '
+                    f'({proposal.rows_saved:,} fewer in this workload)'
+                )
+            self.stdout.write(f'   {len(proposal.statements)} statements, {proposal.calls:,} calls; {estimate}')
+            verified = proposal.verified
+            if verified is not None:
+                used = 'uses the index' if verified['uses_index'] else 'does NOT use the index'
+                timing = (
+                    f', {verified["before_ms"]} ms -> {verified["after_ms"]} ms'
+                    if verified['before_ms'] is not None else ''
+                )
+                self.stdout.write(f'   Verified: the plan {used}{timing}')
+
+        self.stdout.write("\nMigrations (declare the same indexes in each model's Meta.indexes):")
+        for app_label, text in snippets.items():
+            self.stdout.write(f'\n# {app_label}/migrations/XXXX_index_advisor.py')
+            self.stdout.write(text)
@@ -0,0 +1,108 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from chat.models import ChatMessage
+from chat.serializers import ChatMessageSerializer, ChatMessageValuesSerializer
+from tasks.serializers import TaskSerializer, TaskValuesSerializer
+from tasks.views import TaskViewSet
+from users.models import User
+from users.serializers import UserSerializer, UserValuesSerializer
+
+# name -> (queryset, ModelSerializer, ValuesSerializer). The model serializers get
+# the joins they need, so the comparison is of serialization, not N+1 queries.
+TARGETS = {
+    'tasks': (lambda: TaskViewSet.queryset.order_by('pk'), TaskSerializer, TaskValuesSerializer),
+    'users': (lambda: User.objects.select_related('institution').order_by('pk'), UserSerializer, UserValuesSerializer),
+    'chat': (
+        lambda: ChatMessage.objects.select_related('sender', 'recipient').order_by('pk'),
+        ChatMessageSerializer,
+        ChatMessageValuesSerializer,
+    ),
+}
+
+MODEL_CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rendering list responses with the model serializers and with the '
+        'values()-based serializers, on the rows in the configured database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='1000,10000,100000', help='Comma separated row counts')
+        parser.add_argument('--targets', default=','.join(TARGETS), help='Comma separated lists to render')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the fastest is kept')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        targets = [target.strip() for target in options['targets'].split(',') if target.strip()]
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f'Unknown targets: {", ".join(sorted(unknown))}')
+        sizes = [int(size) for size in options['rows'].split(',') if size.strip()]
+
+        report = {}
+        for target in targets:
+            available = TARGETS[target][0]().count()
+            results = report.setdefault(target, [])
+            for size in sizes:
+                rows = min(size, available)
+                if results and results[-1]['rows'] == rows:
+                    # Not enough rows for this size: the whole table was already rendered
+                    continue
+                results.append(self.measure(target, rows, options['repeat']))
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def measure(self, target, rows, repeat):
+        queryset, serializer_class, values_serializer = TARGETS[target]
+        renderer = JSONRenderer()
+
+        def render_model():
+            # prefetch_related puts every parent id in one IN clause, which SQLite
+            # rejects for tens of thousands of rows, so the model path goes in chunks
+            data = []
+            for start in range(0, rows, MODEL_CHUNK_SIZE):
+                data += serializer_class(queryset()[start:min(start + MODEL_CHUNK_SIZE, rows)], many=True).data
+            return renderer.render(data)
+
+        def render_values():
+            return renderer.render(values_serializer.render(values_serializer.values(queryset()[:rows])))
+
+        result = {'rows': rows}
+        outputs = {}
+        for name, render in (('model', render_model), ('values', render_values)):
+            timings = []
+            for _ in range(repeat):
+                reset_queries()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    outputs[name] = render()
+                    timings.append((time.perf_counter() - started) * 1000)
+            result[f'{name}_ms'] = round(min(timings), 1)
+            result[f'{name}_queries'] = len(queries)
+        result['speedup'] = round(result['model_ms'] / result['values_ms'], 2) if result['values_ms'] else None
+        result['identical'] = outputs['model'] == outputs['values']
+        return result
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{"list":<8}{"rows":>8}{"model ms":>11}{"values ms":>11}{"speedup":>9}'
+            f'{"queries":>10}{"identical":>11}'
+        )
+        for target, results in report.items():
+            for result in results:
+                self.stdout.write(
+                    f'{target:<8}{result["rows"]:>8}{result["model_ms"]:>11.1f}{result["values_ms"]:>11.1f}'
+                    f'{result["speedup"] or 0:>8.2f}x'
+                    f'{result["model_queries"]:>5}/{result["values_queries"]:<4}{str(result["identical"]):>11}'
+                )
@@ -0,0 +1,184 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+
+from chat.management.commands.chat_loadtest import percentile
+
+# Environment for each benchmarked configuration
+MODES = {
+    'default': {'SQLITE_PRODUCTION': 'false', 'SQLITE_WRITER_QUEUE': 'false'},
+    'production': {'SQLITE_PRODUCTION': 'true', 'SQLITE_WRITER_QUEUE': 'false'},
+    'production+queue': {'SQLITE_PRODUCTION': 'true', 'SQLITE_WRITER_QUEUE': 'true'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent write throughput and "database is locked" errors on a '
+        'scratch SQLite database, with and without the SQLITE production settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--readers', type=int, default=2, help='Concurrent reader threads')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run each mode for')
+        parser.add_argument('--modes', default=','.join(MODES), help='Comma separated modes to compare')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        # Internal: run the workload in this process against DATABASE_URL
+        parser.add_argument('--worker', action='store_true', help='Run one mode (used by the parent process)')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_workload(options)))
+            return
+
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'Unknown modes: {", ".join(sorted(unknown))}')
+
+        report = {}
+        for mode in modes:
+            if not options['json']:
+                self.stdout.write(f'Running {mode}...')
+            report[mode] = self.run_mode(mode, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def run_mode(self, mode, options):
+        """Each mode gets a fresh database and a fresh process, so settings apply from startup"""
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                **MODES[mode],
+                'DATABASE_URL': f'sqlite:///{os.path.join(directory, "bench.sqlite3")}',
+            }
+            # Replicas do not apply to the scratch database
+            env.pop('DB_REPLICA_URLS', None)
+            result = subprocess.run(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'sqlite_benchmark', '--worker',
+                    '--threads', str(options['threads']), '--readers', str(options['readers']),
+                    '--duration', str(options['duration']),
+                ],
+                env=env, capture_output=True, text=True,
+            )
+        if result.returncode != 0:
+            raise CommandError(f'{mode} failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run_workload(self, options):
+        from chat.models import ChatMessage
+        from core.sqlite import writer
+        from projects.models import Project
+        from tasks.models import Task
+        from users.models import User
+
+        call_command('migrate', verbosity=0)
+        user = User.objects.create_user('bench', role='supervisor')
+        project = Project.objects.create(title='Benchmark', description='', created_by=user)
+        task_ids = [
+            Task.objects.create(project=project, title=f'Task {i}', description='', assignee=user).pk
+            for i in range(20)
+        ]
+        connection.close()
+
+        def write_unit(rng):
+            # Read-then-write, the pattern that makes deferred transactions fail fast
+            with transaction.atomic():
+                task = Task.objects.get(pk=rng.choice(task_ids))
+                Task.objects.filter(pk=task.pk).update(progress=(task.progress + 1) % 100)
+                ChatMessage.objects.create(sender_id=user.pk, content='benchmark', chat_type='group')
+
+        lock = threading.Lock()
+        stats = {'writes': 0, 'reads': 0, 'errors': {}, 'latencies': []}
+        deadline = time.perf_counter() + options['duration']
+
+        def writer_thread(seed):
+            rng = random.Random(seed)
+            latencies = []
+            writes = 0
+            errors = {}
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    writer.run(write_unit, rng)
+                    writes += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except OperationalError as e:
+                    errors[str(e)] = errors.get(str(e), 0) + 1
+            connection.close()
+            with lock:
+                stats['writes'] += writes
+                stats['latencies'].extend(latencies)
+                for message, count in errors.items():
+                    stats['errors'][message] = stats['errors'].get(message, 0) + count
+
+        def reader_thread():
+            reads = 0
+            while time.perf_counter() < deadline:
+                try:
+                    list(ChatMessage.objects.order_by('-timestamp')[:20])
+                    reads += 1
+                except OperationalError:
+                    pass
+            connection.close()
+            with lock:
+                stats['reads'] += reads
+
+        threads = [threading.Thread(target=writer_thread, args=(i,)) for i in range(options['threads'])]
+        threads += [threading.Thread(target=reader_thread) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writer.shutdown()
+
+        latencies = sorted(stats['latencies'])
+        errors = sum(stats['errors'].values())
+        attempts = stats['writes'] + errors
+        return {
+            'journal_mode': connection.cursor().execute('PRAGMA journal_mode').fetchone()[0],
+            'seconds': round(elapsed, 2),
+            'writes': stats['writes'],
+            'writes_per_second': round(stats['writes'] / elapsed, 1),
+            'reads_per_second': round(stats['reads'] / elapsed, 1),
+            'errors': errors,
+            'error_rate': round(errors / attempts, 4) if attempts else 0,
+            'error_messages': stats['errors'],
+            'write_p50_ms': round(percentile(latencies, 50) or 0, 2),
+            'write_p95_ms': round(percentile(latencies, 95) or 0, 2),
+            'write_max_ms': round(latencies[-1], 2) if latencies else None,
+        }
+
+    def print_report(self, report):
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"mode":<18} {"journal":>8} {"writes/s":>9} {"reads/s":>9} {"errors":>7} '
+            f'{"err rate":>9} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>9}'
+        )
+        for mode, result in report.items():
+            self.stdout.write(
+                f'{mode:<18} {result["journal_mode"]:>8} {result["writes_per_second"]:>9} '
+                f'{result["reads_per_second"]:>9} {result["errors"]:>7} {result["error_rate"]:>9.2%} '
+                f'{result["write_p50_ms"]:>8} {result["write_p95_ms"]:>8} {result["write_max_ms"] or 0:>9}'
+            )
+        for mode, result in report.items():
+            for message, count in result['error_messages'].items():
+                self.stderr.write(f'{mode}: {count} x {message}')
+        self.stdout.write(self.style.SUCCESS('SQLite benchmark complete'))
@@ -0,0 +1,223 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ENTRIES = {
+    'asgi': 'core.asgi',
+    'wsgi': 'core.wsgi',
+}
+
+PROFILES = {
+    'full': 'core.settings',
+    'api': 'core.settings_api',
+}
+
+# Optional or admin-only modules a worker should not pay for at startup
+WATCHED_MODULES = (
+    'PIL',
+    'redis',
+    'channels_redis',
+    'msgpack',
+    'multiprocessing.pool',
+    # Loaded by admin autodiscovery (DRF itself imports django.contrib.admin)
+    'django.contrib.auth.admin',
+    'django.contrib.sessions.middleware',
+    'django.contrib.messages.middleware',
+    'channels.routing',
+    'chat.consumers',
+)
+
+# Runs in a fresh interpreter under -X importtime: import the entry point, then
+# serve one request through it and report the timings as JSON on stdout
+WORKER = r'''
+import asyncio, importlib, io, json, resource, sys, time
+
+entry, path, watched = sys.argv[1], sys.argv[2], sys.argv[3].split(',')
+started = time.perf_counter()
+application = importlib.import_module(entry).application
+imported = time.perf_counter()
+
+
+async def asgi_request():
+    messages = []
+    received = asyncio.Event()
+
+    async def receive():
+        if received.is_set():
+            await asyncio.Future()
+        received.set()
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    await application(scope, receive, send)
+    return next(message['status'] for message in messages if message['type'] == 'http.response.start')
+
+
+def wsgi_request():
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+    }
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(body)
+    body.close()
+    return int(statuses[0].split()[0])
+
+
+status = asyncio.run(asgi_request()) if entry.endswith('asgi') else wsgi_request()
+finished = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'first_request_seconds': finished - imported,
+    'status': status,
+    'modules': len(sys.modules),
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'watched': [name for name in watched if name in sys.modules],
+}))
+'''
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def package_of(module):
+    """Group django by subpackage (django.contrib.admin), everything else by top-level name"""
+    parts = module.split('.')
+    if parts[0] == 'django':
+        return '.'.join(parts[:3] if len(parts) > 2 and parts[1] == 'contrib' else parts[:2])
+    return parts[0]
+
+
+def parse_import_times(stderr):
+    """``{module: (self_us, cumulative_us)}`` from -X importtime output"""
+    times = {}
+    for line in stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the cold start of the ASGI and WSGI entry points: import time per '
+        'module and package, time to the first response, and which optional modules load'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', default=','.join(ENTRIES), help='Comma separated entry points (asgi, wsgi)')
+        parser.add_argument('--profiles', default=','.join(PROFILES), help='Comma separated settings profiles (full, api)')
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes per combination')
+        parser.add_argument('--path', default='/api/health/db/', help='Path of the first request')
+        parser.add_argument('--top', type=int, default=15, help='Slowest modules and packages to list')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        entries = self.parse_choice(options['entries'], ENTRIES, 'entries')
+        profiles = self.parse_choice(options['profiles'], PROFILES, 'profiles')
+
+        report = {}
+        for profile in profiles:
+            for entry in entries:
+                if not options['json']:
+                    self.stdout.write(f'Running {entry} with {profile} settings...')
+                report[f'{entry}/{profile}'] = self.run_combination(entry, profile, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report, options['top'])
+
+    def parse_choice(self, value, choices, name):
+        selected = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = set(selected) - set(choices)
+        if unknown:
+            raise CommandError(f'Unknown {name}: {", ".join(sorted(unknown))}')
+        return selected
+
+    def run_once(self, entry, profile, options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': PROFILES[profile]}
+        result = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c', WORKER,
+                ENTRIES[entry], options['path'], ','.join(WATCHED_MODULES),
+            ],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            errors = '\n'.join(line for line in result.stderr.splitlines() if not IMPORT_TIME.match(line))
+            raise CommandError(f'{entry}/{profile} failed:\n{errors}')
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_import_times(result.stderr)
+
+    def run_combination(self, entry, profile, options):
+        # The first run writes any missing .pyc files, as a built image would ship them
+        self.run_once(entry, profile, options)
+        runs = [self.run_once(entry, profile, options) for _ in range(max(1, options['repeat']))]
+
+        modules = defaultdict(list)
+        for _, times in runs:
+            for module, timing in times.items():
+                modules[module].append(timing)
+        per_module = {
+            module: (statistics.median(t[0] for t in timings), statistics.median(t[1] for t in timings))
+            for module, timings in modules.items()
+        }
+        packages = defaultdict(float)
+        for module, (own, _) in per_module.items():
+            packages[package_of(module)] += own
+
+        top = options['top']
+        results = [result for result, _ in runs]
+        return {
+            'import_ms': round(statistics.median(r['import_seconds'] for r in results) * 1000, 1),
+            'first_request_ms': round(statistics.median(r['first_request_seconds'] for r in results) * 1000, 1),
+            'status': results[-1]['status'],
+            'modules': results[-1]['modules'],
+            'max_rss_mb': round(max(r['max_rss_mb'] for r in results), 1),
+            'watched_loaded': results[-1]['watched'],
+            'slowest_modules': [
+                {'module': module, 'self_ms': round(own / 1000, 2), 'cumulative_ms': round(cumulative / 1000, 2)}
+                for module, (own, cumulative) in sorted(per_module.items(), key=lambda item: -item[1][0])[:top]
+            ],
+            'slowest_packages': [
+                {'package': package, 'self_ms': round(own / 1000, 2)}
+                for package, own in sorted(packages.items(), key=lambda item: -item[1])[:top]
+            ],
+        }
+
+    def print_report(self, report, top):
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"entry/profile":<14} {"import ms":>10} {"1st req ms":>11} {"status":>7} '
+            f'{"modules":>8} {"rss MB":>7}  optional modules loaded'
+        )
+        for name, result in report.items():
+            self.stdout.write(
+                f'{name:<14} {result["import_ms"]:>10} {result["first_request_ms"]:>11} {result["status"]:>7} '
+                f'{result["modules"]:>8} {result["max_rss_mb"]:>7}  {", ".join(result["watched_loaded"]) or "-"}'
+            )
+        for name, result in report.items():
+            self.stdout.write('')
+            self.stdout.write(f'{name}: slowest packages (self time)')
+            for row in result['slowest_packages']:
+                self.stdout.write(f'  {row["self_ms"]:>8.2f} ms  {row["package"]}')
+            self.stdout.write(f'{name}: slowest modules (self / cumulative)')
+            for row in result['slowest_modules'][:top]:
+                self.stdout.write(f'  {row["self_ms"]:>8.2f} / {row["cumulative_ms"]:>8.2f} ms  {row["module"]}')
+        self.stdout.write(self.style.SUCCESS('Startup benchmark complete'))
@@ -0,0 +1,144 @@
+"""
+In-process metrics registry.
+
+Counters, gauges and histograms are kept per worker process and keyed by
+metric name plus a sorted tuple of label pairs, so they are cheap enough to
+bump on hot paths such as the chat consumer. ``render_prometheus()`` formats
+them in the Prometheus text exposition format.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+
+# Upper bounds in seconds, as in the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+# key -> [buckets, per-bucket counts (+Inf last), sum, count]
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def increment(name, value=1, labels=None):
+    """Add ``value`` to the counter ``name`` with the given labels"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] += value
+
+
+def get_counter(name, labels=None):
+    return _counters.get(_key(name, labels), 0)
+
+
+def set_gauge(name, value, labels=None):
+    """Record the current ``value`` of the gauge ``name``"""
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def get_gauge(name, labels=None):
+    return _gauges.get(_key(name, labels))
+
+
+def observe(name, value, labels=None, buckets=DEFAULT_BUCKETS):
+    """Record ``value`` in the histogram ``name``"""
+    key = _key(name, labels)
+    index = bisect.bisect_left(buckets, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [buckets, [0] * (len(buckets) + 1), 0.0, 0]
+        histogram[1][index] += 1
+        histogram[2] += value
+        histogram[3] += 1
+
+
+def get_histogram(name, labels=None):
+    """``{'buckets': {le: cumulative count}, 'sum': ..., 'count': ...}`` or None"""
+    with _lock:
+        histogram = _histograms.get(_key(name, labels))
+        if histogram is None:
+            return None
+        buckets, counts, total, count = histogram[0], list(histogram[1]), histogram[2], histogram[3]
+    cumulative = {}
+    running = 0
+    for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+        running += bucket_count
+        cumulative[bound] = running
+    return {'buckets': cumulative, 'sum': total, 'count': count}
+
+
+def snapshot():
+    """Return a copy of all counters as ``{(name, labels): value}``"""
+    with _lock:
+        return dict(_counters)
+
+
+def gauges():
+    """Return a copy of all gauges as ``{(name, labels): value}``"""
+    with _lock:
+        return dict(_gauges)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def render_prometheus():
+    """All metrics of this process in the Prometheus text format"""
+    def order(item):
+        (name, labels), _ = item
+        return name, str(labels)
+
+    with _lock:
+        counters = sorted(_counters.items(), key=order)
+        gauge_items = sorted(_gauges.items(), key=order)
+        histograms = sorted(
+            ((key, (value[0], list(value[1]), value[2], value[3])) for key, value in _histograms.items()),
+            key=order,
+        )
+
+    lines = []
+    declared = set()
+
+    def declare(name, kind):
+        if name not in declared:
+            declared.add(name)
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in counters:
+        declare(name, 'counter')
+        lines.append(f'{name}{_format_labels(labels)} {value:g}')
+    for (name, labels), value in gauge_items:
+        declare(name, 'gauge')
+        lines.append(f'{name}{_format_labels(labels)} {value:g}')
+    for (name, labels), (buckets, counts, total, count) in histograms:
+        declare(name, 'histogram')
+        running = 0
+        for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+            running += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {running}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total:g}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
@@ -0,0 +1,62 @@
+"""
+Pagination for very large tables.
+
+Numbering the pages of an admin changelist takes a ``COUNT(*)`` of the whole
+table, the slowest query on ``tasks_task`` or ``chat_chatmessage`` of a large
+tenant. PostgreSQL's planner already keeps an estimate of every table's size
+(``pg_class.reltuples``, refreshed by autovacuum and ANALYZE), so
+``EstimatedCountPaginator`` uses it for unfiltered querysets once it is above
+``ESTIMATE_THRESHOLD``. Filtered querysets, small tables and other databases
+are counted exactly.
+"""
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from . import metrics
+
+DEFAULTS = {
+    'ESTIMATE_THRESHOLD': 100000,
+}
+
+
+def get_pagination_setting(name):
+    return getattr(settings, 'ADMIN_PAGINATION', {}).get(name, DEFAULTS[name])
+
+
+def is_unfiltered(queryset):
+    """``queryset`` selects every row of its table"""
+    query = queryset.query
+    return not (query.where or query.distinct or query.is_sliced or query.combinator)
+
+
+def estimated_count(queryset):
+    """Planner estimate of the rows in ``queryset``'s table, or None if there is none"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or not is_unfiltered(queryset):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)],
+        )
+        row = cursor.fetchone()
+    # -1 until the table has been vacuumed or analyzed
+    return row[0] if row is not None and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's row estimate for large unfiltered tables"""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate >= get_pagination_setting('ESTIMATE_THRESHOLD'):
+                metrics.increment('paginator_estimated_counts_total', labels={
+                    'model': self.object_list.model._meta.label_lower,
+                })
+                return estimate
+        return super().count
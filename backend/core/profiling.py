@@ -0,0 +1,259 @@
+"""
+On-demand sampling profiler.
+
+A single background thread samples the Python stacks of the threads that are
+serving profiled API requests or consumer events (``sys._current_frames``, every
+``INTERVAL_MS``), so a profiled request pays nothing beyond the sampling
+itself. A request is profiled when:
+
+* it sends ``X-Profile: <PROFILING_TOKEN>``,
+* its path starts with one of ``ROUTES`` (consumer events match ``chat.receive``
+  style names),
+* it is picked by ``SAMPLE_RATE``, or
+* ``SLOW_THRESHOLD_MS`` is set; then every request is sampled and the stacks
+  are kept only if it turned out slower than the threshold.
+
+Profiles are written as folded stacks (``frame;frame;frame count`` lines, the
+input format of flamegraph.pl, speedscope and inferno) to ``DIRECTORY``,
+keeping the newest ``MAX_FILES``.
+"""
+
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import metrics
+
+DEFAULTS = {
+    'ENABLED': False,
+    'TOKEN': '',
+    'HEADER': 'X-Profile',
+    'ROUTES': [],
+    'SAMPLE_RATE': 0.0,
+    'SLOW_THRESHOLD_MS': 0,
+    'INTERVAL_MS': 5,
+    'MAX_DEPTH': 128,
+    'DIRECTORY': 'profiles',
+    'MAX_FILES': 200,
+}
+
+PROFILE_NAME = re.compile(r'^[\w.-]+\.folded$')
+
+
+def get_profiling_setting(name):
+    return getattr(settings, 'PROFILING', {}).get(name, DEFAULTS[name])
+
+
+def profile_directory():
+    return str(get_profiling_setting('DIRECTORY'))
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class Recording:
+    def __init__(self, name):
+        self.name = name
+        self.stacks = Counter()
+        self.started = time.perf_counter()
+
+    def add(self, frame):
+        stack = []
+        max_depth = get_profiling_setting('MAX_DEPTH')
+        while frame is not None and len(stack) < max_depth:
+            stack.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        self.stacks[';'.join(reversed(stack))] += 1
+
+
+class Sampler:
+    """Background thread that samples the registered threads"""
+
+    def __init__(self):
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+            self._thread.start()
+
+    def start(self, recording, ident=None):
+        ident = ident or threading.get_ident()
+        with self._lock:
+            self._active[ident] = recording
+            self._ensure_thread()
+        self._wake.set()
+
+    def stop(self, ident=None):
+        with self._lock:
+            return self._active.pop(ident or threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                self._wake.clear()
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for ident, recording in active:
+                frame = frames.get(ident)
+                if frame is not None:
+                    recording.add(frame)
+            del frames
+            time.sleep(get_profiling_setting('INTERVAL_MS') / 1000)
+
+
+sampler = Sampler()
+
+
+def save_profile(recording, elapsed_ms, reason):
+    """Write ``recording`` as folded stacks and rotate old profiles"""
+    directory = profile_directory()
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    name = re.sub(r'[^\w.-]+', '_', recording.name).strip('_')[:80]
+    filename = f'{stamp}-{name}-{int(elapsed_ms)}ms-{reason}.folded'
+    with open(os.path.join(directory, filename), 'w') as output:
+        for stack, count in recording.stacks.most_common():
+            output.write(f'{stack} {count}\n')
+    metrics.increment('profiles_saved_total', labels={'reason': reason})
+    rotate(directory)
+    return filename
+
+
+def rotate(directory=None):
+    directory = directory or profile_directory()
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if PROFILE_NAME.match(entry.name)),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:max(0, len(profiles) - get_profiling_setting('MAX_FILES'))]:
+        os.remove(entry.path)
+
+
+def list_profiles():
+    directory = profile_directory()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if PROFILE_NAME.match(entry.name):
+            stat = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'modified': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            })
+    return sorted(profiles, key=lambda profile: profile['modified'], reverse=True)
+
+
+def profile_path(name):
+    """Absolute path of a saved profile, or None for anything that is not one"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(profile_directory(), name)
+    return path if os.path.isfile(path) else None
+
+
+def select(key, requested=False):
+    """Why ``key`` should be profiled ('requested', 'route', 'sampled', 'threshold') or None"""
+    if not get_profiling_setting('ENABLED'):
+        return None
+    if requested:
+        return 'requested'
+    if any(key.startswith(route) for route in get_profiling_setting('ROUTES')):
+        return 'route'
+    rate = get_profiling_setting('SAMPLE_RATE')
+    if rate and random.random() < rate:
+        return 'sampled'
+    if get_profiling_setting('SLOW_THRESHOLD_MS'):
+        return 'threshold'
+    return None
+
+
+@contextmanager
+def profile(name, key=None, requested=False, reason=None):
+    """
+    Sample the current thread while the block runs and save the result if
+    selected. ``key`` (default ``name``) is matched against ``ROUTES``;
+    ``reason`` skips the selection when the caller already made it.
+    """
+    reason = reason or select(key or name, requested)
+    if reason is None:
+        yield None
+        return
+    recording = Recording(name)
+    sampler.start(recording)
+    try:
+        yield recording
+    finally:
+        sampler.stop()
+        elapsed_ms = (time.perf_counter() - recording.started) * 1000
+        if reason != 'threshold' or elapsed_ms >= get_profiling_setting('SLOW_THRESHOLD_MS'):
+            if recording.stacks:
+                save_profile(recording, elapsed_ms, reason)
+
+
+def is_requested(request):
+    """The request carries the profiling header with the configured token"""
+    token = get_profiling_setting('TOKEN')
+    header = 'HTTP_' + get_profiling_setting('HEADER').upper().replace('-', '_')
+    return bool(token) and hmac.compare_digest(request.META.get(header, ''), token)
+
+
+class ProfilingMiddleware:
+    """
+    Profiles API requests; the admin and /metrics are left alone. Under ASGI
+    a selected request moves to a thread of its own so that the sync view,
+    which runs on that same thread, is the one sampled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+        name = f'{request.method} {request.path}'
+        with profile(name, key=request.path, requested=is_requested(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not request.path.startswith('/api/'):
+            return await self.get_response(request)
+        reason = select(request.path, is_requested(request))
+        if reason is None:
+            return await self.get_response(request)
+        return await sync_to_async(self.profiled)(request, reason)
+
+    def profiled(self, request, reason):
+        with profile(f'{request.method} {request.path}', reason=reason):
+            return async_to_sync(self.get_response)(request)
@@ -0,0 +1,167 @@
+"""
+Read-replica routing.
+
+``ReplicaRoutingMiddleware`` picks one replica for each GET/HEAD/OPTIONS
+request and ``ReplicaRouter`` sends that request's reads to it. Everything else
+uses the primary: writes, unsafe requests, code running outside a request
+(management commands, chat consumers) and reads that follow a write in the
+same request.
+
+After a user's write request the user is pinned to the primary for
+``PIN_SECONDS``, which lets them read their own writes while the replicas
+catch up. The pin is kept in the cache; settings refuse replicas without a
+cache shared between workers (``CACHE_URL``), where it would only hold in the
+worker that served the write.
+
+A batch request (``core/batch.py``) is a POST that mostly reads: it uses a
+replica until it reaches a sub-request with an unsafe method, whose own reads
+(the object it updates, its validators) already go to the primary, and pins
+the user only then.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULTS = {
+    'ALIASES': [],
+    'PIN_SECONDS': 5,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# POST endpoints that read from a replica until they write
+READ_MOSTLY_PATHS = ('/api/batch/',)
+PIN_KEY = 'db_replica_pin:{}'
+
+_state = ContextVar('replica_routing', default=None)
+
+
+def get_replica_setting(name):
+    return getattr(settings, 'DB_REPLICAS', {}).get(name, DEFAULTS[name])
+
+
+def pin_user(user_id):
+    """Send ``user_id``'s reads to the primary for the next PIN_SECONDS"""
+    cache.set(PIN_KEY.format(user_id), True, get_replica_setting('PIN_SECONDS'))
+
+
+def use_primary():
+    """Send the rest of the current request's reads to the primary, as after a write"""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+
+
+class RoutingState:
+    """Replica chosen for the current request and the pins looked up so far"""
+
+    def __init__(self, request, replica):
+        self.request = request
+        self.replica = replica
+        self.resolving = False
+        self.wrote = False
+        self._pins = {}
+
+    def user_id(self):
+        # Resolving a lazy session user runs queries of its own; they go to the primary
+        self.resolving = True
+        try:
+            user = getattr(self.request, 'user', None)
+            return user.pk if user is not None and user.is_authenticated else None
+        finally:
+            self.resolving = False
+
+    def pinned(self):
+        # Checked per query: DRF authenticates the user after middleware has run
+        user_id = self.user_id()
+        if user_id is None:
+            return False
+        if user_id not in self._pins:
+            self._pins[user_id] = bool(cache.get(PIN_KEY.format(user_id)))
+        return self._pins[user_id]
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        state = _state.get()
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if self.should_pin(request, response, state):
+            self.pin(request)
+        return response
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        state = _state.get()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        if self.should_pin(request, response, state):
+            # The user may still be a lazy session user
+            await sync_to_async(self.pin)(request)
+        return response
+
+    def start(self, request):
+        replicas = get_replica_setting('ALIASES')
+        safe = request.method in SAFE_METHODS or request.path in READ_MOSTLY_PATHS
+        replica = random.choice(replicas) if replicas and safe else None
+        return _state.set(RoutingState(request, replica))
+
+    def should_pin(self, request, response, state):
+        if not get_replica_setting('ALIASES') or response.status_code >= 400:
+            return False
+        if request.path in READ_MOSTLY_PATHS:
+            return state.wrote
+        return request.method not in SAFE_METHODS
+
+    def pin(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_user(user.pk)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or state.resolving:
+            return None
+        if state.wrote or state.pinned():
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        # Objects read from a replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replica_setting('ALIASES')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary
+        if db in get_replica_setting('ALIASES'):
+            return False
+        return None
@@ -12,8 +12,10 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 from dotenv import load_dotenv
+import importlib.util
 import os
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -46,14 +48,20 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
+    'core',
     'users',
     'institutions',
     'projects',
     'tasks',
     'chat',
+    'activity',
+    'notifications',
+    'sync',
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -62,6 +70,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
+    'activity.recorder.ActivityMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -85,12 +95,20 @@ TEMPLATES = [
 WSGI_APPLICATION = 'core.wsgi.application'
 ASGI_APPLICATION = 'core.asgi.application'
 
+# Serve the REST API only (no admin, sessions or websockets), see core/settings_api.py
+API_ONLY = False
+
 REDIS_URL = os.environ.get("REDIS_URL")
+# Messages buffered per channel before the layer starts dropping fan-out to it
+CHANNEL_CAPACITY = int(os.environ.get("CHANNEL_CAPACITY", 100))
 if not REDIS_URL:
     # Channels
     CHANNEL_LAYERS = {
         'default': {
             'BACKEND': 'channels.layers.InMemoryChannelLayer',
+            'CONFIG': {
+                "capacity": CHANNEL_CAPACITY,
+            },
         },
     }
 else:
@@ -100,19 +118,51 @@ else:
             'BACKEND': 'channels_redis.core.RedisChannelLayer',
             'CONFIG': {
                 "hosts": [REDIS_URL],
+                "capacity": CHANNEL_CAPACITY,
             },
         },
     }
 
+# Chat flood protection, see chat/throttling.py for the defaults
+CHAT_THROTTLE = {
+    'CONNECTION_RATE': float(os.environ.get("CHAT_CONNECTION_RATE", 5)),
+    'CONNECTION_BURST': int(os.environ.get("CHAT_CONNECTION_BURST", 10)),
+    'USER_RATE': float(os.environ.get("CHAT_USER_RATE", 10)),
+    'USER_BURST': int(os.environ.get("CHAT_USER_BURST", 20)),
+    'PRESENCE_RATE': float(os.environ.get("CHAT_PRESENCE_RATE", 5)),
+    'PRESENCE_BURST': int(os.environ.get("CHAT_PRESENCE_BURST", 20)),
+    'OUTBOUND_MAX_LAG': float(os.environ.get("CHAT_OUTBOUND_MAX_LAG", 5)),
+    'OUTBOUND_POLICY': os.environ.get("CHAT_OUTBOUND_POLICY", 'drop'),
+}
+
+# Chat presence and typing indicators, see chat/presence.py
+CHAT_PRESENCE = {
+    'TICK': float(os.environ.get("CHAT_PRESENCE_TICK", 1)),
+    'TTL': float(os.environ.get("CHAT_PRESENCE_TTL", 30)),
+    'TYPING_TTL': float(os.environ.get("CHAT_TYPING_TTL", 5)),
+    'MAX_WORKERS': int(os.environ.get("CHAT_PRESENCE_MAX_WORKERS", 64)),
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Seconds a connection is kept open between requests (0 closes it after each
+# request). Under ASGI every HTTP request runs in its own thread, so Django
+# recommends 0 there and DB_POOL instead; the chat consumers and WSGI workers
+# reuse one thread and benefit from persistent connections.
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 0))
+DB_CONN_HEALTH_CHECKS = os.environ.get("DB_CONN_HEALTH_CHECKS", "true").lower() == "true"
+# psycopg 3 connection pool (PostgreSQL only, needs psycopg[pool], see requirements.txt)
+DB_POOL = os.environ.get("DB_POOL", "false").lower() == "true"
+
 DATABASE_URL = os.environ.get("DATABASE_URL")
 if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.config(
-            default=os.environ.get("DATABASE_URL")
+            default=os.environ.get("DATABASE_URL"),
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=DB_CONN_HEALTH_CHECKS,
         )
     }
 else:
@@ -120,9 +170,187 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        }
+    }
+
+# Read replicas: DB_REPLICA_URLS is a comma-separated list of database URLs,
+# added as aliases replica1, replica2, ... Safe-method requests read from
+# them, see core/routers.py.
+DB_REPLICAS = {
+    'ALIASES': [],
+    # Seconds a user reads from the primary after writing
+    'PIN_SECONDS': float(os.environ.get("DB_REPLICA_PIN_SECONDS", 5)),
+}
+DB_REPLICA_URLS = [url.strip() for url in os.environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()]
+for number, url in enumerate(DB_REPLICA_URLS, 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dj_database_url.parse(
+        url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
+    # Tests run against the primary only
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DB_REPLICAS['ALIASES'].append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+if DB_POOL:
+    for database in DATABASES.values():
+        if database['ENGINE'] != 'django.db.backends.postgresql':
+            continue
+        if importlib.util.find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured("DB_POOL needs psycopg 3 with its pool: pip install 'psycopg[binary,pool]'")
+        # Pooled connections go back to the pool when Django closes them at the
+        # end of each request, from the thread that used them
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            'max_size': int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            'timeout': float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        }
+
+# SQLite tuned for concurrent writers: WAL, a busy timeout instead of immediate
+# "database is locked" errors, BEGIN IMMEDIATE for transactions and an optional
+# in-process writer queue, see core/sqlite.py
+SQLITE = {
+    'PRODUCTION': os.environ.get("SQLITE_PRODUCTION", "false").lower() == "true",
+    'BUSY_TIMEOUT': float(os.environ.get("SQLITE_BUSY_TIMEOUT", 20)),
+    'MMAP_SIZE': int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    'WRITER_QUEUE': os.environ.get("SQLITE_WRITER_QUEUE", "false").lower() == "true",
+}
+if SQLITE['PRODUCTION']:
+    for database in DATABASES.values():
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            continue
+        database.setdefault('OPTIONS', {}).update({
+            'timeout': SQLITE['BUSY_TIMEOUT'],
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f"PRAGMA mmap_size={SQLITE['MMAP_SIZE']};"
+                'PRAGMA temp_store=MEMORY'
+            ),
+        })
+
+# Cache
+# CACHE_URL selects the backend: locmem:// (default), file:///path or redis://host:port/db
+CACHE_URL = os.environ.get("CACHE_URL", "locmem://")
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+elif CACHE_URL.startswith("file://"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_URL[len("file://"):],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get("CACHE_MAX_ENTRIES", 10000))},
         }
     }
 
+# Users are pinned to the primary after writing through the cache: every worker
+# has to see the pin, or the next request may read a replica that lags
+if DB_REPLICAS['ALIASES'] and CACHES['default']['BACKEND'].endswith('LocMemCache'):
+    raise ImproperlyConfigured("DB_REPLICA_URLS needs a cache shared between workers: set CACHE_URL")
+
+# Request and consumer instrumentation, see core/instrumentation.py
+INSTRUMENTATION = {
+    'ENABLED': os.environ.get("INSTRUMENTATION_ENABLED", "true").lower() == "true",
+    # Query counts and timings in a response header tell anyone how a view
+    # works; enable on staging or for debugging only
+    'SERVER_TIMING': os.environ.get("SERVER_TIMING", "false").lower() == "true",
+    'N_PLUS_ONE_THRESHOLD': int(os.environ.get("N_PLUS_ONE_THRESHOLD", 5)),
+    # JSONL file the query workload is appended to, for index_advisor
+    'QUERY_LOG': os.environ.get("QUERY_LOG", ""),
+}
+# Bearer token Prometheus sends to /metrics; without it only admins can read it
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Sampling profiler for API requests and chat events, see core/profiling.py
+PROFILING = {
+    'ENABLED': os.environ.get("PROFILING_ENABLED", "false").lower() == "true",
+    # Requests sending "X-Profile: <token>" are profiled
+    'TOKEN': os.environ.get("PROFILING_TOKEN", ""),
+    # Comma separated path prefixes (or consumer events such as chat.receive)
+    'ROUTES': [route for route in os.environ.get("PROFILING_ROUTES", "").split(",") if route],
+    'SAMPLE_RATE': float(os.environ.get("PROFILING_SAMPLE_RATE", 0)),
+    # Keep the profile of anything slower than this (0 disables)
+    'SLOW_THRESHOLD_MS': float(os.environ.get("PROFILING_SLOW_THRESHOLD_MS", 0)),
+    'INTERVAL_MS': float(os.environ.get("PROFILING_INTERVAL_MS", 5)),
+    'DIRECTORY': os.environ.get("PROFILING_DIRECTORY", str(BASE_DIR / 'profiles')),
+    'MAX_FILES': int(os.environ.get("PROFILING_MAX_FILES", 200)),
+}
+
+# Cached API responses, see core/cache.py
+API_CACHE = {
+    'ENABLED': os.environ.get("API_CACHE_ENABLED", "true").lower() == "true",
+    'TIMEOUT': int(os.environ.get("API_CACHE_TIMEOUT", 300)),
+}
+
+# List actions rendered from values() rows, see core/fastread.py
+FAST_READ = {
+    'ENABLED': os.environ.get("FAST_READ_ENABLED", "true").lower() == "true",
+}
+
+# Async dashboard and report views, see core/async_views.py
+ASYNC_VIEWS = {
+    # Run a view's independent queries on separate connections at once
+    'CONCURRENT': os.environ.get("ASYNC_VIEWS_CONCURRENT", "true").lower() == "true",
+    # Query groups in flight per process, i.e. extra database connections
+    'MAX_WORKERS': int(os.environ.get("ASYNC_VIEWS_MAX_WORKERS", 8)),
+}
+
+# Batched API requests, see core/batch.py
+BATCH = {
+    'MAX_REQUESTS': int(os.environ.get("BATCH_MAX_REQUESTS", 20)),
+}
+
+# Incremental sync API, see sync/signals.py and sync/views.py
+SYNC = {
+    # Rows per page of a full reload
+    'PAGE_SIZE': int(os.environ.get("SYNC_PAGE_SIZE", 1000)),
+    # Changed rows of one resource above which a delta turns into a full reload
+    'MAX_CHANGES': int(os.environ.get("SYNC_MAX_CHANGES", 1000)),
+    # Age at which prune_tombstones deletes tombstones
+    'TOMBSTONE_DAYS': int(os.environ.get("SYNC_TOMBSTONE_DAYS", 30)),
+}
+
+# Activity log, see activity/recorder.py
+ACTIVITY = {
+    'ENABLED': os.environ.get("ACTIVITY_ENABLED", "true").lower() == "true",
+    # Events written per bulk insert
+    'BUFFER_SIZE': int(os.environ.get("ACTIVITY_BUFFER_SIZE", 500)),
+}
+
+# Notification inbox fan-out and digests, see notifications/dispatch.py
+NOTIFICATIONS = {
+    'ENABLED': os.environ.get("NOTIFICATIONS_ENABLED", "true").lower() == "true",
+    # Deliver on a background thread once the request has finished
+    'ASYNC': os.environ.get("NOTIFICATIONS_ASYNC", "true").lower() == "true",
+    'DIGEST_THRESHOLD': int(os.environ.get("NOTIFICATIONS_DIGEST_THRESHOLD", 3)),
+    'DIGEST_WINDOW': int(os.environ.get("NOTIFICATIONS_DIGEST_WINDOW", 300)),
+    'DUE_SOON_HOURS': float(os.environ.get("NOTIFICATIONS_DUE_SOON_HOURS", 24)),
+}
+
+# Admin changelists of large tables page with the PostgreSQL row estimate
+# instead of COUNT(*) above this many rows, see core/pagination.py
+ADMIN_PAGINATION = {
+    'ESTIMATE_THRESHOLD': int(os.environ.get("ADMIN_ESTIMATE_THRESHOLD", 100000)),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -167,8 +395,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'users.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -192,6 +420,15 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
 }
 
+# Request users built from token claims, see users/authentication.py
+CLAIMS_AUTH = {
+    'CACHE_TTL': int(os.environ.get("CLAIMS_AUTH_CACHE_TTL", 60)),
+    'CACHE_SIZE': int(os.environ.get("CLAIMS_AUTH_CACHE_SIZE", 10000)),
+    # Seconds a checked user version is trusted; bounds how long a worker without
+    # a shared cache (CACHE_URL) keeps accepting the claims of a changed user
+    'VERSION_TTL': int(os.environ.get("CLAIMS_AUTH_VERSION_TTL", 60)),
+}
+
 # CORS settings for frontend
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite dev server
@@ -207,3 +444,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 # Custom user model
 AUTH_USER_MODEL = 'users.User'
+
+# Threads (API) or processes (import_users command) hashing passwords during
+# bulk user imports (default: CPU count)
+USER_IMPORT_WORKERS = int(os.environ.get("USER_IMPORT_WORKERS", 0)) or None
+# Rows the import API accepts in one request; larger files go through the command
+USER_IMPORT_MAX_ROWS = int(os.environ.get("USER_IMPORT_MAX_ROWS", 500))
@@ -0,0 +1,61 @@
+"""
+In-process writer queue for SQLite.
+
+SQLite allows one writer at a time. When many threads write at once they all
+spin on the busy timeout and throughput collapses; funnelling independent
+writes through a single thread (with its own long-lived connection) keeps the
+database lock with one owner. Enable with ``SQLITE_WRITER_QUEUE=true``.
+
+Writes run inline when the queue is disabled, the database is not SQLite or
+the caller is inside a transaction: the caller's transaction may already hold
+the write lock, and work queued to another connection would not be part of it.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import metrics
+
+
+def get_sqlite_setting(name):
+    return getattr(settings, 'SQLITE', {}).get(name, False)
+
+
+class WriterQueue:
+    def __init__(self, alias=DEFAULT_DB_ALIAS):
+        self.alias = alias
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def enabled(self):
+        connection = connections[self.alias]
+        return (
+            get_sqlite_setting('WRITER_QUEUE')
+            and connection.vendor == 'sqlite'
+            and not connection.in_atomic_block
+        )
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer')
+            return self._executor
+
+    def run(self, fn, *args, **kwargs):
+        """Call ``fn(*args, **kwargs)`` on the writer thread and return its result"""
+        if not self.enabled():
+            return fn(*args, **kwargs)
+        metrics.increment('sqlite_writer_jobs_total')
+        return self._get_executor().submit(fn, *args, **kwargs).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+writer = WriterQueue()
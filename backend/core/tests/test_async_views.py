@@ -0,0 +1,83 @@
+
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TestCase
+from institutions.models import Institution
+from projects.models import Project
+from tasks.models import Task
+from users.models import User
+from users.views import CustomTokenObtainPairSerializer
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('boss', role='admin')
+        cls.worker = User.objects.create_user('worker', role='employee')
+        cls.supervisor = User.objects.create_user('lead', role='supervisor')
+        alpha = Institution.objects.create(name='Alpha')
+        beta = Institution.objects.create(name='Beta', supervisor=cls.supervisor)
+        own = Project.objects.create(title='Own', description='', created_by=cls.worker)
+        other = Project.objects.create(title='Other', description='', created_by=cls.admin, status='paused')
+        for status in ('completed', 'completed', 'initial'):
+            Task.objects.create(project=own, title=status, description='', institution=alpha, status=status)
+        Task.objects.create(project=other, title='Other', description='', institution=beta, status='in_progress')
+
+    def headers(self, user):
+        return {'authorization': f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}'}
+
+    def report(self, user, query=''):
+        response = self.client.get(f'/api/auth/reports/{query}', headers=self.headers(user))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_middleware_runs_natively_under_asgi(self):
+        # Django logs every sync middleware it has to wrap for the async handler
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_dashboard_stats_under_asgi(self):
+        response = await self.async_client.get('/api/auth/dashboard-stats/', headers=self.headers(self.admin))
+        self.assertEqual(response.json(), {
+            'totalProjects': 2,
+            'totalTasks': 4,
+            'completedTasks': 2,
+            'inProgressTasks': 1,
+            'overdueTask': 0,
+            'institutionsCount': 2,
+            'activeUsers': 3,
+        })
+
+        response = await self.async_client.get('/api/auth/dashboard-stats/', headers=self.headers(self.worker))
+        self.assertEqual((response.json()['totalProjects'], response.json()['totalTasks']), (1, 3))
+
+    def test_reports(self):
+        report = self.report(self.admin)
+        self.assertEqual((report['totalTasks'], report['completedTasks'], report['completionRate']), (4, 2, 50))
+        self.assertEqual(report['activeProjects'], 1)
+        self.assertEqual(
+            [(row['name'], row['totalTasks'], row['completionRate']) for row in report['institutions']],
+            [('Alpha', 3, 67), ('Beta', 1, 0)],
+        )
+        self.assertEqual({row['title']: row['completedTasks'] for row in report['projects']}, {'Own': 2, 'Other': 0})
+        [week] = report['weeklyProgress']
+        self.assertEqual((week['started'], week['completed']), (4, 2))
+
+        # Only the projects the user can see
+        report = self.report(self.worker, '?period=week')
+        self.assertEqual((report['period'], report['totalTasks']), ('week', 3))
+        self.assertEqual([row['title'] for row in report['projects']], ['Own'])
+        # Only the institutions on the user's dashboard
+        self.assertEqual(report['institutions'], [])
+        report = self.report(self.supervisor)
+        self.assertEqual([row['name'] for row in report['institutions']], ['Beta'])
+
+    def test_errors(self):
+        response = self.client.get('/api/auth/reports/?period=decade', headers=self.headers(self.admin))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('period', response.json())
+        response = self.client.get('/api/auth/reports/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        self.assertEqual(self.client.get('/api/auth/reports/', headers={'authorization': 'Bearer nonsense'}).status_code, 401)
+        response = self.client.post('/api/auth/dashboard-stats/', headers=self.headers(self.admin))
+        self.assertEqual(response.status_code, 405)
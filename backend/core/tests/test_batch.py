@@ -0,0 +1,140 @@
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from core.async_views import concurrent_queries, gather_queries
+from core.routers import ReplicaRouter
+from institutions.models import Institution
+from projects.models import Project
+from tasks.models import Task
+from users.authentication import ClaimsJWTAuthentication
+from users.models import User
+from users.views import CustomTokenObtainPairSerializer
+
+
+# Sub-requests run inside the test's transaction, where cached responses are
+# only invalidated on commit
+@override_settings(API_CACHE={'ENABLED': False})
+class BatchTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin = User.objects.create_user('boss', role='admin')
+        self.institution = Institution.objects.create(name='Alpha')
+        self.project = Project.objects.create(title='Own', description='', created_by=self.admin)
+        self.task = Task.objects.create(project=self.project, title='Task', description='', institution=self.institution)
+        self.client.defaults['HTTP_AUTHORIZATION'] = (
+            f'Bearer {CustomTokenObtainPairSerializer.get_token(self.admin).access_token}'
+        )
+
+    def batch(self, *requests, concurrent=False, status=200):
+        response = self.client.post(
+            '/api/batch/', {'requests': list(requests), 'concurrent': concurrent}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def test_matches_separate_requests_with_one_authentication(self):
+        paths = [
+            '/api/auth/dashboard-stats/',
+            '/api/projects/',
+            f'/api/tasks/?project={self.project.pk}',
+            '/api/institutions/',
+            '/api/users/',
+        ]
+        separate = []
+        with CaptureQueriesContext(connection) as queries:
+            for path in paths:
+                separate.append(self.client.get(path).json())
+        cache.clear()
+
+        validate = mock.patch.object(
+            ClaimsJWTAuthentication, 'get_validated_token', autospec=True,
+            side_effect=ClaimsJWTAuthentication.get_validated_token,
+        )
+        with validate as validated, self.assertNumQueries(len(queries)):
+            result = self.batch(*({'id': str(n), 'path': path} for n, path in enumerate(paths)))
+        validated.assert_called_once()
+        self.assertEqual([item['id'] for item in result['responses']], ['0', '1', '2', '3', '4'])
+        self.assertEqual({item['status'] for item in result['responses']}, {200})
+        self.assertEqual([item['body'] for item in result['responses']], separate)
+
+    def test_each_item_has_its_own_status(self):
+        result = self.batch(
+            {'method': 'PATCH', 'path': f'/api/tasks/{self.task.pk}/', 'body': {'status': 'completed'}},
+            {'path': f'/api/tasks/{self.task.pk}/'},
+            {'method': 'POST', 'path': '/api/projects/', 'body': {'title': ''}},
+            {'path': '/api/nowhere/'},
+            {'path': '/admin/'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}},
+            {'method': 'DELETE', 'path': '/api/auth/dashboard-stats/'},
+        )
+        statuses = [item['status'] for item in result['responses']]
+        self.assertEqual(statuses, [200, 200, 400, 404, 404, 400, 405])
+        # In order: the read sees the write before it
+        self.assertEqual(result['responses'][1]['body']['status'], 'completed')
+        self.assertIn('title', result['responses'][2]['body'])
+        self.assertNotIn('id', result['responses'][0])
+
+    @override_settings(DB_REPLICAS={'ALIASES': ['replica']})
+    def test_writes_read_from_the_primary(self):
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            routed.append(db_for_read(router, model, **hints))
+            return routed[-1]
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            result = self.batch(
+                {'method': 'PATCH', 'path': f'/api/tasks/{self.task.pk}/', 'body': {'status': 'completed'}},
+                {'path': f'/api/tasks/{self.task.pk}/'},
+            )
+        # The 'replica' alias does not exist: a read routed there would fail the sub-request
+        self.assertEqual([item['status'] for item in result['responses']], [200, 200])
+        self.assertTrue(routed)
+        self.assertEqual(set(routed), {'default'})
+
+    def test_concurrent_reads_wait_for_writes(self):
+        groups = []
+
+        async def gather(*callables):
+            groups.append(len(callables))
+            return [await sync_to_async(call)() for call in callables]
+
+        read = {'path': '/api/projects/'}
+        write = {'method': 'PATCH', 'path': f'/api/projects/{self.project.pk}/', 'body': {'title': 'Renamed'}}
+        with mock.patch('core.batch.gather_queries', gather):
+            result = self.batch(read, read, write, read, read, read, concurrent=True)
+        self.assertEqual(groups, [2, 3])
+        self.assertEqual(result['responses'][0]['body']['results'][0]['title'], 'Own')
+        self.assertEqual(result['responses'][5]['body']['results'][0]['title'], 'Renamed')
+
+    @override_settings(BATCH={'MAX_REQUESTS': 2})
+    def test_invalid_batches(self):
+        self.assertIn('requests', self.batch(status=400))
+        self.assertIn('requests', self.batch(*[{'path': '/api/projects/'}] * 3, status=400))
+        self.assertIn('requests', self.batch({'method': 'TRACE', 'path': '/api/projects/'}, status=400))
+        del self.client.defaults['HTTP_AUTHORIZATION']
+        self.batch({'path': '/api/projects/'}, status=401)
+
+    def test_query_groups_run_concurrently(self):
+        def group(value):
+            def run():
+                time.sleep(0.2)
+                return value, threading.get_ident()
+            return run
+
+        with mock.patch('core.async_views.concurrent_queries', return_value=True):
+            started = time.perf_counter()
+            results = async_to_sync(gather_queries)(*(group(n) for n in range(4)))
+        self.assertLess(time.perf_counter() - started, 0.6)
+        self.assertEqual([value for value, _ in results], [0, 1, 2, 3])
+        self.assertEqual(len({thread for _, thread in results}), 4)
+
+        # In-memory SQLite: the groups run in turn where the test data is visible
+        self.assertFalse(concurrent_queries())
@@ -0,0 +1,75 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase
+from core import datagen
+from core.cache import model_versions
+from chat.models import ChatMessage
+from institutions.models import Institution
+from projects.models import Project, ProjectAccess
+from tasks.models import Task, TaskComment, TaskEvidence
+from users.directory import directory_version
+from users.models import User
+
+TINY = {
+    'institutions': 2,
+    'users_per_institution': 4,
+    'projects': 3,
+    'tasks_per_project': 5,
+    'comments_per_task': 2,
+    'evidence_per_task': 1,
+    'messages': 30,
+}
+
+
+@mock.patch.dict(datagen.SCALES, {'tiny': TINY})
+class DataGenerationTests(TestCase):
+    def test_generates_the_scale_in_batches(self):
+        summary = datagen.generate('tiny', seed=7, batch_size=4)
+        self.assertEqual({model: count for model, count in summary['counts'].items() if model != 'project access'}, {
+            'users': 10,
+            'institutions': 2,
+            'projects': 3,
+            'tasks': 15,
+            'comments': 30,
+            'evidence': 15,
+            'messages': 30,
+        })
+        for model, count in ((User, 10), (Institution, 2), (Project, 3), (Task, 15), (TaskComment, 30),
+                             (TaskEvidence, 15), (ChatMessage, 30)):
+            self.assertEqual(model.objects.count(), count, model.__name__)
+        self.assertFalse(Institution.objects.filter(supervisor=None).exists())
+        self.assertEqual(User.objects.get(pk=summary['admin']).username, 'gen7_admin')
+        self.assertEqual(User.objects.get(pk=summary['employee']).role, 'employee')
+        # bulk_create skipped the signals; access is rebuilt afterwards
+        self.assertEqual(summary['counts']['project access'], ProjectAccess.objects.count())
+        self.assertGreater(ProjectAccess.objects.count(), 0)
+
+    def test_cached_versions_change_once_committed(self):
+        models = [User, Project, Task]
+        before = model_versions(models), directory_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            datagen.generate('tiny', seed=5)
+        after = model_versions(models), directory_version()
+        self.assertTrue(all(old != new for old, new in zip(before[0], after[0])))
+        self.assertNotEqual(before[1], after[1])
+
+    def test_seeds_are_reproducible(self):
+        def dataset(seed):
+            savepoint = transaction.savepoint()
+            datagen.generate('tiny', seed=seed)
+            rows = list(Task.objects.order_by('pk').values_list('status', 'progress'))
+            transaction.savepoint_rollback(savepoint)
+            return rows
+
+        self.assertEqual(dataset(1), dataset(1))
+        self.assertNotEqual(dataset(1), dataset(2))
+
+    def test_command_refuses_an_existing_seed(self):
+        out = StringIO()
+        call_command('populate_data', scale='tiny', seed=3, stdout=out)
+        self.assertIn('Log in as gen3_admin', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'Data for seed 3 already exists'):
+            call_command('populate_data', scale='tiny', seed=3, stdout=out)
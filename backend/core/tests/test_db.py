@@ -0,0 +1,14 @@
+
+from django.test import TestCase
+from users.models import User
+
+
+class DatabaseStatusTests(TestCase):
+    def test_admin_only(self):
+        self.client.force_login(User.objects.create_user('ops', role='admin'))
+        status = self.client.get('/api/health/db/').json()
+        self.assertEqual(status['default']['vendor'], 'sqlite')
+        self.assertIsNone(status['default']['pool'])
+
+        self.client.force_login(User.objects.create_user('staff', role='employee'))
+        self.assertEqual(self.client.get('/api/health/db/').status_code, 403)
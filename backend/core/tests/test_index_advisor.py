@@ -0,0 +1,87 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from core.index_advisor import Workload, analyze, migration_snippets, normalize, predicates, verify
+from projects.models import Project
+from tasks.models import Task
+from users.models import User
+
+
+class IndexAdvisorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user('ops', role='admin')
+        self.project = Project.objects.create(title='Project', description='', created_by=admin)
+        for i in range(12):
+            Task.objects.create(project=self.project, title=f'Task {i}', description='', status=('initial', 'completed')[i % 2])
+        self.log = tempfile.NamedTemporaryFile('w+', suffix='.jsonl')
+        self.addCleanup(self.log.close)
+
+    def workload(self, *queries):
+        workload = Workload()
+        for sql, params in queries:
+            workload.add(sql, params)
+        return workload
+
+    def test_statements_are_grouped_by_shape(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x'  AND b IN (1, 2, 3) AND c = %s"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) AND c = ?',
+        )
+        self.log.write(json.dumps({'sql': 'SELECT * FROM t WHERE id = %s', 'params': [1], 'calls': 3, 'source': 'GET a'}) + '\n')
+        self.log.write('(0.002) SELECT * FROM t WHERE id = 2; args=(2,); alias=default\n')
+        self.log.write('(0.001) INSERT INTO t VALUES (1); args=(); alias=default\n')
+        self.log.seek(0)
+        workload = Workload()
+        workload.read(self.log)
+        self.assertEqual(len(workload), 1)
+        statement = next(iter(workload.statements.values()))
+        self.assertEqual((statement.calls, statement.params, statement.sources), (4, [1], {'GET a'}))
+        self.assertEqual(workload.ignored, 1)
+
+    def test_predicates_skip_conditional_aggregates(self):
+        sql = (
+            'SELECT COUNT("tasks_task"."id") FILTER (WHERE "tasks_task"."status" = %s) FROM "tasks_task" '
+            'WHERE "tasks_task"."project_id" = %s AND "tasks_task"."due_date" < %s ORDER BY "tasks_task"."created_at" DESC'
+        )
+        self.assertEqual(predicates(sql, 'tasks_task'), (['project_id'], [('created_at', True)], ['due_date']))
+
+    def test_full_scans_get_an_index_proposed(self):
+        sql, params = Task.objects.filter(status='completed').order_by('due_date').query.sql_with_params()
+        findings, proposals = analyze(self.workload((sql, params)), min_rows=0)
+        self.assertEqual([finding.table for finding in findings], ['tasks_task'])
+        [proposal] = proposals
+        self.assertEqual(proposal.fields, ['status', 'due_date'])
+        # 12 rows over 2 statuses
+        self.assertEqual((proposal.rows, proposal.rows_after, proposal.rows_saved), (12, 6, 6))
+        self.assertTrue(verify(proposal)['uses_index'])
+        # Rolled back
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'tasks_task')
+        self.assertNotIn(proposal.index.name, constraints)
+
+        migration = migration_snippets(proposals)['tasks']
+        self.assertIn('migrations.AddIndex(', migration)
+        self.assertIn(f"name='{proposal.index.name}'", migration)
+        # Small tables and indexed lookups are left alone
+        self.assertEqual(analyze(self.workload((sql, params))), ([], []))
+        sql, params = Task.objects.filter(project=self.project).query.sql_with_params()
+        self.assertEqual(analyze(self.workload((sql, params)), min_rows=0), ([], []))
+
+    def test_query_log_feeds_the_command(self):
+        self.client.force_login(User.objects.get(username='ops'))
+        with override_settings(INSTRUMENTATION={'QUERY_LOG': self.log.name}):
+            self.client.get('/api/auth/reports/')
+        records = [json.loads(line) for line in self.log]
+        self.assertTrue(records)
+        self.assertEqual({record['source'] for record in records}, {'GET reports'})
+
+        out = StringIO()
+        call_command('index_advisor', self.log.name, '--min-rows=0', stdout=out)
+        self.assertIn('Full scans of large tables', out.getvalue())
+        self.assertIn('projects/migrations/XXXX_index_advisor.py', out.getvalue())
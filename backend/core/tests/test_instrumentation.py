@@ -0,0 +1,42 @@
+from django.test import TestCase, override_settings
+from core import metrics
+from core.instrumentation import profile_queries
+from users.models import User
+
+
+@override_settings(METRICS_TOKEN='scrape-me')
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.admin = User.objects.create_user('ops', role='admin')
+        for i in range(6):
+            User.objects.create_user(f'member{i}', role='employee')
+
+    def test_server_timing_and_histograms(self):
+        self.client.force_login(self.admin)
+        # Off unless enabled
+        self.assertNotIn('Server-Timing', self.client.get('/api/users/'))
+        metrics.reset()
+        with override_settings(INSTRUMENTATION={'SERVER_TIMING': True}):
+            response = self.client.get('/api/users/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=')
+        histogram = metrics.get_histogram('http_request_duration_seconds', {'route': 'user-list', 'method': 'GET'})
+        self.assertEqual(histogram['count'], 1)
+
+    def test_repeated_queries_are_flagged(self):
+        with profile_queries() as profile:
+            for user in User.objects.all():
+                User.objects.get(pk=user.pk)
+        self.assertEqual(list(profile.repeated().values()), [7])
+
+    def test_metrics_endpoint(self):
+        self.client.force_login(self.admin)
+        self.client.get('/api/users/')
+        self.client.logout()
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_queries_bucket{method="GET",route="user-list",le="+Inf"} 1', body)
@@ -0,0 +1,27 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from core.pagination import EstimatedCountPaginator, estimated_count, is_unfiltered
+from users.models import User
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            User.objects.create_user(f'paged{i}')
+
+    def test_filtered_querysets_are_counted_exactly(self):
+        self.assertTrue(is_unfiltered(User.objects.order_by('-date_joined')))
+        self.assertFalse(is_unfiltered(User.objects.filter(role='employee')))
+        self.assertFalse(is_unfiltered(User.objects.distinct()))
+        # No planner statistics on SQLite
+        self.assertIsNone(estimated_count(User.objects.all()))
+        self.assertEqual(EstimatedCountPaginator(User.objects.all(), 2).count, 3)
+
+    def test_large_tables_use_the_estimate(self):
+        with mock.patch('core.pagination.estimated_count', return_value=250000):
+            paginator = EstimatedCountPaginator(User.objects.all(), 100)
+            self.assertEqual(paginator.count, 250000)
+            self.assertEqual(paginator.num_pages, 2500)
+            with override_settings(ADMIN_PAGINATION={'ESTIMATE_THRESHOLD': 10 ** 6}):
+                self.assertEqual(EstimatedCountPaginator(User.objects.all(), 100).count, 3)
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
+from core import profiling
+from users.models import User
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.settings_override = override_settings(PROFILING={
+            'ENABLED': True, 'TOKEN': 'secret', 'DIRECTORY': directory, 'MAX_FILES': 2, 'INTERVAL_MS': 1,
+        })
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def slow_block(self, **kwargs):
+        with profiling.profile('GET /api/slow/', **kwargs):
+            time.sleep(0.05)
+
+    def test_requested_profile_is_saved_as_folded_stacks(self):
+        self.slow_block(requested=True)
+        [saved] = profiling.list_profiles()
+        self.assertTrue(saved['name'].endswith('-requested.folded'))
+        with open(profiling.profile_path(saved['name'])) as folded:
+            stack, count = folded.readline().rsplit(' ', 1)
+        self.assertIn('slow_block (core/tests/test_profiling.py:', stack.split(';')[-1])
+        self.assertGreater(int(count), 0)
+
+    def test_profiles_are_rotated(self):
+        for _ in range(3):
+            self.slow_block(requested=True)
+        self.assertEqual(len(profiling.list_profiles()), 2)
+
+    def test_only_slow_requests_are_kept_by_threshold(self):
+        with override_settings(PROFILING={**settings.PROFILING, 'SLOW_THRESHOLD_MS': 10000}):
+            self.slow_block()
+        self.assertEqual(profiling.list_profiles(), [])
+        with override_settings(PROFILING={**settings.PROFILING, 'SLOW_THRESHOLD_MS': 10}):
+            self.slow_block()
+        self.assertEqual(len(profiling.list_profiles()), 1)
+
+    def test_header_needs_the_token(self):
+        request = RequestFactory().get('/api/users/', HTTP_X_PROFILE='secret')
+        self.assertTrue(profiling.is_requested(request))
+        request = RequestFactory().get('/api/users/', HTTP_X_PROFILE='guess')
+        self.assertFalse(profiling.is_requested(request))
+
+    def test_admin_pages(self):
+        self.slow_block(requested=True)
+        [saved] = profiling.list_profiles()
+        self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertContains(self.client.get('/admin/profiles/'), saved['name'])
+        response = self.client.get(f"/admin/profiles/{saved['name']}")
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertEqual(self.client.get('/admin/profiles/..%2Fsettings.py').status_code, 404)
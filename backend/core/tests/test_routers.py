@@ -0,0 +1,48 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from core.routers import ReplicaRouter, ReplicaRoutingMiddleware
+from users.models import User
+
+
+@override_settings(DB_REPLICAS={'ALIASES': ['replica'], 'PIN_SECONDS': 5})
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', role='employee')
+        self.routed = []
+
+    def request(self, method, write=False, path='/api/projects/'):
+        def view(request):
+            router = ReplicaRouter()
+            self.routed.append(router.db_for_read(User))
+            if write:
+                router.db_for_write(User)
+                self.routed.append(router.db_for_read(User))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)(path)
+        request.user = self.user
+        ReplicaRoutingMiddleware(view)(request)
+        return self.routed.pop(0)
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.request('get'), 'replica')
+        self.assertIsNone(ReplicaRouter().db_for_read(User))
+
+    def test_reads_after_a_write_use_the_primary(self):
+        self.assertEqual(self.request('get', write=True), 'replica')
+        self.assertEqual(self.routed.pop(0), 'default')
+
+    def test_user_is_pinned_after_writing(self):
+        self.assertIsNone(self.request('post'))
+        self.assertEqual(self.request('get'), 'default')
+        cache.clear()
+        self.assertEqual(self.request('get'), 'replica')
+
+    def test_batches_read_from_replica_until_they_write(self):
+        self.assertEqual(self.request('post', path='/api/batch/'), 'replica')
+        self.assertEqual(self.request('get'), 'replica')
+        self.assertEqual(self.request('post', write=True, path='/api/batch/'), 'replica')
+        self.assertEqual(self.routed.pop(0), 'default')
+        self.assertEqual(self.request('get'), 'default')
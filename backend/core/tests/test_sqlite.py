@@ -0,0 +1,24 @@
+import threading
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from core.sqlite import writer
+
+
+class SQLiteWriterQueueTests(SimpleTestCase):
+    def tearDown(self):
+        writer.shutdown()
+
+    @override_settings(SQLITE={'WRITER_QUEUE': True})
+    def test_writes_run_on_one_writer_thread(self):
+        first = writer.run(threading.get_ident)
+        self.assertNotEqual(first, threading.get_ident())
+        self.assertEqual(writer.run(threading.get_ident), first)
+
+    def test_disabled_queue_runs_inline(self):
+        self.assertEqual(writer.run(threading.get_ident), threading.get_ident())
+
+
+class SQLiteWriterQueueTransactionTests(TestCase):
+    @override_settings(SQLITE={'WRITER_QUEUE': True})
+    def test_runs_inline_inside_a_transaction(self):
+        self.assertEqual(writer.run(threading.get_ident), threading.get_ident())
@@ -0,0 +1,19 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+
+class StartupBenchmarkTests(SimpleTestCase):
+    def test_api_profile_starts_without_admin_or_websockets(self):
+        output = StringIO()
+        call_command(
+            'startup_benchmark', entries='asgi', profiles='api', repeat=1, top=5, json=True, stdout=output,
+        )
+        result = json.loads(output.getvalue())['asgi/api']
+        # Anonymous request through DRF: URL conf, middleware and authentication all load
+        self.assertEqual(result['status'], 401)
+        self.assertEqual(result['watched_loaded'], [])
+        self.assertEqual(len(result['slowest_modules']), 5)
+        self.assertGreater(result['import_ms'], 0)
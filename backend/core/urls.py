@@ -14,11 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
+from .views import metrics_view, profile_download_view, profiles_view
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/auth/', include('users.auth_urls')),
     path('api/', include('core.api_urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+# API-only workers (core.settings_api) run without the admin
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns = [
+        # Staff-only pages under the admin, ahead of admin.site.urls
+        path('admin/profiles/', admin.site.admin_view(profiles_view), name='admin_profiles'),
+        path('admin/profiles/<str:name>', admin.site.admin_view(profile_download_view), name='admin_profile_download'),
+        path('admin/', admin.site.urls),
+    ] + urlpatterns
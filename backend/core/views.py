@@ -0,0 +1,69 @@
+import hmac
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.template.response import TemplateResponse
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
+from users.authentication import ClaimsJWTAuthentication
+
+from . import metrics, profiling
+from .db import database_status, pool_stats
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def database_status_view(request):
+    """Connection reuse and pool usage of this worker process"""
+    if request.user.role != 'admin' and not request.user.is_staff:
+        return Response({'detail': 'Only administrators can view database status.'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(database_status())
+
+
+def _can_read_metrics(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(header, f'Bearer {token}'):
+        return True
+    # API-only workers have no AuthenticationMiddleware
+    user = getattr(request, 'user', None) or AnonymousUser()
+    if not user.is_authenticated and header:
+        try:
+            user, _ = ClaimsJWTAuthentication().authenticate(request) or (user, None)
+        except AuthenticationFailed:
+            return False
+    return user.is_authenticated and (user.role == 'admin' or user.is_staff)
+
+
+def metrics_view(request):
+    """Metrics of this worker process in the Prometheus text format"""
+    # A plain view: DRF would reject the scrape token as an invalid JWT
+    if not _can_read_metrics(request):
+        return HttpResponseForbidden('Metrics require METRICS_TOKEN or an administrator.')
+    # Refresh the pool gauges
+    for alias in settings.DATABASES:
+        pool_stats(alias)
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def profiles_view(request):
+    """Admin page listing the saved profiles"""
+    from django.contrib import admin
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Profiles',
+        'profiles': profiling.list_profiles(),
+        'enabled': profiling.get_profiling_setting('ENABLED'),
+    }
+    return TemplateResponse(request, 'admin/profiles.html', context)
+
+
+def profile_download_view(request, name):
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404('No such profile')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name, content_type='text/plain')
@@ -1,10 +1,33 @@
 from django.contrib import admin
+from tasks.models import task_count
 from .models import Institution
 
 @admin.register(Institution)
 class InstitutionAdmin(admin.ModelAdmin):
     list_display = ('name', 'supervisor', 'supervisor_name', 'is_active', 'created_at')
     list_filter = ('is_active', 'created_at')
+    list_select_related = ('supervisor',)
     search_fields = ('name', 'supervisor__username', 'supervisor__first_name', 'supervisor__last_name')
     ordering = ('-created_at',)
     readonly_fields = ('total_tasks', 'completed_tasks', 'completion_rate', 'created_at', 'updated_at')
+    autocomplete_fields = ('supervisor',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            task_count=task_count('institution'),
+            completed_task_count=task_count('institution', status='completed'),
+        )
+
+    @admin.display(description='Total tasks', ordering='task_count')
+    def total_tasks(self, obj):
+        return obj.task_count
+
+    @admin.display(description='Completed tasks')
+    def completed_tasks(self, obj):
+        return obj.completed_task_count
+
+    @admin.display(description='Completion rate')
+    def completion_rate(self, obj):
+        if obj.task_count == 0:
+            return 0
+        return round((obj.completed_task_count / obj.task_count) * 100)
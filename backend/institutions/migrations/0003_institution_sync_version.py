@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('institutions', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institution',
+            name='sync_version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -18,6 +18,8 @@ class Institution(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Position in the change sequence, see sync/signals.py
+    sync_version = models.BigIntegerField(default=0, db_index=True, editable=False)
     
     def __str__(self):
         return self.name
@@ -26,12 +28,17 @@ class Institution(models.Model):
     def supervisor_name(self):
         return self.supervisor.full_name if self.supervisor else "No supervisor assigned"
     
+    # The counts come from InstitutionValuesSerializer.task_counts() when the queryset was annotated
     @property
     def total_tasks(self):
+        if hasattr(self, 'task_total'):
+            return self.task_total
         return self.tasks.count()
     
     @property
     def completed_tasks(self):
+        if hasattr(self, 'task_completed'):
+            return self.task_completed
         return self.tasks.filter(status='completed').count()
     
     @property
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from core.fastread import Computed, ValuesSerializer, full_name
+from tasks.models import task_count
 from .models import Institution
 
 class InstitutionSerializer(serializers.ModelSerializer):
@@ -15,3 +17,38 @@ class InstitutionSerializer(serializers.ModelSerializer):
             'completed_tasks', 'completion_rate', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+def _supervisor_name(row, context):
+    if row['supervisor'] is None:
+        return "No supervisor assigned"
+    return full_name(row['supervisor__first_name'], row['supervisor__last_name'], row['supervisor__username'])
+
+def _completion_rate(row, context):
+    total = row['task_total']
+    return round((row['task_completed'] / total) * 100) if total else 0
+
+class InstitutionValuesSerializer(ValuesSerializer):
+    """values()-based ``InstitutionSerializer``; the task counts come from one aggregate"""
+    serializer_class = InstitutionSerializer
+    computed = {
+        'supervisor_name': Computed(
+            ['supervisor', 'supervisor__first_name', 'supervisor__last_name', 'supervisor__username'],
+            _supervisor_name,
+        ),
+        'total_tasks': Computed(['task_total'], lambda row, context: row['task_total']),
+        'completed_tasks': Computed(['task_completed'], lambda row, context: row['task_completed']),
+        'completion_rate': Computed(['task_completed', 'task_total'], _completion_rate),
+    }
+
+    @staticmethod
+    def task_counts():
+        """Per-row task count subqueries; unlike ``Count('tasks')`` they keep the queryset ungrouped"""
+        return {
+            'task_total': task_count('institution'),
+            'task_completed': task_count('institution', status='completed'),
+        }
+
+    @classmethod
+    def values(cls, queryset):
+        counts = {name: count for name, count in cls.task_counts().items() if name not in queryset.query.annotations}
+        return super().values(queryset.annotate(**counts))
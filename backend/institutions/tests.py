@@ -1,3 +1,58 @@
 from django.test import TestCase
+from django.core.cache import cache
+from core import metrics
+from core.benchmarks import EndpointBenchmarkMixin
+from users.models import User
+from .models import Institution
 
-# Create your tests here.
+
+class InstitutionEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    def test_institution_list(self):
+        self.benchmark('/api/institutions/', budget=2, name='institutions-list')
+
+    def test_institution_detail(self):
+        self.benchmark(f"/api/institutions/{self.data['institution'].pk}/", budget=1, name='institutions-detail')
+
+    def test_admin_changelist(self):
+        client = self.admin_client_for(self.data['admin'])
+        self.benchmark('/admin/institutions/institution/', budget=5, client=client, name='admin-institutions-changelist')
+
+    def test_admin_change_form(self):
+        client = self.admin_client_for(self.data['admin'])
+        path = f"/admin/institutions/institution/{self.data['institution'].pk}/change/"
+        self.benchmark(path, budget=4, client=client, name='admin-institutions-change')
+
+
+class CachedInstitutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.institution = Institution.objects.create(name='Before')
+        self.client.force_login(User.objects.create_user('viewer', role='observer'))
+
+    def test_list_is_cached_until_a_model_changes(self):
+        self.assertEqual(self.client.get('/api/institutions/')['X-Cache'], 'MISS')
+        with self.assertNumQueries(2):
+            # Session authentication only
+            response = self.client.get('/api/institutions/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['results'][0]['name'], 'Before')
+        self.assertEqual(
+            metrics.get_counter('api_cache_requests_total', {'view': 'institution', 'action': 'list', 'result': 'hit'}), 1
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.institution.name = 'After'
+            self.institution.save()
+        response = self.client.get(f'/api/institutions/{self.institution.pk}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/institutions/').json()['results'][0]['name'], 'After')
+
+    def test_versions_are_bumped_when_the_write_commits(self):
+        self.client.get('/api/institutions/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.institution.name = 'After'
+            self.institution.save()
+            # Uncommitted rows must not be cached under a new version
+            self.assertEqual(self.client.get('/api/institutions/')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/api/institutions/')['X-Cache'], 'MISS')
@@ -1,11 +1,27 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from activity.views import activity_feed
+from core.cache import CachedViewSetMixin
+from core.fastread import FastListMixin
+from tasks.models import Task
+from users.models import User
 from .models import Institution
-from .serializers import InstitutionSerializer
+from .serializers import InstitutionSerializer, InstitutionValuesSerializer
 
 # Create your views here.
 
-class InstitutionViewSet(viewsets.ModelViewSet):
-    queryset = Institution.objects.all()
+class InstitutionViewSet(CachedViewSetMixin, FastListMixin, viewsets.ModelViewSet):
+    # Supervisor names and task counts come from users and tasks
+    cache_models = (User, Task)
+    queryset = Institution.objects.select_related('supervisor').annotate(
+        **InstitutionValuesSerializer.task_counts()
+    ).order_by('-created_at', 'pk')
     serializer_class = InstitutionSerializer
+    values_serializer_class = InstitutionValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
+
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        """Changes to the institution's tasks and their comments and evidence, newest first"""
+        return activity_feed(request, institution_id=self.get_object().pk)
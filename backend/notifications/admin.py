@@ -0,0 +1,20 @@
+from django.contrib import admin
+from core.pagination import EstimatedCountPaginator
+from .models import Notification, NotificationCounter
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('updated_at', 'recipient', 'kind', 'title', 'count', 'read_at')
+    list_filter = ('kind',)
+    list_select_related = ('recipient',)
+    search_fields = ('title',)
+    autocomplete_fields = ('recipient',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'unread')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user',)
@@ -0,0 +1,74 @@
+import json
+from urllib.parse import parse_qs
+from asgiref.sync import async_to_sync
+from channels.generic.websocket import WebsocketConsumer
+from rest_framework.exceptions import AuthenticationFailed
+from core.instrumentation import instrument_event
+from users.authentication import ClaimsJWTAuthentication
+from .dispatch import group_name
+from .models import unread_count
+
+
+class NotificationConsumer(WebsocketConsumer):
+    """Pushes a user's new notifications and unread count to every socket they have open"""
+
+    def websocket_connect(self, message):
+        with instrument_event('notifications', 'connect'):
+            super().websocket_connect(message)
+
+    def connect(self):
+        self.group_name = None
+        user_id = self.authenticate()
+        if user_id is None:
+            self.close(code=4001)
+            return
+
+        self.group_name = group_name(user_id)
+        async_to_sync(self.channel_layer.group_add)(
+            self.group_name,
+            self.channel_name
+        )
+        self.accept()
+        self.send(text_data=json.dumps({
+            'type': 'unread',
+            'unread': unread_count(user_id),
+        }))
+
+    def authenticate(self):
+        """Id of the session user, or of the user of the ``?token=`` access token"""
+        user = self.scope.get('user')
+        if user is not None and user.is_authenticated:
+            return user.pk
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        token = query.get('token', [None])[0]
+        if not token:
+            return None
+        authentication = ClaimsJWTAuthentication()
+        try:
+            return authentication.get_user(authentication.get_validated_token(token)).pk
+        except AuthenticationFailed:
+            return None
+
+    def disconnect(self, close_code):
+        if self.group_name is not None:
+            async_to_sync(self.channel_layer.group_discard)(
+                self.group_name,
+                self.channel_name
+            )
+
+    def receive(self, text_data=None, bytes_data=None):
+        # Notifications are marked read through the REST API
+        pass
+
+    def notification_created(self, event):
+        self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': event['notification'],
+            'unread': event['unread'],
+        }))
+
+    def notification_unread(self, event):
+        self.send(text_data=json.dumps({
+            'type': 'unread',
+            'unread': event['unread'],
+        }))
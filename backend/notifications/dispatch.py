@@ -0,0 +1,381 @@
+"""
+Fan-out of task events to user inboxes.
+
+Signal receivers only call ``notify()``, which queues the event once the
+surrounding transaction commits; nothing else happens on the request thread.
+When the request finishes (or right away outside a request: shells,
+management commands, consumers) the queued events are handed to a background
+thread (``ASYNC``), which resolves their recipients, writes the inbox rows
+with one bulk insert, bumps the unread counters and pushes the new
+notifications to the recipients' sockets over the channel layer.
+
+Bursts are coalesced. Events for the same recipient, kind and project
+delivered together become one digest once there are ``DIGEST_THRESHOLD`` of
+them, and events arriving within ``DIGEST_WINDOW`` seconds of an unread
+notification of the same kind and project are merged into it; if it was read
+in the meantime, they start a new notification instead.
+"""
+
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from activity.recorder import in_request
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ASYNC': True,
+    # Events of one kind for one recipient and project that make a digest (0 disables)
+    'DIGEST_THRESHOLD': 3,
+    # Seconds an unread notification keeps absorbing new events (0 disables)
+    'DIGEST_WINDOW': 300,
+    # Events queued before they are delivered without waiting for the request to finish
+    'BATCH_SIZE': 1000,
+    'DUE_SOON_HOURS': 24,
+}
+
+TITLES = {
+    'task_assigned': '{actor} assigned you to "{task}"',
+    'task_comment': '{actor} commented on "{task}"',
+    'task_due': '"{task}" is due soon',
+}
+DIGEST_TITLES = {
+    'task_assigned': '{count} tasks in {project} were assigned to you',
+    'task_comment': '{count} new comments in {project}',
+    'task_due': '{count} of your tasks in {project} are due soon',
+}
+# Task ids listed on a digest
+MAX_DIGEST_TASKS = 50
+
+_pending = []
+_lock = threading.Lock()
+_executor = None
+
+
+def get_notification_setting(name):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+def group_name(user_id):
+    """Channel layer group of a user's notification sockets"""
+    return f'notifications_{user_id}'
+
+
+def event(kind, task_id, actor_id=None, recipient_id=None):
+    """An event about a task; without ``recipient_id`` it goes to the task's followers"""
+    return {'kind': kind, 'task_id': task_id, 'actor_id': actor_id, 'recipient_id': recipient_id}
+
+
+def notify(kind, task_id, actor_id=None, recipient_id=None):
+    """Queue an event for delivery after the current transaction commits"""
+    if not get_notification_setting('ENABLED'):
+        return
+    queued = event(kind, task_id, actor_id, recipient_id)
+    transaction.on_commit(lambda: _append(queued))
+
+
+def _append(queued):
+    with _lock:
+        _pending.append(queued)
+        full = len(_pending) >= get_notification_setting('BATCH_SIZE')
+    # Nothing else flushes shells, commands and consumers
+    if full or not in_request():
+        flush()
+
+
+def pending():
+    with _lock:
+        return len(_pending)
+
+
+def reset():
+    """Discard the queued events"""
+    with _lock:
+        _pending.clear()
+
+
+def flush():
+    """Deliver the queued events, on the background thread when ``ASYNC`` is set"""
+    with _lock:
+        events = _pending[:]
+        _pending.clear()
+    if not events:
+        return
+    if get_notification_setting('ASYNC'):
+        _get_executor().submit(_deliver_in_background, events)
+    else:
+        _deliver_safely(events)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+        return _executor
+
+
+def _deliver_in_background(events):
+    # The thread outlives requests, so it manages its connection like one
+    close_old_connections()
+    try:
+        _deliver_safely(events)
+    finally:
+        close_old_connections()
+
+
+def _deliver_safely(events):
+    try:
+        deliver(events)
+    except Exception:
+        # The change itself is committed; a lost notification must not fail anything
+        logger.exception('Dropped %d notification events', len(events))
+        metrics.increment('notification_events_dropped_total', len(events))
+
+
+def _resolve(events):
+    """Expand events to one per recipient, with the task's title and project"""
+    from tasks.models import Task, TaskComment
+
+    task_ids = {queued['task_id'] for queued in events}
+    tasks = {}
+    followers = defaultdict(set)
+    for task_id, title, project_id, assignee_id, creator_id in Task.objects.filter(pk__in=task_ids).values_list(
+        'pk', 'title', 'project_id', 'assignee_id', 'project__created_by_id'
+    ):
+        tasks[task_id] = (title, project_id)
+        followers[task_id].update(user_id for user_id in (assignee_id, creator_id) if user_id is not None)
+    if any(queued['recipient_id'] is None for queued in events):
+        commenters = TaskComment.objects.filter(task_id__in=task_ids).values_list('task_id', 'author_id').distinct()
+        for task_id, author_id in commenters:
+            followers[task_id].add(author_id)
+
+    resolved = []
+    for queued in events:
+        if queued['task_id'] not in tasks:
+            # Deleted before delivery
+            continue
+        title, project_id = tasks[queued['task_id']]
+        recipients = followers[queued['task_id']] if queued['recipient_id'] is None else {queued['recipient_id']}
+        resolved += [
+            {**queued, 'recipient_id': recipient_id, 'task_title': title, 'project_id': project_id}
+            for recipient_id in sorted(recipients)
+            # Nobody is notified about their own changes
+            if recipient_id != queued['actor_id']
+        ]
+    return resolved
+
+
+def _labels(events, digest_projects):
+    """Names of the actors and titles of the projects the notification titles mention"""
+    from projects.models import Project
+    from users.models import User
+
+    actor_ids = {queued['actor_id'] for queued in events if queued['actor_id'] is not None}
+    actors = {}
+    if actor_ids:
+        for user in User.objects.filter(pk__in=actor_ids).only('username', 'first_name', 'last_name'):
+            actors[user.pk] = user.full_name
+    projects = {}
+    if digest_projects:
+        projects = dict(Project.objects.filter(pk__in=digest_projects).values_list('pk', 'title'))
+    return actors, projects
+
+
+def _title(notification, latest, actors, projects):
+    if notification.count > 1:
+        project = projects.get(notification.project_id, 'a project')
+        title = DIGEST_TITLES[notification.kind].format(count=notification.count, project=project)
+    else:
+        actor = actors.get(latest['actor_id'], 'Someone')
+        title = TITLES[notification.kind].format(actor=actor, task=latest['task_title'])
+    return title[:255]
+
+
+# Fields a merge writes; the rest of the row is left as it was
+MERGED_FIELDS = ['title', 'task_id', 'actor_id', 'count', 'data', 'updated_at']
+
+
+def _new_notifications(key, group, threshold, now):
+    """Rows for events with no notification to merge into: one digest, or one per event"""
+    from .models import Notification
+
+    recipient_id, kind, project_id = key
+
+    def new():
+        return Notification(recipient_id=recipient_id, kind=kind, project_id=project_id, count=0, created_at=now)
+
+    if threshold and len(group) >= threshold:
+        return [(new(), group)]
+    return [(new(), [queued]) for queued in group]
+
+
+def _add_events(notification, group, now):
+    earlier = notification.data.get('task_ids') or [notification.task_id] * bool(notification.task_id)
+    # Newest first, without repeats
+    task_ids = list(dict.fromkeys([queued['task_id'] for queued in reversed(group)] + earlier))
+    notification.count += len(group)
+    notification.task_id = group[-1]['task_id']
+    notification.actor_id = group[-1]['actor_id']
+    notification.data = {'task_ids': task_ids[:MAX_DIGEST_TASKS]} if notification.count > 1 else {}
+    notification.updated_at = now
+
+
+def deliver(events):
+    """Write and publish the notifications for ``events``; returns the rows created or merged into"""
+    from .models import Notification
+
+    events = _resolve(events)
+    if not events:
+        return []
+
+    now = timezone.now()
+    groups = defaultdict(list)
+    for queued in events:
+        groups[(queued['recipient_id'], queued['kind'], queued['project_id'])].append(queued)
+
+    # Unread notifications still open to more events, newest per group
+    open_notifications = {}
+    window = get_notification_setting('DIGEST_WINDOW')
+    if window:
+        recent = Notification.objects.filter(
+            recipient_id__in={key[0] for key in groups},
+            kind__in={key[1] for key in groups},
+            read_at__isnull=True,
+            updated_at__gte=now - timedelta(seconds=window),
+        ).order_by('updated_at', 'id')
+        for notification in recent:
+            open_notifications[(notification.recipient_id, notification.kind, notification.project_id)] = notification
+
+    threshold = get_notification_setting('DIGEST_THRESHOLD')
+    created, merged = [], []
+    for key, group in groups.items():
+        notification = open_notifications.get(key)
+        if notification is not None:
+            merged.append((notification, group, notification.updated_at))
+        else:
+            created += _new_notifications(key, group, threshold, now)
+
+    for notification, group in created:
+        _add_events(notification, group, now)
+    for notification, group, _ in merged:
+        _add_events(notification, group, now)
+
+    actors, projects = _labels(events, {n.project_id for n, *_ in created + merged if n.count > 1})
+    for notification, group, *_ in created + merged:
+        notification.title = _title(notification, group[-1], actors, projects)
+
+    with transaction.atomic():
+        merged_into = []
+        for notification, group, seen in merged:
+            # Only into the row as it was fetched: mark_read (or another
+            # process delivering) may have changed it since
+            updated = Notification.objects.filter(pk=notification.pk, read_at__isnull=True, updated_at=seen).update(
+                **{field: getattr(notification, field) for field in MERGED_FIELDS}
+            )
+            if updated:
+                merged_into.append(notification)
+                continue
+            key = (notification.recipient_id, notification.kind, notification.project_id)
+            for reopened, events_of in _new_notifications(key, group, threshold, now):
+                _add_events(reopened, events_of, now)
+                reopened.title = _title(reopened, events_of[-1], actors, projects)
+                created.append((reopened, events_of))
+        created = [notification for notification, _ in created]
+        Notification.objects.bulk_create(created)
+        _increment_unread(Counter(notification.recipient_id for notification in created))
+    metrics.increment('notifications_created_total', len(created))
+    metrics.increment('notifications_merged_total', len(merged_into))
+
+    _publish(created + merged_into)
+    return created + merged_into
+
+
+def _increment_unread(added):
+    """Add ``added[user_id]`` to each user's unread counter"""
+    from .models import NotificationCounter
+
+    if not added:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in added], ignore_conflicts=True,
+    )
+    # One UPDATE per distinct amount, usually one or two
+    by_amount = defaultdict(list)
+    for user_id, amount in added.items():
+        by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + amount)
+
+
+def _send(messages):
+    """Send ``(group, message)`` pairs on the channel layer in one event loop"""
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    if layer is None or not messages:
+        return
+
+    async def send_all():
+        for group, message in messages:
+            await layer.group_send(group, message)
+
+    try:
+        async_to_sync(send_all)()
+    except Exception:
+        # Sockets pick the notifications up from the inbox on their next load
+        logger.exception('Failed to publish %d notification messages', len(messages))
+        metrics.increment('notification_publish_failures_total')
+
+
+def _publish(notifications):
+    from .models import NotificationCounter
+    from .serializers import NotificationSerializer
+
+    unread = dict(NotificationCounter.objects.filter(
+        user_id__in={notification.recipient_id for notification in notifications},
+    ).values_list('user_id', 'unread'))
+    _send([
+        (group_name(notification.recipient_id), {
+            'type': 'notification.created',
+            'notification': NotificationSerializer(notification).data,
+            'unread': unread.get(notification.recipient_id, 0),
+        })
+        for notification in notifications
+    ])
+
+
+def publish_unread(user_id, unread):
+    """Tell the user's other sockets that their unread count changed"""
+    _send([(group_name(user_id), {'type': 'notification.unread', 'unread': unread})])
+
+
+def _request_finished(sender, **kwargs):
+    flush()
+
+
+def _flush_at_exit():
+    # The executor no longer takes work once the interpreter is shutting down
+    with _lock:
+        events = _pending[:]
+        _pending.clear()
+    if events:
+        _deliver_safely(events)
+
+
+def connect_signals():
+    request_finished.connect(_request_finished, dispatch_uid='notifications.dispatch.request_finished')
+    atexit.register(_flush_at_exit)
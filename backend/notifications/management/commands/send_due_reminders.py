@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.utils import timezone
+from notifications.dispatch import deliver, event, get_notification_setting
+from notifications.models import DueReminder
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = 'Notify assignees of open tasks due soon, once per due date (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=None,
+            help='Look-ahead in hours (default: NOTIFICATIONS_DUE_SOON_HOURS)',
+        )
+
+    def handle(self, *args, **options):
+        hours = options['hours'] or get_notification_setting('DUE_SOON_HOURS')
+        now = timezone.now()
+        due = list(
+            Task.objects.filter(
+                assignee__isnull=False,
+                due_date__gt=now,
+                due_date__lte=now + timedelta(hours=hours),
+            )
+            .exclude(status='completed')
+            # Already reminded about this due date
+            .exclude(due_reminder__due_date=F('due_date'))
+            .values_list('pk', 'assignee_id', 'due_date')
+        )
+        # One delivery, so each assignee gets a digest rather than a reminder per task
+        notifications = deliver([event('task_due', pk, recipient_id=assignee_id) for pk, assignee_id, _ in due])
+        DueReminder.objects.bulk_create(
+            [DueReminder(task_id=pk, due_date=due_date) for pk, _, due_date in due],
+            update_conflicts=True,
+            unique_fields=['task'],
+            update_fields=['due_date'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Reminded about {len(due)} tasks in {len(notifications)} notifications'
+        ))
@@ -0,0 +1,97 @@
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.conf import settings
+from django.utils import timezone
+
+class Notification(models.Model):
+    """
+    One row of a user's inbox. A notification with ``count`` above one is a
+    digest: a burst of events of the same kind in the same project (tasks
+    reassigned in bulk, a busy comment thread) coalesced into a single row.
+    Rows are written in batches by ``notifications.dispatch``.
+    """
+    KINDS = [
+        ('task_assigned', 'Task assigned'),
+        ('task_comment', 'New comment'),
+        ('task_due', 'Task due soon'),
+    ]
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='notifications'
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    title = models.CharField(max_length=255)
+    # Latest task the notification is about; digests list the others in data
+    task_id = models.BigIntegerField(null=True, blank=True)
+    project_id = models.BigIntegerField(null=True, blank=True)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    # Number of events coalesced into this row
+    count = models.PositiveIntegerField(default=1)
+    # {'task_ids': [...]} for digests
+    data = models.JSONField(default=dict, blank=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    # Bumped when more events are merged into a digest
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notification_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient_id}: {self.title}"
+
+    @property
+    def is_digest(self):
+        return self.count > 1
+
+
+class NotificationCounter(models.Model):
+    """Unread notifications per user, kept in step with the inbox so badges never COUNT(*)"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_counter'
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class DueReminder(models.Model):
+    """Due date a task's assignee was last reminded about, so reminders are sent once"""
+    task = models.OneToOneField(
+        'tasks.Task',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='due_reminder'
+    )
+    due_date = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.task_id} due {self.due_date}"
+
+
+def unread_count(user_id):
+    """Unread notifications of a user, read from their counter"""
+    unread = NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    return unread or 0
+
+
+def mark_read(user_id, **filters):
+    """Mark the user's unread notifications matching ``filters`` read; returns how many were"""
+    with transaction.atomic():
+        marked = Notification.objects.filter(
+            recipient_id=user_id, read_at__isnull=True, **filters
+        ).update(read_at=timezone.now())
+        if marked:
+            NotificationCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - marked, 0))
+    return marked
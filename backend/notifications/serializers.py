@@ -0,0 +1,13 @@
+from rest_framework import serializers
+from .models import Notification
+
+class NotificationSerializer(serializers.ModelSerializer):
+    is_digest = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = [
+            'id', 'kind', 'title', 'task_id', 'project_id', 'actor_id', 'count', 'is_digest', 'data',
+            'read_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from activity.recorder import current_actor_id
+from activity.signals import previous_values
+from tasks.models import Task, TaskComment
+from .dispatch import notify
+
+
+@receiver(post_save, sender=Task)
+def task_assigned(sender, instance, created, **kwargs):
+    if instance.assignee_id is None:
+        return
+    if not created:
+        # activity's pre_save snapshot: no query of our own
+        previous = previous_values(instance)
+        if previous.get('assignee_id', instance.assignee_id) == instance.assignee_id:
+            return
+    notify('task_assigned', instance.pk, actor_id=current_actor_id(), recipient_id=instance.assignee_id)
+
+
+@receiver(post_save, sender=TaskComment)
+def task_commented(sender, instance, created, **kwargs):
+    if created:
+        notify('task_comment', instance.task_id, actor_id=instance.author_id)
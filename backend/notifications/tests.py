@@ -0,0 +1,226 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from activity.recorder import acting_as
+from projects.models import Project
+from tasks.models import Task, TaskComment
+from users.models import User
+from users.views import CustomTokenObtainPairSerializer
+from . import dispatch
+from .models import Notification, NotificationCounter, mark_read, unread_count
+
+
+# Activity logging off: its writes would show up in the query counts
+@override_settings(NOTIFICATIONS={'ASYNC': False}, ACTIVITY={'ENABLED': False})
+class NotificationDeliveryTests(TestCase):
+    def setUp(self):
+        self.addCleanup(dispatch.reset)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.boss = User.objects.create_user('boss', role='admin')
+            self.worker = User.objects.create_user('worker', role='employee')
+        self.project = Project.objects.create(title='Project', description='', created_by=self.boss)
+        self.task = Task.objects.create(project=self.project, title='Task', description='')
+
+    def client_for(self, user):
+        client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def assign(self, tasks, assignee, actor=None):
+        self.queue_assignments(tasks, assignee, actor)
+        dispatch.flush()
+
+    def queue_assignments(self, tasks, assignee, actor=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            with acting_as(actor or self.boss):
+                for task in tasks:
+                    task.assignee = assignee
+                    task.save()
+
+    def test_assignment_is_delivered_after_the_request(self):
+        client = self.client_for(self.boss)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.patch(f'/api/tasks/{self.task.pk}/', {'assignee': self.worker.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Queued on commit, nothing written by the request itself
+        self.assertFalse(Notification.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.recipient, self.worker)
+        self.assertEqual(notification.title, 'boss assigned you to "Task"')
+        self.assertEqual((notification.task_id, notification.actor_id), (self.task.pk, self.boss.pk))
+
+        client = self.client_for(self.worker)
+        # The badge reads the counter
+        with self.assertNumQueries(1):
+            response = client.get('/api/notifications/unread-count/')
+        self.assertEqual(response.json(), {'unread': 1})
+        self.assertEqual(client.get('/api/notifications/').json()['results'][0]['id'], notification.pk)
+
+    def test_events_outside_a_request_are_delivered_on_commit(self):
+        self.queue_assignments([self.task], self.worker)
+        self.assertEqual(dispatch.pending(), 0)
+        self.assertEqual(Notification.objects.get().recipient, self.worker)
+
+    def test_own_changes_are_not_notified(self):
+        self.assign([self.task], self.worker, actor=self.worker)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_comments_notify_the_task_followers(self):
+        colleague = User.objects.create_user('colleague', role='employee')
+        self.task.assignee = self.worker
+        self.task.save()
+        TaskComment.objects.create(task=self.task, author=colleague, content='First')
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskComment.objects.create(task=self.task, author=self.worker, content='Done')
+        dispatch.flush()
+
+        notifications = Notification.objects.filter(kind='task_comment')
+        self.assertEqual({n.recipient_id for n in notifications}, {self.boss.pk, colleague.pk})
+        self.assertEqual(notifications[0].title, 'worker commented on "Task"')
+
+    def test_bulk_reassignment_is_one_digest(self):
+        tasks = [
+            Task.objects.create(project=self.project, title=f'Task {n}', description='')
+            for n in range(60)
+        ]
+        self.queue_assignments(tasks[:5], self.worker)
+        with CaptureQueriesContext(connection) as small:
+            dispatch.flush()
+        Notification.objects.all().delete()
+        NotificationCounter.objects.all().delete()
+
+        self.queue_assignments(tasks[5:], self.worker)
+        # Same queries however large the burst
+        with self.assertNumQueries(len(small)):
+            dispatch.flush()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.count, 55)
+        self.assertEqual(notification.title, '55 tasks in Project were assigned to you')
+        self.assertEqual(notification.data['task_ids'][0], tasks[-1].pk)
+        self.assertEqual(len(notification.data['task_ids']), dispatch.MAX_DIGEST_TASKS)
+        self.assertEqual(unread_count(self.worker.pk), 1)
+
+    def test_events_merge_into_an_unread_notification(self):
+        other = Task.objects.create(project=self.project, title='Other', description='')
+        self.assign([self.task], self.worker)
+        self.assign([other], self.worker)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.count, notification.task_id), (2, other.pk))
+        self.assertEqual(unread_count(self.worker.pk), 1)
+
+        # Once read, the next event starts a new notification
+        self.client_for(self.worker).post(f'/api/notifications/{notification.pk}/read/')
+        self.assign([self.task], None)
+        self.assign([self.task], self.worker)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(unread_count(self.worker.pk), 1)
+
+    def test_notifications_read_during_delivery_are_not_merged_into(self):
+        other = Task.objects.create(project=self.project, title='Other', description='')
+        self.assign([self.task], self.worker)
+        read = Notification.objects.get()
+        labels = dispatch._labels
+
+        def read_meanwhile(*args):
+            # After the open notifications were fetched, before they are written
+            mark_read(self.worker.pk)
+            return labels(*args)
+
+        with mock.patch.object(dispatch, '_labels', read_meanwhile):
+            self.assign([other], self.worker)
+        read.refresh_from_db()
+        self.assertEqual((read.count, read.task_id), (1, self.task.pk))
+        new = Notification.objects.get(read_at__isnull=True)
+        self.assertEqual((new.count, new.task_id), (1, other.pk))
+        self.assertEqual(unread_count(self.worker.pk), 1)
+
+    @override_settings(NOTIFICATIONS={'ASYNC': False, 'DIGEST_WINDOW': 0})
+    def test_mark_read(self):
+        tasks = [Task.objects.create(project=self.project, title=f'T{n}', description='') for n in range(2)]
+        self.assign(tasks[:1], self.worker)
+        self.assign(tasks[1:], self.worker)
+        self.assertEqual(unread_count(self.worker.pk), 2)
+
+        client = self.client_for(self.worker)
+        first = Notification.objects.order_by('id').first()
+        self.assertEqual(client.post(f'/api/notifications/{first.pk}/read/').json(), {'marked': 1, 'unread': 1})
+        self.assertEqual(client.post(f'/api/notifications/{first.pk}/read/').json(), {'marked': 0, 'unread': 1})
+        self.assertEqual(len(client.get('/api/notifications/?unread=true').json()['results']), 1)
+        self.assertEqual(client.post('/api/notifications/read-all/').json(), {'marked': 1, 'unread': 0})
+        # Other users' notifications are not reachable
+        self.assertEqual(self.client_for(self.boss).post(f'/api/notifications/{first.pk}/read/').status_code, 404)
+
+    def test_live_delivery_over_the_channel_layer(self):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(dispatch.group_name(self.worker.pk), channel)
+        self.addCleanup(async_to_sync(layer.flush))
+
+        self.assign([self.task], self.worker)
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(message['type'], 'notification.created')
+        self.assertEqual(message['notification']['title'], 'boss assigned you to "Task"')
+        self.assertEqual(message['unread'], 1)
+
+    @override_settings(NOTIFICATIONS={'ASYNC': True})
+    def test_async_delivery_leaves_the_request_thread(self):
+        executor = mock.Mock()
+        with mock.patch.object(dispatch, '_get_executor', return_value=executor):
+            self.assign([self.task], self.worker)
+        executor.submit.assert_called_once()
+        self.assertIs(executor.submit.call_args.args[0], dispatch._deliver_in_background)
+        self.assertFalse(Notification.objects.exists())
+
+
+@override_settings(NOTIFICATIONS={'ASYNC': False})
+class DueReminderTests(TestCase):
+    def setUp(self):
+        self.addCleanup(dispatch.reset)
+        self.worker = User.objects.create_user('worker', role='employee')
+        self.project = Project.objects.create(title='Project', description='', created_by=self.worker)
+        soon = timezone.now() + timedelta(hours=6)
+        self.tasks = [
+            Task.objects.create(
+                project=self.project, title=f'Task {n}', description='', assignee=self.worker, due_date=soon,
+            )
+            for n in range(3)
+        ]
+        Task.objects.create(
+            project=self.project, title='Later', description='', assignee=self.worker,
+            due_date=soon + timedelta(days=7),
+        )
+        Task.objects.create(
+            project=self.project, title='Done', description='', assignee=self.worker, due_date=soon,
+            status='completed',
+        )
+
+    def remind(self):
+        out = StringIO()
+        call_command('send_due_reminders', stdout=out)
+        return out.getvalue()
+
+    def test_one_digest_per_assignee_and_due_date(self):
+        self.assertIn('Reminded about 3 tasks in 1 notifications', self.remind())
+        notification = Notification.objects.get()
+        self.assertEqual((notification.kind, notification.count), ('task_due', 3))
+
+        self.assertIn('Reminded about 0 tasks', self.remind())
+
+        task = self.tasks[0]
+        task.due_date += timedelta(hours=1)
+        task.save()
+        self.assertIn('Reminded about 1 tasks', self.remind())
@@ -0,0 +1,48 @@
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from .dispatch import publish_unread
+from .models import Notification, mark_read, unread_count
+from .serializers import NotificationSerializer
+
+
+class NotificationPagination(CursorPagination):
+    """Keyset pagination over the inbox index"""
+    ordering = ('-updated_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """The current user's inbox, newest first (?unread=true for unread only)"""
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = NotificationPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(recipient_id=self.request.user.pk)
+        if self.request.query_params.get('unread') == 'true':
+            queryset = queryset.filter(read_at__isnull=True)
+        return queryset
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """Badge count from the user's counter, without counting the inbox"""
+        return Response({'unread': unread_count(request.user.pk)})
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        notification = self.get_object()
+        return self.marked(mark_read(request.user.pk, pk=notification.pk))
+
+    @action(detail=False, methods=['post'], url_path='read-all')
+    def read_all(self, request):
+        return self.marked(mark_read(request.user.pk))
+
+    def marked(self, count):
+        unread = unread_count(self.request.user.pk)
+        if count:
+            publish_unread(self.request.user.pk, unread)
+        return Response({'marked': count, 'unread': unread})
@@ -0,0 +1,82 @@
+"""
+Per-user project visibility backed by the ``ProjectAccess`` table.
+
+Supervisors and employees see the projects they created and the projects they
+have tasks in. Instead of recomputing that with a ``UNION`` on every request,
+the pairs are kept in ``ProjectAccess`` and refreshed for the affected
+``(user, project)`` pairs whenever a project or task changes.
+"""
+
+from django.db import transaction
+
+from .models import Project, ProjectAccess
+
+# Roles that see everything, as in dashboard_stats_view
+UNSCOPED_ROLES = ('admin', 'observer')
+
+
+def accessible_project_ids(user):
+    """Subquery of the project ids ``user`` can see"""
+    return ProjectAccess.objects.filter(user_id=user.pk).values('project_id')
+
+
+def scope_to_user(queryset, user, project_field='pk'):
+    """
+    Restrict ``queryset`` to rows in projects visible to ``user``.
+    ``project_field`` is the lookup from the queryset's model to the project id,
+    e.g. ``'pk'`` for projects and ``'project'`` for tasks.
+    """
+    if user.is_superuser or user.role in UNSCOPED_ROLES:
+        return queryset
+    return queryset.filter(**{f'{project_field}__in': accessible_project_ids(user)})
+
+
+def refresh_access(pairs):
+    """Recompute the access rows for the given ``(user_id, project_id)`` pairs"""
+    from tasks.models import Task
+
+    pairs = {(user_id, project_id) for user_id, project_id in pairs if user_id and project_id}
+    if not pairs:
+        return
+    user_ids = {user_id for user_id, _ in pairs}
+    project_ids = {project_id for _, project_id in pairs}
+
+    granted = set(
+        Project.objects.filter(pk__in=project_ids, created_by_id__in=user_ids).values_list('created_by_id', 'pk')
+    )
+    granted.update(
+        Task.objects.filter(project_id__in=project_ids, assignee_id__in=user_ids)
+        .values_list('assignee_id', 'project_id').distinct()
+    )
+    granted &= pairs
+    revoked = pairs - granted
+
+    with transaction.atomic():
+        for user_id, project_id in revoked:
+            ProjectAccess.objects.filter(user_id=user_id, project_id=project_id).delete()
+        ProjectAccess.objects.bulk_create(
+            [ProjectAccess(user_id=user_id, project_id=project_id) for user_id, project_id in granted],
+            ignore_conflicts=True,
+        )
+
+
+def rebuild_access(batch_size=2000):
+    """Recreate the whole table; needed after ``bulk_create`` imports, which skip signals"""
+    from tasks.models import Task
+
+    pairs = Project.objects.order_by().values_list('created_by_id', 'pk').union(
+        Task.objects.filter(assignee__isnull=False).order_by().values_list('assignee_id', 'project_id')
+    )
+    created = 0
+    with transaction.atomic():
+        ProjectAccess.objects.all().delete()
+        batch = []
+        for user_id, project_id in pairs.iterator(chunk_size=batch_size):
+            batch.append(ProjectAccess(user_id=user_id, project_id=project_id))
+            if len(batch) >= batch_size:
+                ProjectAccess.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ProjectAccess.objects.bulk_create(batch)
+        created += len(batch)
+    return created
@@ -1,10 +1,44 @@
 from django.contrib import admin
+from tasks.models import task_count
 from .models import Project
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     list_display = ('title', 'status', 'created_by', 'total_tasks', 'completion_percentage', 'created_at')
-    list_filter = ('status', 'created_at', 'created_by')
+    list_filter = ('status', 'created_at', ('created_by', admin.RelatedOnlyFieldListFilter))
+    list_select_related = ('created_by',)
     search_fields = ('title', 'description', 'created_by__username')
     ordering = ('-created_at',)
     readonly_fields = ('total_tasks', 'completed_tasks', 'in_progress_tasks', 'initial_tasks', 'completion_percentage', 'created_at', 'updated_at')
+    autocomplete_fields = ('created_by',)
+
+    def get_queryset(self, request):
+        # Task counts as subqueries of the page query instead of four COUNTs per project
+        return super().get_queryset(request).annotate(
+            task_count=task_count('project'),
+            completed_task_count=task_count('project', status='completed'),
+            in_progress_task_count=task_count('project', status='in_progress'),
+            initial_task_count=task_count('project', status='initial'),
+        )
+
+    @admin.display(description='Total tasks', ordering='task_count')
+    def total_tasks(self, obj):
+        return obj.task_count
+
+    @admin.display(description='Completed tasks')
+    def completed_tasks(self, obj):
+        return obj.completed_task_count
+
+    @admin.display(description='In progress tasks')
+    def in_progress_tasks(self, obj):
+        return obj.in_progress_task_count
+
+    @admin.display(description='Initial tasks')
+    def initial_tasks(self, obj):
+        return obj.initial_task_count
+
+    @admin.display(description='Completion percentage')
+    def completion_percentage(self, obj):
+        if obj.task_count == 0:
+            return 0
+        return round((obj.completed_task_count / obj.task_count) * 100)
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+from projects.access import rebuild_access
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the user -> project visibility table from projects and task assignments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = rebuild_access(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt project access: {created} rows in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate(apps, schema_editor):
+    Project = apps.get_model('projects', 'Project')
+    ProjectAccess = apps.get_model('projects', 'ProjectAccess')
+    Task = apps.get_model('tasks', 'Task')
+    pairs = set(Project.objects.values_list('created_by_id', 'id'))
+    pairs.update(Task.objects.filter(assignee__isnull=False).values_list('assignee_id', 'project_id').distinct())
+    ProjectAccess.objects.bulk_create(
+        [ProjectAccess(user_id=user_id, project_id=project_id) for user_id, project_id in pairs],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_initial'),
+        ('tasks', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='projects.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'project'), name='project_access_user_project_uniq')],
+            },
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_project_access'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='sync_version',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
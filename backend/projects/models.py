@@ -21,6 +21,8 @@ class Project(models.Model):
     budget = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Position in the change sequence, see sync/signals.py
+    sync_version = models.BigIntegerField(default=0, db_index=True, editable=False)
     
     class Meta:
         ordering = ['-created_at']
@@ -28,20 +30,29 @@ class Project(models.Model):
     def __str__(self):
         return self.title
     
+    # The counts come from ProjectValuesSerializer.task_counts() when the queryset was annotated
     @property
     def total_tasks(self):
+        if hasattr(self, 'task_total'):
+            return self.task_total
         return self.tasks.count()
     
     @property
     def completed_tasks(self):
+        if hasattr(self, 'task_completed'):
+            return self.task_completed
         return self.tasks.filter(status='completed').count()
     
     @property
     def in_progress_tasks(self):
+        if hasattr(self, 'task_in_progress'):
+            return self.task_in_progress
         return self.tasks.filter(status='in_progress').count()
     
     @property
     def initial_tasks(self):
+        if hasattr(self, 'task_initial'):
+            return self.task_initial
         return self.tasks.filter(status='initial').count()
     
     @property
@@ -50,3 +61,25 @@ class Project(models.Model):
         if total == 0:
             return 0
         return round((self.completed_tasks / total) * 100)
+
+
+class ProjectAccess(models.Model):
+    """
+    Materialised ``user -> project`` visibility: a row exists while the user
+    created the project or is assigned at least one of its tasks. Maintained by
+    ``projects.signals``; rebuild with ``manage.py rebuild_project_access``.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='project_access'
+    )
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='access')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'project'], name='project_access_user_project_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.project_id}"
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from core.fastread import Computed, ValuesSerializer, full_name
+from tasks.models import task_count
 from .models import Project
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -19,6 +21,42 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+def _created_by_name(row, context):
+    return full_name(row['created_by__first_name'], row['created_by__last_name'], row['created_by__username'])
+
+def _completion_percentage(row, context):
+    total = row['task_total']
+    return round((row['task_completed'] / total) * 100) if total else 0
+
+class ProjectValuesSerializer(ValuesSerializer):
+    """values()-based ``ProjectSerializer``; the task counts come from one aggregate"""
+    serializer_class = ProjectSerializer
+    computed = {
+        'created_by_name': Computed(
+            ['created_by__first_name', 'created_by__last_name', 'created_by__username'], _created_by_name
+        ),
+        'total_tasks': Computed(['task_total'], lambda row, context: row['task_total']),
+        'completed_tasks': Computed(['task_completed'], lambda row, context: row['task_completed']),
+        'in_progress_tasks': Computed(['task_in_progress'], lambda row, context: row['task_in_progress']),
+        'initial_tasks': Computed(['task_initial'], lambda row, context: row['task_initial']),
+        'completion_percentage': Computed(['task_completed', 'task_total'], _completion_percentage),
+    }
+
+    @staticmethod
+    def task_counts():
+        """Per-row task count subqueries; unlike ``Count('tasks')`` they keep the queryset ungrouped"""
+        return {
+            'task_total': task_count('project'),
+            'task_completed': task_count('project', status='completed'),
+            'task_in_progress': task_count('project', status='in_progress'),
+            'task_initial': task_count('project', status='initial'),
+        }
+
+    @classmethod
+    def values(cls, queryset):
+        counts = {name: count for name, count in cls.task_counts().items() if name not in queryset.query.annotations}
+        return super().values(queryset.annotate(**counts))
+
 class ProjectCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from activity.signals import previous_values
+from tasks.models import Task
+from .access import refresh_access
+from .models import Project
+
+# The values before a save come from the snapshot activity.signals takes in pre_save
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, **kwargs):
+    pairs = {(instance.created_by_id, instance.pk)}
+    previous = previous_values(instance).get('created_by_id', instance.created_by_id)
+    if previous != instance.created_by_id:
+        pairs.add((previous, instance.pk))
+    refresh_access(pairs)
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, **kwargs):
+    current = (instance.assignee_id, instance.project_id)
+    values = previous_values(instance)
+    previous = (values.get('assignee_id', instance.assignee_id), values.get('project_id', instance.project_id))
+    if previous == current and not created:
+        return
+    refresh_access({current, previous})
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    # The project may be part of the same cascade, so wait until it is gone
+    pair = (instance.assignee_id, instance.project_id)
+    transaction.on_commit(lambda: refresh_access({pair}))
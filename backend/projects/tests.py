@@ -1,3 +1,79 @@
 from django.test import TestCase
+from activity import recorder
+from core.benchmarks import EndpointBenchmarkMixin
+from tasks.models import Task
+from users.models import User
+from .access import rebuild_access, scope_to_user
+from .models import Project, ProjectAccess
+from .views import ProjectViewSet
 
-# Create your tests here.
+
+class ProjectEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    def test_project_list(self):
+        self.benchmark('/api/projects/', budget=2, name='projects-list')
+
+    def test_project_detail(self):
+        self.benchmark(f"/api/projects/{self.data['project'].pk}/", budget=1, name='projects-detail')
+
+    def test_admin_changelist(self):
+        client = self.admin_client_for(self.data['admin'])
+        self.benchmark('/admin/projects/project/', budget=6, client=client, name='admin-projects-changelist')
+
+    def test_admin_change_form(self):
+        client = self.admin_client_for(self.data['admin'])
+        path = f"/admin/projects/project/{self.data['project'].pk}/change/"
+        self.benchmark(path, budget=4, client=client, name='admin-projects-change')
+
+
+class ProjectListTests(TestCase):
+    def test_newest_first_without_grouping(self):
+        creator = User.objects.create_user('creator', role='admin')
+        projects = [Project.objects.create(title=f'P{n}', description='', created_by=creator) for n in range(3)]
+        Task.objects.create(project=projects[0], title='T', description='', status='completed')
+        self.client.force_login(creator)
+        results = self.client.get('/api/projects/').json()['results']
+        self.assertEqual([row['id'] for row in results], [project.pk for project in reversed(projects)])
+        self.assertEqual((results[-1]['total_tasks'], results[-1]['completed_tasks']), (1, 1))
+        # Counted per returned row, not grouped over the tasks table
+        self.assertIsNone(ProjectViewSet.queryset.query.group_by)
+        self.assertTrue(ProjectViewSet.queryset.ordered)
+
+
+class ProjectAccessTests(TestCase):
+    def setUp(self):
+        # Committed deletes queue activity events; keep them out of later tests
+        self.addCleanup(recorder.reset)
+        self.creator = User.objects.create_user('creator', role='supervisor')
+        self.worker = User.objects.create_user('worker', role='employee')
+        self.other = User.objects.create_user('other', role='employee')
+        self.project = Project.objects.create(title='P', description='', created_by=self.creator)
+
+    def visible(self, user):
+        return set(scope_to_user(Project.objects.all(), user).values_list('title', flat=True))
+
+    def test_creator_and_assignees_see_project(self):
+        self.assertEqual(self.visible(self.creator), {'P'})
+        self.assertEqual(self.visible(self.worker), set())
+        task = Task.objects.create(project=self.project, title='T', description='', assignee=self.worker)
+        self.assertEqual(self.visible(self.worker), {'P'})
+        self.assertEqual(scope_to_user(Task.objects.all(), self.worker, 'project').count(), 1)
+
+        task.assignee = self.other
+        task.save()
+        self.assertEqual(self.visible(self.worker), set())
+        self.assertEqual(self.visible(self.other), {'P'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+        self.assertEqual(self.visible(self.other), set())
+        self.assertEqual(self.visible(self.creator), {'P'})
+
+    def test_rebuild_matches_incremental_updates(self):
+        Task.objects.create(project=self.project, title='T', description='', assignee=self.worker)
+        expected = set(ProjectAccess.objects.values_list('user_id', 'project_id'))
+        self.assertEqual(rebuild_access(), 2)
+        self.assertEqual(set(ProjectAccess.objects.values_list('user_id', 'project_id')), expected)
+
+    def test_admin_is_not_scoped(self):
+        admin = User.objects.create_user('boss', role='admin')
+        self.assertEqual(self.visible(admin), {'P'})
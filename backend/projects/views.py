@@ -2,13 +2,23 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Project
-from .serializers import ProjectSerializer, ProjectCreateSerializer
+from activity.views import activity_feed
+from core.cache import CachedViewSetMixin
+from core.fastread import FastListMixin
+from tasks.models import Task
+from users.models import User
+from .models import Project, ProjectAccess
+from .serializers import ProjectSerializer, ProjectCreateSerializer, ProjectValuesSerializer
 
 # Create your views here.
 
-class ProjectViewSet(viewsets.ModelViewSet):
-    queryset = Project.objects.all()
+class ProjectViewSet(CachedViewSetMixin, FastListMixin, viewsets.ModelViewSet):
+    # Creator names and task counts come from users and tasks
+    cache_models = (User, Task, ProjectAccess)
+    queryset = Project.objects.select_related('created_by').annotate(
+        **ProjectValuesSerializer.task_counts()
+    ).order_by('-created_at', 'pk')
+    values_serializer_class = ProjectValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_serializer_class(self):
@@ -18,3 +28,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        """Changes to the project and its tasks, comments and evidence, newest first"""
+        return activity_feed(request, project_id=self.get_object().pk)
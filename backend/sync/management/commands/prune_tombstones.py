@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from sync.models import COUNTER_ID, ChangeCounter, Tombstone
+from sync.views import get_sync_setting
+
+
+class Command(BaseCommand):
+    help = 'Delete old sync tombstones; clients that synced before them get a full reload (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Age in days of the tombstones to delete (default: SYNC_TOMBSTONE_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_sync_setting('TOMBSTONE_DAYS')
+        expired = Tombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days))
+        with transaction.atomic():
+            newest = expired.aggregate(version=Max('version'))['version']
+            if newest is None:
+                self.stdout.write('No tombstones to prune')
+                return
+            # A token from before the newest pruned delete can no longer learn about it
+            ChangeCounter.objects.filter(pk=COUNTER_ID, floor__lt=newest).update(floor=newest)
+            count, _ = Tombstone.objects.filter(version__lte=newest).delete()
+        self.stdout.write(self.style.SUCCESS(f'Pruned {count} tombstones up to version {newest}'))
@@ -0,0 +1,149 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from chat.management.commands.chat_loadtest import percentile
+
+MODES = ('unsynced', 'synced')
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent writers saving unrelated tasks with and without the sync '
+        'stamp, which takes the single change counter row lock until each transaction ends'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run each mode for')
+        parser.add_argument(
+            '--hold', type=float, default=5.0,
+            help='Milliseconds each transaction keeps running after the save (the rest of the caller\'s work)',
+        )
+        parser.add_argument(
+            '--database-url',
+            help='Scratch database to migrate and write to, e.g. an empty PostgreSQL database '
+                 '(default: a temporary SQLite file, where every writer is serialized anyway)',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        # Internal: run one mode in this process against DATABASE_URL
+        parser.add_argument('--worker', choices=MODES, help='Run one mode (used by the parent process)')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(self.run_workload(options)))
+            return
+
+        report = {}
+        for mode in MODES:
+            if not options['json']:
+                self.stdout.write(f'Running {mode}...')
+            report[mode] = self.run_mode(mode, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def run_mode(self, mode, options):
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DATABASE_URL': options['database_url'] or f'sqlite:///{os.path.join(directory, "bench.sqlite3")}',
+                'SQLITE_PRODUCTION': 'true',
+                'SQLITE_WRITER_QUEUE': 'false',
+            }
+            env.pop('DB_REPLICA_URLS', None)
+            result = subprocess.run(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'sync_benchmark', '--worker', mode,
+                    '--threads', str(options['threads']), '--duration', str(options['duration']),
+                    '--hold', str(options['hold']),
+                ],
+                env=env, capture_output=True, text=True,
+            )
+        if result.returncode != 0:
+            raise CommandError(f'{mode} failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def run_workload(self, options):
+        from django.db.models.signals import post_save
+        from projects.models import Project
+        from sync.signals import synced_saved
+        from tasks.models import Task
+        from users.models import User
+
+        call_command('migrate', verbosity=0)
+        if options['worker'] == 'unsynced':
+            post_save.disconnect(synced_saved, sender=Task)
+        # One project and task per thread: the counter row is the only row they share
+        run = time.time_ns()
+        user = User.objects.create_user(f'bench-{run}', role='supervisor')
+        task_ids = [
+            Task.objects.create(
+                project=Project.objects.create(title=f'Benchmark {i}', description='', created_by=user),
+                title=f'Task {i}', description='', assignee=user,
+            ).pk
+            for i in range(options['threads'])
+        ]
+        connection.close()
+
+        hold = options['hold'] / 1000
+        lock = threading.Lock()
+        stats = {'writes': 0, 'latencies': []}
+        deadline = time.perf_counter() + options['duration']
+
+        def writer_thread(task_id):
+            latencies = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                with transaction.atomic():
+                    task = Task.objects.get(pk=task_id)
+                    task.progress = (task.progress + 1) % 100
+                    task.save()
+                    time.sleep(hold)
+                latencies.append((time.perf_counter() - started) * 1000)
+            connection.close()
+            with lock:
+                stats['writes'] += len(latencies)
+                stats['latencies'].extend(latencies)
+
+        threads = [threading.Thread(target=writer_thread, args=(task_id,)) for task_id in task_ids]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(stats['latencies'])
+        return {
+            'vendor': connection.vendor,
+            'seconds': round(elapsed, 2),
+            'writes': stats['writes'],
+            'writes_per_second': round(stats['writes'] / elapsed, 1),
+            'write_p50_ms': round(percentile(latencies, 50) or 0, 2),
+            'write_p95_ms': round(percentile(latencies, 95) or 0, 2),
+            'write_max_ms': round(latencies[-1], 2) if latencies else None,
+        }
+
+    def print_report(self, report):
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"mode":<10} {"database":>10} {"writes/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"max ms":>9}'
+        )
+        for mode, result in report.items():
+            self.stdout.write(
+                f'{mode:<10} {result["vendor"]:>10} {result["writes_per_second"]:>9} '
+                f'{result["write_p50_ms"]:>8} {result["write_p95_ms"]:>8} {result["write_max_ms"] or 0:>9}'
+            )
+        self.stdout.write(self.style.SUCCESS('Sync benchmark complete'))
@@ -0,0 +1,79 @@
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import F, Max
+from django.db.models.functions import Greatest
+
+COUNTER_ID = 1
+
+
+class ChangeCounter(models.Model):
+    """
+    The change sequence behind the sync API, in a single row: ``value`` is
+    the last version handed out. Tokens below ``floor`` can no longer be
+    answered with a delta (their tombstones were pruned, or rows were loaded
+    without signals) and get a full reload instead.
+    """
+    value = models.BigIntegerField(default=0)
+    floor = models.BigIntegerField(default=0)
+
+
+class Tombstone(models.Model):
+    """A deleted row of a synced resource, kept until ``prune_tombstones``"""
+    resource = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    version = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['version', 'id']
+
+    def __str__(self):
+        return f'{self.resource} {self.object_id} deleted at version {self.version}'
+
+
+def next_version(at_least=0):
+    """
+    Take the next version, above ``at_least``. Call it inside the transaction
+    of the change it stamps: the counter row stays locked until that
+    transaction ends, so versions commit in order.
+
+    The price is that writes of synced rows are serialized: a second writer
+    waits on the counter row until the first one's whole transaction ends,
+    not just its save, so long transactions that save a synced row hold up
+    every other writer. ``manage.py sync_benchmark`` measures the cost with
+    concurrent writers. A database sequence would not block, but then
+    versions could commit out of order and a client could skip a change;
+    it would need a watermark of the oldest uncommitted version, which this
+    single row avoids.
+    """
+    counter = ChangeCounter.objects.filter(pk=COUNTER_ID)
+    increment = {'value': Greatest(F('value'), at_least) + 1 if at_least else F('value') + 1}
+    if not counter.update(**increment):
+        ChangeCounter.objects.get_or_create(pk=COUNTER_ID)
+        counter.update(**increment)
+    return counter.values_list('value', flat=True).get()
+
+
+def current_version():
+    """``(value, floor)`` of the change sequence"""
+    return ChangeCounter.objects.filter(pk=COUNTER_ID).values_list('value', 'floor').first() or (0, 0)
+
+
+def reset_clients():
+    """
+    Send every client that synced before now back to a full reload. Call it
+    after loading rows without signals; the sequence also moves past any
+    version the loaded rows carry.
+    """
+    loaded = max(
+        (
+            model._base_manager.aggregate(version=Max('sync_version'))['version'] or 0
+            for model in apps.get_models()
+            if any(field.name == 'sync_version' for field in model._meta.concrete_fields)
+        ),
+        default=0,
+    )
+    with transaction.atomic():
+        version = next_version(at_least=loaded)
+        ChangeCounter.objects.filter(pk=COUNTER_ID).update(floor=version)
+    return version
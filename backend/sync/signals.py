@@ -0,0 +1,176 @@
+"""
+Stamps synced rows with the change sequence.
+
+Every save of a project, task, institution or user takes the next version
+and writes it to the row's ``sync_version``; the sync API returns the rows
+stamped after a client's token. A row is also restamped when something it
+renders changes: a project or institution when its tasks change (their task
+counts), a task when its comments or evidence change, and every row showing
+a user's name, a project's title or an institution's name when that changes.
+Deleted rows leave a ``Tombstone``; rows whose foreign key is nulled by a
+delete are restamped before it.
+
+The version is taken and written in the transaction of the change, behind
+the counter row's lock, so a token never skips a change committed later.
+This serializes writers of synced rows until their transactions end (see
+``next_version``); keep transactions that save them short.
+Writes that skip signals (``bulk_create``, ``QuerySet.update``) must set
+``sync_version=next_version()`` themselves, or call ``reset_clients()``.
+"""
+
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from activity.signals import previous_values
+from institutions.models import Institution
+from projects.models import Project
+from tasks.models import Task, TaskComment, TaskEvidence
+from users.models import User
+from .models import Tombstone, next_version
+
+SYNCED_MODELS = {
+    Project: 'projects',
+    Task: 'tasks',
+    Institution: 'institutions',
+    User: 'users',
+}
+# Saves of only these fields do not change what the API returns
+UNSYNCED_FIELDS = {'last_login', 'password', 'updated_at'}
+# Fields rendered on other rows: model -> (fields, [(model, lookup to the changed row)])
+SHOWN_ELSEWHERE = {
+    User: (
+        ['username', 'first_name', 'last_name', 'role'],
+        [
+            (Project, 'created_by'),
+            (Institution, 'supervisor'),
+            (Task, 'assignee'),
+            (Task, 'comments__author'),
+            (Task, 'evidence__uploaded_by'),
+        ],
+    ),
+    Project: (['title'], [(Task, 'project')]),
+    Institution: (['name'], [(Task, 'institution'), (User, 'institution')]),
+}
+# Rows nulled by deleting a row of the key model
+NULLED_ON_DELETE = {
+    User: [(Institution, 'supervisor'), (Task, 'assignee')],
+    Institution: [(Task, 'institution'), (User, 'institution')],
+}
+
+
+def stamp(version, model, **filters):
+    """Set ``sync_version`` on the rows of ``model`` matching ``filters``"""
+    queryset = model._base_manager.filter(**filters)
+    if model is Task and ('comments__author' in filters or 'evidence__uploaded_by' in filters):
+        # A joined filter would list a task once per matching comment
+        queryset = model._base_manager.filter(pk__in=queryset.values('pk'))
+    return queryset.update(sync_version=version)
+
+
+def _ids(*values):
+    return {value for value in values if value is not None}
+
+
+def _stamp_task_parents(version, task, previous):
+    """Projects and institutions counting ``task``, before and after the change"""
+    project_ids = _ids(task.project_id, previous.get('project_id'))
+    if project_ids:
+        stamp(version, Project, pk__in=project_ids)
+    institution_ids = _ids(task.institution_id, previous.get('institution_id'))
+    if institution_ids:
+        stamp(version, Institution, pk__in=institution_ids)
+
+
+def _delete_version(instance, origin):
+    """One version for all rows removed by the same delete"""
+    holder = origin if origin is not None else instance
+    version = getattr(holder, '_sync_delete_version', None)
+    if version is None:
+        version = next_version()
+        holder._sync_delete_version = version
+    return version
+
+
+def _unsynced(update_fields):
+    return update_fields is not None and set(update_fields) <= UNSYNCED_FIELDS
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Institution)
+def sync_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Projects and tasks get these from the activity log's pre_save
+    instance._sync_previous = None
+    if raw or instance._state.adding or instance.pk is None or _unsynced(update_fields):
+        return
+    fields, _ = SHOWN_ELSEWHERE[sender]
+    if update_fields is not None:
+        fields = [field for field in fields if field in update_fields]
+    if fields:
+        instance._sync_previous = sender._base_manager.filter(pk=instance.pk).values(*fields).first()
+
+
+def _previous(sender, instance):
+    if sender in (Project, Task):
+        return previous_values(instance)
+    return getattr(instance, '_sync_previous', None) or {}
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Institution)
+@receiver(post_save, sender=User)
+def synced_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or _unsynced(update_fields):
+        return
+    previous = {} if created else _previous(sender, instance)
+    with transaction.atomic(using=instance._state.db):
+        version = next_version()
+        stamp(version, sender, pk=instance.pk)
+        instance.sync_version = version
+        if sender is Task:
+            _stamp_task_parents(version, instance, previous)
+        if sender in SHOWN_ELSEWHERE and previous:
+            fields, shown_on = SHOWN_ELSEWHERE[sender]
+            if any(field in previous and previous[field] != getattr(instance, field) for field in fields):
+                for model, lookup in shown_on:
+                    stamp(version, model, **{lookup: instance.pk})
+
+
+@receiver(post_save, sender=TaskComment)
+@receiver(post_save, sender=TaskEvidence)
+def task_detail_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    with transaction.atomic(using=instance._state.db):
+        stamp(next_version(), Task, pk=instance.task_id)
+
+
+@receiver(pre_delete, sender=User)
+@receiver(pre_delete, sender=Institution)
+def sync_deleting(sender, instance, origin=None, **kwargs):
+    # The SET_NULL updates that follow send no signals; stamp their rows first
+    version = _delete_version(instance, origin)
+    for model, lookup in NULLED_ON_DELETE[sender]:
+        stamp(version, model, **{lookup: instance.pk})
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Institution)
+@receiver(post_delete, sender=User)
+def synced_deleted(sender, instance, origin=None, **kwargs):
+    version = _delete_version(instance, origin)
+    Tombstone.objects.create(resource=SYNCED_MODELS[sender], object_id=instance.pk, version=version)
+    if sender is Task:
+        # Counted by its project and institution; no-ops when they go too
+        _stamp_task_parents(version, instance, {})
+
+
+@receiver(post_delete, sender=TaskComment)
+@receiver(post_delete, sender=TaskEvidence)
+def task_detail_deleted(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Model) and isinstance(origin, Task):
+        # Removed with its task, which has a tombstone
+        return
+    stamp(_delete_version(instance, origin), Task, pk=instance.task_id)
@@ -0,0 +1,188 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from core.benchmarks import EndpointBenchmarkMixin
+from institutions.models import Institution
+from institutions.serializers import InstitutionSerializer, InstitutionValuesSerializer
+from projects.models import Project
+from projects.serializers import ProjectSerializer, ProjectValuesSerializer
+from tasks.models import Task, TaskComment
+from users.bulk_import import import_users
+from users.models import User
+from users.views import CustomTokenObtainPairSerializer
+from .models import ChangeCounter, Tombstone, current_version, reset_clients
+
+
+class SyncEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    def test_reload(self):
+        self.benchmark('/api/sync/', budget=7, name='sync-reload')
+
+    def test_delta(self):
+        version, _ = current_version()
+        task = self.data['task']
+        task.progress = 50
+        task.save()
+        self.benchmark(f'/api/sync/?since={version}', budget=8, name='sync-delta')
+
+    def test_nothing_changed(self):
+        version, _ = current_version()
+        self.benchmark(f'/api/sync/?since={version}', budget=1, name='sync-unchanged')
+
+    def test_values_serializers_match_the_model_serializers(self):
+        request = RequestFactory().get('/api/sync/')
+        for model, serializer, values_serializer in (
+            (Project, ProjectSerializer, ProjectValuesSerializer),
+            (Institution, InstitutionSerializer, InstitutionValuesSerializer),
+        ):
+            with self.subTest(model=model.__name__):
+                queryset = model.objects.order_by('pk')
+                expected = serializer(queryset, many=True, context={'request': request}).data
+                actual = values_serializer.render(values_serializer.values(queryset), request)
+                self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+
+@override_settings(ACTIVITY={'ENABLED': False})
+class SyncTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', role='admin', first_name='Ada')
+        self.institution = Institution.objects.create(name='North')
+        self.project = Project.objects.create(title='Project', description='', created_by=self.admin)
+        self.task = Task.objects.create(
+            project=self.project, title='Task', description='', institution=self.institution,
+        )
+        self.client = APIClient()
+        token = CustomTokenObtainPairSerializer.get_token(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, result, resource):
+        return [row['id'] for row in result['changes'][resource]]
+
+    def test_first_sync_is_a_full_reload(self):
+        result = self.sync()
+        self.assertEqual((result['reset'], result['more']), (True, False))
+        self.assertEqual(result['version'], str(current_version()[0]))
+        self.assertEqual(self.ids(result, 'projects'), [self.project.pk])
+        self.assertEqual(self.ids(result, 'tasks'), [self.task.pk])
+        self.assertEqual(result['changes']['projects'][0]['total_tasks'], 1)
+        # Nothing happened since
+        self.assertEqual(self.sync(result['version'])['changes'], {name: [] for name in result['changes']})
+
+    def test_delta_has_the_changed_rows_and_their_dependents(self):
+        version = self.sync()['version']
+        self.task.status = 'completed'
+        self.task.save()
+
+        result = self.sync(version)
+        self.assertFalse(result['reset'])
+        self.assertEqual(self.ids(result, 'tasks'), [self.task.pk])
+        # Their task counts changed
+        self.assertEqual(result['changes']['projects'][0]['completed_tasks'], 1)
+        self.assertEqual(result['changes']['institutions'][0]['completion_rate'], 100)
+        self.assertEqual(result['changes']['users'], [])
+
+    def test_renamed_rows_restamp_the_rows_showing_them(self):
+        TaskComment.objects.create(task=self.task, author=self.admin, content='Hi')
+        version = self.sync()['version']
+        self.admin.first_name = 'Grace'
+        self.admin.save()
+
+        result = self.sync(version)
+        self.assertEqual(self.ids(result, 'users'), [self.admin.pk])
+        self.assertEqual(result['changes']['projects'][0]['created_by_name'], 'Grace')
+        self.assertEqual(result['changes']['tasks'][0]['comments'][0]['author_name'], 'Grace')
+
+        # Logging in does not change what the API shows
+        version = result['version']
+        self.admin.last_login = timezone.now()
+        self.admin.save(update_fields=['last_login'])
+        self.assertEqual(self.sync(version)['version'], version)
+
+    def test_deletes_leave_tombstones(self):
+        other = Task.objects.create(project=self.project, title='Other', description='')
+        institution_id, other_id = self.institution.pk, other.pk
+        version = self.sync()['version']
+        self.institution.delete()
+        other.delete()
+
+        result = self.sync(version)
+        self.assertEqual(result['deleted']['institutions'], [institution_id])
+        self.assertEqual(result['deleted']['tasks'], [other_id])
+        # The task the institution was removed from
+        self.assertEqual(result['changes']['tasks'][0]['institution_name'], 'No institution')
+
+        # Deleting a project removes its tasks in the same version
+        project_id, task_id = self.project.pk, self.task.pk
+        version = result['version']
+        self.project.delete()
+        result = self.sync(version)
+        self.assertEqual(result['deleted']['projects'], [project_id])
+        self.assertEqual(result['deleted']['tasks'], [task_id])
+        self.assertEqual(Tombstone.objects.filter(version=int(result['version'])).count(), 2)
+
+    @override_settings(SYNC={'PAGE_SIZE': 2})
+    def test_reload_in_pages(self):
+        Project.objects.create(title='Second', description='', created_by=self.admin)
+        pages = [self.sync()]
+        while pages[-1]['more']:
+            pages.append(self.sync(pages[-1]['version']))
+        self.assertEqual([page['reset'] for page in pages], [True, False, False])
+        self.assertEqual(pages[-1]['version'], str(current_version()[0]))
+        self.assertEqual(sum(len(self.ids(page, 'projects')) for page in pages), 2)
+        self.assertEqual(sum(len(self.ids(page, 'users')) for page in pages), 1)
+
+    @override_settings(SYNC={'MAX_CHANGES': 1})
+    def test_too_many_changes_reload(self):
+        version = self.sync()['version']
+        Project.objects.create(title='Second', description='', created_by=self.admin)
+        Project.objects.create(title='Third', description='', created_by=self.admin)
+        self.assertTrue(self.sync(version)['reset'])
+
+    def test_bulk_loads(self):
+        version = self.sync()['version']
+        import_users([{'username': 'bulk', 'password': 'a-long-password-1'}])
+        self.assertEqual(self.ids(self.sync(version), 'users'), [User.objects.get(username='bulk').pk])
+
+        # Rows loaded from elsewhere: everyone reloads, and the sequence moves past their versions
+        Project.objects.filter(pk=self.project.pk).update(sync_version=10_000)
+        reset_clients()
+        result = self.sync(version)
+        self.assertTrue(result['reset'])
+        self.assertGreater(int(result['version']), 10_000)
+
+    def test_prune_tombstones(self):
+        version = self.sync()['version']
+        self.task.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Pruned 1 tombstones', out.getvalue())
+        self.assertEqual(ChangeCounter.objects.get().floor, current_version()[0])
+        # The delete is forgotten, the old token reloads
+        self.assertTrue(self.sync(version)['reset'])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/sync/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.json())
+
+
+class SyncBenchmarkTests(SimpleTestCase):
+    def test_compares_writers_with_and_without_the_stamp(self):
+        out = StringIO()
+        call_command('sync_benchmark', threads=2, duration=0.2, hold=0, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(list(report), ['unsynced', 'synced'])
+        for result in report.values():
+            self.assertGreater(result['writes'], 0)
+            self.assertLessEqual(result['write_p50_ms'], result['write_max_ms'])
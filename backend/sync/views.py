@@ -0,0 +1,135 @@
+"""
+``GET /api/sync/?since=<token>``: what changed since a client last synced.
+
+The response carries the rows of every resource created or updated after
+``since``, rendered as the list endpoints render them, the ids deleted since
+then, and a new token to send next time::
+
+    {"version": "42", "reset": false, "more": false,
+     "changes": {"projects": [...], "tasks": [...], ...},
+     "deleted": {"projects": [7], "tasks": [], ...}}
+
+Clients apply ``deleted`` before ``changes``. Without a token, or with one
+that cannot be answered with a delta (older than the pruned tombstones, or
+too many changes since), the server sends a full reload instead: ``reset``
+is true and the client drops what it holds. A reload comes in pages of
+``SYNC_PAGE_SIZE`` rows; while ``more`` is true, call again with the
+returned token.
+"""
+
+import re
+
+from django.conf import settings
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from institutions.models import Institution
+from institutions.serializers import InstitutionValuesSerializer
+from projects.models import Project
+from projects.serializers import ProjectValuesSerializer
+from tasks.models import Task
+from tasks.serializers import TaskValuesSerializer
+from users.models import User
+from users.serializers import UserValuesSerializer
+from .models import Tombstone, current_version
+
+DEFAULTS = {
+    'PAGE_SIZE': 1000,
+    'MAX_CHANGES': 1000,
+    'TOMBSTONE_DAYS': 30,
+}
+
+# Resource -> (model, values serializer), in the order a reload sends them
+RESOURCES = {
+    'projects': (Project, ProjectValuesSerializer),
+    'tasks': (Task, TaskValuesSerializer),
+    'institutions': (Institution, InstitutionValuesSerializer),
+    'users': (User, UserValuesSerializer),
+}
+# "<version>", or "<version>.<resource index>.<last id>" within a reload
+TOKEN = re.compile(r'^(\d+)(?:\.(\d+)\.(\d+))?$')
+
+
+def get_sync_setting(name):
+    return getattr(settings, 'SYNC', {}).get(name, DEFAULTS[name])
+
+
+def parse_token(token):
+    """(version, reload position or None)"""
+    match = TOKEN.match(token)
+    if match is None or (match[2] is not None and int(match[2]) >= len(RESOURCES)):
+        raise ValidationError({'since': 'Invalid sync token.'})
+    version = int(match[1])
+    if match[2] is None:
+        return version, None
+    return version, (int(match[2]), int(match[3]))
+
+
+def delta(request, since, version):
+    """The changes in (since, version], or None when there are too many to send"""
+    limit = get_sync_setting('MAX_CHANGES')
+    changes = {name: [] for name in RESOURCES}
+    deleted = {name: [] for name in RESOURCES}
+    if since == version:
+        # Nothing changed: the common poll
+        return {'version': str(version), 'reset': False, 'more': False, 'changes': changes, 'deleted': deleted}
+    for name, (model, serializer) in RESOURCES.items():
+        queryset = model._default_manager.filter(
+            sync_version__gt=since, sync_version__lte=version,
+        ).order_by('pk')
+        rows = list(serializer.values(queryset)[:limit + 1])
+        if len(rows) > limit:
+            return None
+        changes[name] = serializer.render(rows, request)
+    tombstones = Tombstone.objects.filter(version__gt=since, version__lte=version)
+    for resource, object_id in tombstones.values_list('resource', 'object_id'):
+        if resource in deleted:
+            deleted[resource].append(object_id)
+    return {'version': str(version), 'reset': False, 'more': False, 'changes': changes, 'deleted': deleted}
+
+
+def reload_page(request, version, position=(0, 0)):
+    """One page of every row, by resource and id, from ``position``"""
+    names = list(RESOURCES)
+    index, after = position
+    room = get_sync_setting('PAGE_SIZE')
+    changes = {name: [] for name in names}
+    while index < len(names) and room:
+        model, serializer = RESOURCES[names[index]]
+        queryset = model._default_manager.filter(pk__gt=after).order_by('pk')
+        rows = list(serializer.values(queryset)[:room])
+        changes[names[index]] = serializer.render(rows, request)
+        if len(rows) < room:
+            index, after = index + 1, 0
+        else:
+            after = rows[-1]['pk']
+        room -= len(rows)
+    more = index < len(names)
+    return {
+        # Rows changed while paging are stamped after ``version`` and come in the next delta
+        'version': f'{version}.{index}.{after}' if more else str(version),
+        'reset': position == (0, 0),
+        'more': more,
+        'changes': changes,
+        'deleted': {name: [] for name in names},
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_view(request):
+    version, floor = current_version()
+    since = request.query_params.get('since')
+    if not since:
+        return Response(reload_page(request, version))
+    since, position = parse_token(since)
+    if position is not None:
+        if since < floor or since > version:
+            return Response(reload_page(request, version))
+        return Response(reload_page(request, since, position))
+    if floor <= since <= version:
+        result = delta(request, since, version)
+        if result is not None:
+            return Response(result)
+    return Response(reload_page(request, version))
@@ -1,35 +1,62 @@
 from django.contrib import admin
+from core.pagination import EstimatedCountPaginator
 from .models import Task, TaskComment, TaskEvidence
 
 class TaskCommentInline(admin.TabularInline):
     model = TaskComment
     extra = 0
     readonly_fields = ('created_at',)
+    autocomplete_fields = ('author',)
+
+    def get_queryset(self, request):
+        # The row titles show the comment's author and task
+        return super().get_queryset(request).select_related('task', 'author')
 
 class TaskEvidenceInline(admin.TabularInline):
     model = TaskEvidence
     extra = 0
     readonly_fields = ('uploaded_at',)
+    autocomplete_fields = ('uploaded_by',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('task')
 
 @admin.register(Task)
 class TaskAdmin(admin.ModelAdmin):
     list_display = ('title', 'project', 'assignee_name', 'institution_name', 'status', 'progress', 'due_date', 'updated_at')
-    list_filter = ('status', 'institution', 'project', 'created_at')
+    list_filter = ('status', 'institution', ('project', admin.RelatedOnlyFieldListFilter), 'created_at')
+    list_select_related = ('project', 'assignee', 'institution')
     search_fields = ('title', 'description', 'assignee__username', 'project__title')
     ordering = ('-updated_at',)
     readonly_fields = ('assignee_name', 'institution_name', 'is_overdue', 'created_at', 'updated_at')
+    autocomplete_fields = ('project', 'assignee', 'institution')
     inlines = [TaskCommentInline, TaskEvidenceInline]
+    # Large tables: no COUNT(*) of the whole table per page
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # The change form shows the assignee and institution names as well
+        return super().get_queryset(request).select_related('project', 'assignee', 'institution')
 
 @admin.register(TaskComment)
 class TaskCommentAdmin(admin.ModelAdmin):
     list_display = ('task', 'author', 'created_at')
-    list_filter = ('created_at', 'author')
+    list_filter = ('created_at', ('author', admin.RelatedOnlyFieldListFilter))
+    list_select_related = ('task__project', 'author')
     search_fields = ('content', 'task__title', 'author__username')
     ordering = ('-created_at',)
+    autocomplete_fields = ('task', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(TaskEvidence)
 class TaskEvidenceAdmin(admin.ModelAdmin):
     list_display = ('file_name', 'task', 'file_type', 'uploaded_by', 'uploaded_at')
     list_filter = ('file_type', 'uploaded_at')
+    list_select_related = ('task__project', 'uploaded_by')
     search_fields = ('file_name', 'description', 'task__title')
     ordering = ('-uploaded_at',)
+    autocomplete_fields = ('task', 'uploaded_by')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 class Task(models.Model):
@@ -34,6 +35,8 @@ class Task(models.Model):
     due_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Position in the change sequence, see sync/signals.py
+    sync_version = models.BigIntegerField(default=0, db_index=True, editable=False)
     
     class Meta:
         ordering = ['-updated_at']
@@ -89,3 +92,14 @@ class TaskEvidence(models.Model):
     
     def __str__(self):
         return f"{self.file_name} - {self.task.title}"
+
+
+def task_count(field, **filters):
+    """
+    Correlated ``COUNT`` of the tasks whose ``field`` is the outer row, for
+    annotating a page of projects or institutions. Unlike ``Count('tasks')``
+    it is only evaluated for the rows returned, not grouped over the whole table.
+    """
+    tasks = Task.objects.filter(**{field: models.OuterRef('pk')}, **filters).order_by()
+    count = tasks.values(field).annotate(count=models.Count('pk')).values('count')
+    return Coalesce(models.Subquery(count), 0)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.fastread import Computed, ValuesSerializer, full_name
 from .models import Task, TaskComment, TaskEvidence
 
 class TaskCommentSerializer(serializers.ModelSerializer):
@@ -38,3 +39,53 @@ class TaskSerializer(serializers.ModelSerializer):
             'evidence', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+# values()-based renderers for list responses, same output as the serializers above
+
+def _author_name(row, context):
+    return full_name(row['author__first_name'], row['author__last_name'], row['author__username'])
+
+def _uploaded_by_name(row, context):
+    return full_name(row['uploaded_by__first_name'], row['uploaded_by__last_name'], row['uploaded_by__username'])
+
+def _assignee_name(row, context):
+    if row['assignee'] is None:
+        return "Unassigned"
+    return full_name(row['assignee__first_name'], row['assignee__last_name'], row['assignee__username'])
+
+def _institution_name(row, context):
+    return row['institution__name'] if row['institution'] is not None else "No institution"
+
+def _is_overdue(row, context):
+    if not row['due_date']:
+        return False
+    return context['now'] > row['due_date'] and row['status'] != 'completed'
+
+class TaskCommentValuesSerializer(ValuesSerializer):
+    serializer_class = TaskCommentSerializer
+    computed = {
+        'author_name': Computed(['author__first_name', 'author__last_name', 'author__username'], _author_name),
+    }
+
+class TaskEvidenceValuesSerializer(ValuesSerializer):
+    serializer_class = TaskEvidenceSerializer
+    computed = {
+        'uploaded_by_name': Computed(
+            ['uploaded_by__first_name', 'uploaded_by__last_name', 'uploaded_by__username'], _uploaded_by_name
+        ),
+    }
+
+class TaskValuesSerializer(ValuesSerializer):
+    serializer_class = TaskSerializer
+    computed = {
+        'assignee_name': Computed(
+            ['assignee', 'assignee__first_name', 'assignee__last_name', 'assignee__username'], _assignee_name
+        ),
+        'institution_name': Computed(['institution', 'institution__name'], _institution_name),
+        'is_overdue': Computed(['due_date', 'status'], _is_overdue),
+    }
+    nested = {
+        'comments': TaskCommentValuesSerializer,
+        'evidence': TaskEvidenceValuesSerializer,
+    }
@@ -1,3 +1,72 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from core.benchmarks import EndpointBenchmarkMixin
+from .models import Task, TaskEvidence
+from .serializers import TaskSerializer, TaskValuesSerializer
+from .views import TaskViewSet
+
+
+class TaskEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    def test_task_list(self):
+        self.benchmark('/api/tasks/', budget=4, name='tasks-list')
+
+    def test_task_list_for_project(self):
+        self.benchmark(f"/api/tasks/?project={self.data['project'].pk}", budget=4, name='tasks-list-project')
+
+    def test_task_detail(self):
+        self.benchmark(f"/api/tasks/{self.data['task'].pk}/", budget=5, name='tasks-detail')
+
+    def test_admin_changelist(self):
+        client = self.admin_client_for(self.data['admin'])
+        self.benchmark('/admin/tasks/task/', budget=6, client=client, name='admin-tasks-changelist')
+
+    def test_admin_change_form(self):
+        client = self.admin_client_for(self.data['admin'])
+        task = self.data['task']
+        # Each inline row's autocomplete widget looks up its selected user
+        inline_rows = task.comments.count() + task.evidence.count()
+        path = f"/admin/tasks/task/{task.pk}/change/"
+        self.benchmark(path, budget=8 + inline_rows, client=client, name='admin-tasks-change')
+
+    def test_admin_comment_changelist(self):
+        client = self.admin_client_for(self.data['admin'])
+        self.benchmark('/admin/tasks/taskcomment/', budget=5, client=client, name='admin-task-comments-changelist')
+
+    def test_admin_evidence_changelist(self):
+        client = self.admin_client_for(self.data['admin'])
+        self.benchmark('/admin/tasks/taskevidence/', budget=4, client=client, name='admin-task-evidence-changelist')
+
+
+class TaskValuesSerializerTests(EndpointBenchmarkMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        project = cls.data['project']
+        # Rows the generated data may not cover: empty relations and an uploaded file
+        bare = Task.objects.create(project=project, title='Bare', description='')
+        Task.objects.create(
+            project=project, title='Overdue', description='', assignee=cls.data['employee'],
+            institution=cls.data['institution'], due_date=timezone.now() - timedelta(days=1),
+        )
+        TaskEvidence.objects.create(
+            task=bare, file_name='scan.pdf', file='task_evidence/scan.pdf', file_type='document',
+            uploaded_by=cls.data['admin'],
+        )
+
+    def test_output_matches_the_model_serializer(self):
+        request = RequestFactory().get('/api/tasks/')
+        queryset = TaskViewSet.queryset.order_by('pk')
+        expected = TaskSerializer(queryset, many=True, context={'request': request}).data
+        actual = TaskValuesSerializer.render(TaskValuesSerializer.values(queryset), request)
+        # Byte for byte, so key order and value types match too
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoint_matches(self):
+        client = self.client_for(self.data['admin'])
+        fast = client.get('/api/tasks/?page=2')
+        with override_settings(FAST_READ={'ENABLED': False}):
+            slow = client.get('/api/tasks/?page=2')
+        self.assertEqual(fast.content, slow.content)
@@ -2,14 +2,18 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from core.fastread import FastListMixin
 from .models import Task, TaskComment, TaskEvidence
-from .serializers import TaskSerializer
+from .serializers import TaskSerializer, TaskValuesSerializer
 
 # Create your views here.
 
-class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.select_related('project', 'assignee', 'institution').all()
+class TaskViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = Task.objects.select_related('project', 'assignee', 'institution').prefetch_related(
+        'comments__author', 'evidence__uploaded_by'
+    )
     serializer_class = TaskSerializer
+    values_serializer_class = TaskValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
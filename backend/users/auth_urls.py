@@ -7,4 +7,5 @@ urlpatterns = [
     path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('user/', views.current_user_view, name='current_user'),
     path('dashboard-stats/', views.dashboard_stats_view, name='dashboard_stats'),
+    path('reports/', views.reports_view, name='reports'),
 ]
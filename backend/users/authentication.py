@@ -0,0 +1,213 @@
+"""
+JWT authentication that builds ``request.user`` from token claims.
+
+Tokens issued at login carry the user's role, institution and a version stamp
+taken from ``User.updated_at``. As long as the stamp still matches the current
+version (kept in the cache with the user's ``is_active``, and replaced by
+``users.signals`` whenever a user is saved or deleted), the request user is
+built from the claims without a query. Stale or legacy tokens, inactive users
+and expired versions fall back to loading the row from the primary database.
+
+The current version is kept for ``VERSION_TTL`` seconds. With a shared cache
+(``CACHE_URL`` pointing at Redis) a change is seen by every worker at once;
+with the default per-process cache another worker trusts claims it has
+already checked for at most ``VERSION_TTL`` seconds, then reads the row again.
+Resolved users are memoised per process in a small TTL/LRU cache that expires
+no later than that.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+
+VERSION_CLAIM = 'ver'
+VERSION_KEY = 'auth_user_version:{}'
+
+# Claims copied onto the request user, keyed by the User attname they fill
+CLAIM_FIELDS = {
+    'username': 'username',
+    'role': 'role',
+    'institution_id': 'institution_id',
+    'is_staff': 'is_staff',
+    'is_superuser': 'is_superuser',
+}
+
+
+def get_auth_setting(name, default):
+    return getattr(settings, 'CLAIMS_AUTH', {}).get(name, default)
+
+
+def user_version(user):
+    """Version stamp of a user row; changes whenever the row is saved"""
+    if user.updated_at is None:
+        return 0
+    return int(user.updated_at.timestamp() * 1000000)
+
+
+def add_user_claims(token, user):
+    """Embed the claims ClaimsJWTAuthentication needs into ``token``"""
+    for claim, attname in CLAIM_FIELDS.items():
+        token[claim] = getattr(user, attname)
+    token[VERSION_CLAIM] = user_version(user)
+    return token
+
+
+class UserCache:
+    """Thread-safe LRU of ``user_id -> (version, field values, expires)``"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            entry_version, values, expires = entry
+            if entry_version != version or expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, version, values):
+        with self._lock:
+            ttl = min(get_auth_setting('CACHE_TTL', 60), get_auth_setting('VERSION_TTL', 60))
+            self._entries[user_id] = (version, values, time.monotonic() + ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > get_auth_setting('CACHE_SIZE', 10000):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def set_current_version(user_id, version, is_active):
+    cache.set(VERSION_KEY.format(user_id), (version, is_active), get_auth_setting('VERSION_TTL', 60))
+
+
+def invalidate_user(user_id, version, is_active=False):
+    """Record a new version for ``user_id`` so cached claims are no longer trusted"""
+    set_current_version(user_id, version, is_active)
+    user_cache.invalidate(str(user_id))
+
+
+def build_user(user_id, values):
+    """A User instance with only the claimed fields and ``is_active`` loaded; the rest stay deferred"""
+    loaded = {'id': User._meta.pk.to_python(user_id), **values}
+    # from_db() expects values in concrete field order
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in loaded]
+    return User.from_db(None, names, [loaded[name] for name in names])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user = self.get_claimed_user(validated_token)
+        if user is not None:
+            return user
+        user = self.load_user(validated_token)
+        version = validated_token.get(VERSION_CLAIM)
+        if version is not None:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+            set_current_version(user_id, user_version(user), user.is_active)
+            values = {attname: getattr(user, attname) for attname in CLAIM_FIELDS.values()}
+            user_cache.set(user_id, version, {**values, 'is_active': user.is_active})
+        return user
+
+    def load_user(self, validated_token):
+        """
+        SimpleJWT's ``get_user()``, reading the primary: a replica that lags
+        would bring back the claims the version check is there to reject
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from exc
+        try:
+            user = User._base_manager.using(DEFAULT_DB_ALIAS).get(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist as exc:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found') from exc
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+    def claimed_version(self, validated_token):
+        """``(user_id, version)`` claimed by the token, or None when it predates the claims"""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get(VERSION_CLAIM)
+        if user_id is None or version is None:
+            return None
+        # SimpleJWT stores the id as a string
+        return str(user_id), version
+
+    def trusted_user(self, validated_token, user_id, version, current):
+        """The user built from the claims if ``current`` (the cached version) still matches them"""
+        if current != (version, True):
+            return None
+        values = {attname: validated_token[claim] for claim, attname in CLAIM_FIELDS.items()}
+        values['is_active'] = True
+        user_cache.set(user_id, version, values)
+        return build_user(user_id, values)
+
+    def get_claimed_user(self, validated_token):
+        """
+        The user built from the token's claims, or None when the row has to be
+        read: the token predates the claims, or the user changed since it was issued
+        """
+        claimed = self.claimed_version(validated_token)
+        if claimed is None:
+            return None
+        user_id, version = claimed
+        values = user_cache.get(user_id, version)
+        if values is not None:
+            return build_user(user_id, values)
+        return self.trusted_user(validated_token, user_id, version, cache.get(VERSION_KEY.format(user_id)))
+
+    async def aget_claimed_user(self, validated_token):
+        """``get_claimed_user()`` reading the cached version without blocking the event loop"""
+        claimed = self.claimed_version(validated_token)
+        if claimed is None:
+            return None
+        user_id, version = claimed
+        values = user_cache.get(user_id, version)
+        if values is not None:
+            return build_user(user_id, values)
+        return self.trusted_user(validated_token, user_id, version, await cache.aget(VERSION_KEY.format(user_id)))
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views; only a user row that must be read leaves the event loop"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        user = await self.aget_claimed_user(validated_token)
+        if user is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        return user, validated_token
@@ -0,0 +1,157 @@
+"""
+Bulk user import.
+
+Rows are validated up front with a handful of set-based queries, passwords are
+hashed in parallel (hashing is deliberately slow and CPU bound), and users are
+inserted with batched ``bulk_create``. Invalid rows are reported by row number
+and skipped.
+
+Web requests hash on a thread pool: PBKDF2 releases the GIL, and forking a
+process pool from a threaded server copies whatever locks other threads hold.
+Only ``manage.py import_users``, a process of its own, uses processes, and
+the API takes at most ``USER_IMPORT_MAX_ROWS`` rows; larger files go through
+the command.
+"""
+
+import csv
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import transaction
+from rest_framework import serializers
+from sync.models import next_version
+
+from .directory import bump_directory_version
+from .models import User
+
+# Below this many rows a process pool costs more than it saves
+POOL_THRESHOLD = 8
+
+
+class UserImportRowSerializer(serializers.ModelSerializer):
+    password = serializers.CharField(write_only=True)
+    institution = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta:
+        model = User
+        fields = [
+            'username', 'email', 'first_name', 'last_name',
+            'password', 'role', 'institution', 'phone'
+        ]
+        # Uniqueness is checked for the whole file at once
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
+
+
+def read_rows(data, fmt):
+    """Parse CSV or JSON ``data`` (text or bytes) into a list of dicts"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    if fmt == 'json':
+        rows = json.loads(data)
+        if isinstance(rows, dict):
+            rows = rows.get('users', [])
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON list of users')
+        return rows
+    if fmt == 'csv':
+        return [
+            {key: value for key, value in row.items() if key and value not in (None, '')}
+            for row in csv.DictReader(io.StringIO(data))
+        ]
+    raise ValueError(f'Unsupported format {fmt!r}')
+
+
+def validate_rows(rows):
+    """Return ``(valid, errors)``; row numbers are 1-based"""
+    valid = []
+    errors = []
+    for number, row in enumerate(rows, start=1):
+        serializer = UserImportRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((number, serializer.validated_data))
+        else:
+            errors.append({'row': number, 'errors': serializer.errors})
+
+    usernames = [data['username'] for _, data in valid]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    institution_ids = {data['institution'] for _, data in valid if data.get('institution')}
+    if institution_ids:
+        from institutions.models import Institution
+        known = set(Institution.objects.filter(id__in=institution_ids).values_list('id', flat=True))
+    else:
+        known = set()
+
+    seen = set()
+    checked = []
+    for number, data in valid:
+        row_errors = {}
+        if data['username'] in existing:
+            row_errors['username'] = ['A user with that username already exists.']
+        elif data['username'] in seen:
+            row_errors['username'] = ['Duplicate username in this import.']
+        if data.get('institution') and data['institution'] not in known:
+            row_errors['institution'] = [f"Invalid pk \"{data['institution']}\" - object does not exist."]
+        seen.add(data['username'])
+        if row_errors:
+            errors.append({'row': number, 'errors': row_errors})
+        else:
+            checked.append((number, data))
+
+    errors.sort(key=lambda error: error['row'])
+    return checked, errors
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None, processes=False):
+    """Hash ``passwords`` in parallel on threads, or on ``processes``, preserving order"""
+    workers = workers or getattr(settings, 'USER_IMPORT_WORKERS', None) or os.cpu_count() or 1
+    if workers <= 1 or len(passwords) < POOL_THRESHOLD:
+        return [make_password(password) for password in passwords]
+    if not processes:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='user-import') as pool:
+            return list(pool.map(make_password, passwords))
+    # multiprocessing is only imported by the command, not at startup
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+
+def import_users(rows, workers=None, batch_size=500, dry_run=False, processes=False):
+    """Validate, hash and insert ``rows``; returns a summary with per-row errors"""
+    valid, errors = validate_rows(rows)
+    result = {'total': len(rows), 'created': 0, 'errors': errors}
+    if dry_run or not valid:
+        result['valid'] = len(valid)
+        return result
+
+    hashes = hash_passwords([data['password'] for _, data in valid], workers, processes)
+    users = []
+    for (_, data), password in zip(valid, hashes):
+        fields = {key: value for key, value in data.items() if key not in ('password', 'institution')}
+        fields['username'] = User.normalize_username(fields['username'])
+        fields['email'] = User.objects.normalize_email(fields.get('email', ''))
+        users.append(User(password=password, institution_id=data.get('institution'), **fields))
+
+    with transaction.atomic():
+        # bulk_create does not send post_save: stamp the rows for the sync API here
+        version = next_version()
+        for user in users:
+            user.sync_version = version
+        User.objects.bulk_create(users, batch_size=batch_size)
+    # bulk_create does not send post_save
+    bump_directory_version()
+    result['created'] = len(users)
+    return result
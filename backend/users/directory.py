@@ -0,0 +1,128 @@
+"""
+Compact user directory for pickers and as-you-type search.
+
+Prefix matches are expressed as ranges on ``LOWER(column)`` so they can use the
+expression indexes on ``User``. A range only equals a prefix match when text
+sorts by code point (SQLite, PostgreSQL databases created with the C or POSIX
+collation); other collations fall back to ``LIKE 'prefix%'``, which is correct
+but cannot use those indexes. Results are cached under a version key that is
+replaced whenever a user or institution changes.
+"""
+
+import hashlib
+import sys
+import time
+
+from django.core.cache import cache
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+from .models import User
+
+VERSION_KEY = 'user_directory_version'
+CACHE_TIMEOUT = 300
+MAX_LIMIT = 50
+SURROGATES_START, SURROGATES_END = 0xD800, 0xE000
+CODE_POINT_COLLATIONS = {'C', 'POSIX', 'C.UTF-8', 'C.utf8'}
+
+_code_point_order = {}
+
+
+def directory_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = bump_directory_version()
+    return version
+
+
+def bump_directory_version():
+    """Invalidate every cached directory response"""
+    version = time.time_ns()
+    cache.set(VERSION_KEY, version, None)
+    return version
+
+
+def _sorts_by_code_point(alias):
+    """Whether the database behind ``alias`` compares text by code point, cached per alias"""
+    if alias not in _code_point_order:
+        connection = connections[alias]
+        if connection.vendor == 'sqlite':
+            # BINARY, the default collation
+            ordered = True
+        elif connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT datcollate FROM pg_database WHERE datname = current_database()')
+                ordered = cursor.fetchone()[0] in CODE_POINT_COLLATIONS
+        else:
+            ordered = False
+        _code_point_order[alias] = ordered
+    return _code_point_order[alias]
+
+
+def _prefix_range(field, prefix, use_range=True):
+    """``LOWER(field)`` starts with ``prefix``, as an index-friendly range when ``use_range``"""
+    last = ord(prefix[-1])
+    if not use_range or last == sys.maxunicode:
+        # Other collations, or nothing sorts after the last character to end the range
+        return Q(**{f'{field}__startswith': prefix})
+    # Surrogates cannot be encoded for the database; skip over them
+    following = SURROGATES_END if SURROGATES_START <= last + 1 < SURROGATES_END else last + 1
+    upper = prefix[:-1] + chr(following)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
+
+def _match(query, use_range):
+    terms = query.lower().split()
+    if len(terms) > 1:
+        # "jane sm" -> first name jane..., last name sm...
+        return (
+            _prefix_range('first_lower', terms[0], use_range)
+            & _prefix_range('last_lower', ' '.join(terms[1:]), use_range)
+        )
+    prefix = terms[0]
+    return (
+        _prefix_range('username_lower', prefix, use_range)
+        | _prefix_range('first_lower', prefix, use_range)
+        | _prefix_range('last_lower', prefix, use_range)
+    )
+
+
+def search_users(query='', role=None, institution=None, limit=20):
+    """Return ``[{id, full_name, role, institution, institution_name}]``"""
+    query = (query or '').strip()
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    params = f'{query.lower()}|{role or ""}|{institution or ""}|{limit}'
+    # Hashed so user input can't produce keys memcached rejects
+    key = f'user_directory:{directory_version()}:{hashlib.md5(params.encode()).hexdigest()}'
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    users = User.objects.filter(is_active=True).annotate(
+        username_lower=Lower('username'),
+        first_lower=Lower('first_name'),
+        last_lower=Lower('last_name'),
+    )
+    if query:
+        users = users.filter(_match(query, _sorts_by_code_point(router.db_for_read(User))))
+    if role:
+        users = users.filter(role=role)
+    if institution:
+        users = users.filter(institution_id=institution)
+    rows = users.order_by('first_lower', 'last_lower', 'id').values_list(
+        'id', 'username', 'first_name', 'last_name', 'role', 'institution_id', 'institution__name'
+    )[:limit]
+
+    results = [
+        {
+            'id': user_id,
+            'full_name': f'{first_name} {last_name}'.strip() or username,
+            'role': role_value,
+            'institution': institution_id,
+            'institution_name': institution_name,
+        }
+        for user_id, username, first_name, last_name, role_value, institution_id, institution_name in rows
+    ]
+    cache.set(key, results, CACHE_TIMEOUT)
+    return results
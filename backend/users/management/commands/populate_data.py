@@ -1,5 +1,6 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from core import datagen
 from institutions.models import Institution
 from projects.models import Project
 from tasks.models import Task, TaskComment, TaskEvidence
@@ -9,10 +10,31 @@ from django.utils import timezone
 
 User = get_user_model()
 
+
+def first_or_create(model, defaults=None, **lookup):
+    """get_or_create() that tolerates the duplicates earlier versions of this command left behind"""
+    instance = model.objects.filter(**lookup).order_by('pk').first()
+    if instance is not None:
+        return instance, False
+    return model.objects.create(**lookup, **(defaults or {})), True
+
+
 class Command(BaseCommand):
-    help = 'Populate database with sample data'
+    help = 'Populate database with sample data, or a generated dataset with --scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=sorted(datagen.SCALES),
+            help='Generate a synthetic dataset of this size instead of the sample data'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for --scale')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert for --scale')
 
     def handle(self, *args, **options):
+        if options['scale']:
+            self.generate(options['scale'], options['seed'], options['batch_size'])
+            return
+
         self.stdout.write('Creating sample data...')
         
         # Create users
@@ -32,20 +54,26 @@ class Command(BaseCommand):
             admin_user.save()
         
         # Create institutions
-        main_campus = Institution.objects.create(
+        main_campus, _ = first_or_create(
+            Institution,
             name='Main Campus',
-            description='Primary institution',
-            address='123 Main St',
-            phone='555-0001',
-            email='main@example.com'
+            defaults={
+                'description': 'Primary institution',
+                'address': '123 Main St',
+                'phone': '555-0001',
+                'email': 'main@example.com'
+            }
         )
         
-        north_branch = Institution.objects.create(
+        north_branch, _ = first_or_create(
+            Institution,
             name='North Branch',
-            description='Northern branch office',
-            address='456 North Ave',
-            phone='555-0002',
-            email='north@example.com'
+            defaults={
+                'description': 'Northern branch office',
+                'address': '456 North Ave',
+                'phone': '555-0002',
+                'email': 'north@example.com'
+            }
         )
         
         # Create supervisors
@@ -114,67 +142,83 @@ class Command(BaseCommand):
             sarah_employee.save()
         
         # Create projects
-        project1 = Project.objects.create(
+        project1, _ = first_or_create(
+            Project,
             title='Community Outreach Program',
-            description='Establishing community centers in underserved areas',
             created_by=admin_user,
-            status='active',
-            start_date=timezone.now().date()
+            defaults={
+                'description': 'Establishing community centers in underserved areas',
+                'status': 'active',
+                'start_date': timezone.now().date()
+            }
         )
         
         # Create tasks
-        task1 = Task.objects.create(
+        task1, _ = first_or_create(
+            Task,
             project=project1,
             title='Site Assessment',
-            description='Evaluate potential locations for community centers',
-            assignee=tom_employee,
-            institution=main_campus,
-            status='completed',
-            progress=100,
-            due_date=timezone.now() + timedelta(days=30)
+            defaults={
+                'description': 'Evaluate potential locations for community centers',
+                'assignee': tom_employee,
+                'institution': main_campus,
+                'status': 'completed',
+                'progress': 100,
+                'due_date': timezone.now() + timedelta(days=30)
+            }
         )
         
-        task2 = Task.objects.create(
+        task2, _ = first_or_create(
+            Task,
             project=project1,
             title='Permit Applications',
-            description='Submit necessary permits and documentation',
-            assignee=sarah_employee,
-            institution=north_branch,
-            status='in_progress',
-            progress=65,
-            due_date=timezone.now() + timedelta(days=45)
+            defaults={
+                'description': 'Submit necessary permits and documentation',
+                'assignee': sarah_employee,
+                'institution': north_branch,
+                'status': 'in_progress',
+                'progress': 65,
+                'due_date': timezone.now() + timedelta(days=45)
+            }
         )
         
         # Create comments
-        TaskComment.objects.create(
+        first_or_create(
+            TaskComment,
             task=task1,
             author=tom_employee,
             content='Site assessment completed. Found 3 viable locations.'
         )
         
-        TaskComment.objects.create(
+        first_or_create(
+            TaskComment,
             task=task2,
             author=sarah_employee,
             content='Permits submitted to city planning office. Waiting for approval.'
         )
         
         # Create evidence
-        TaskEvidence.objects.create(
+        first_or_create(
+            TaskEvidence,
             task=task1,
             file_name='site_assessment_report.pdf',
-            file_type='document',
-            description='Detailed site assessment report',
-            uploaded_by=tom_employee
+            defaults={
+                'file_type': 'document',
+                'description': 'Detailed site assessment report',
+                'uploaded_by': tom_employee
+            }
         )
         
         # Create chat messages
-        ChatMessage.objects.create(
+        first_or_create(
+            ChatMessage,
             sender=admin_user,
             content='Welcome everyone to the Hesed Events platform!',
             chat_type='group'
         )
         
-        ChatMessage.objects.create(
+        first_or_create(
+            ChatMessage,
             sender=jane_supervisor,
             recipient=tom_employee,
             content='Great work on the site assessment!',
@@ -184,3 +228,17 @@ class Command(BaseCommand):
         self.stdout.write(
             self.style.SUCCESS('Successfully created sample data')
         )
+
+
+    def generate(self, scale, seed, batch_size):
+        prefix = datagen.username_prefix(seed)
+        if User.objects.filter(username=f'{prefix}admin').exists():
+            raise CommandError(f'Data for seed {seed} already exists, pick another --seed')
+
+        self.stdout.write(f'Generating {scale} dataset with seed {seed}...')
+        summary = datagen.generate(scale, seed=seed, batch_size=batch_size, log=self.stdout.write)
+        counts = ', '.join(f'{count} {model}' for model, count in summary['counts'].items())
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated {counts} in {summary['seconds']}s")
+        )
+        self.stdout.write(f'Log in as {prefix}admin with password {datagen.DEFAULT_PASSWORD}')
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -21,6 +22,16 @@ class User(AbstractUser):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Position in the change sequence, see sync/signals.py
+    sync_version = models.BigIntegerField(default=0, db_index=True, editable=False)
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive prefix search for the user directory
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            models.Index(Lower('first_name'), Lower('last_name'), name='user_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from core.fastread import Computed, ValuesSerializer, full_name
 from .models import User
 
 class UserSerializer(serializers.ModelSerializer):
@@ -15,6 +16,16 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'date_joined']
 
+class UserValuesSerializer(ValuesSerializer):
+    """values()-based ``UserSerializer`` for list responses"""
+    serializer_class = UserSerializer
+    computed = {
+        'full_name': Computed(
+            ['first_name', 'last_name', 'username'],
+            lambda row, context: full_name(row['first_name'], row['last_name'], row['username']),
+        ),
+    }
+
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     
@@ -26,11 +37,8 @@ class UserCreateSerializer(serializers.ModelSerializer):
         ]
     
     def create(self, validated_data):
-        password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # create_user hashes the password, so this is a single insert
+        return User.objects.create_user(**validated_data)
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
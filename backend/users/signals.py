@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from institutions.models import Institution
+from .authentication import invalidate_user, user_version
+from .directory import bump_directory_version
+from .models import User
+
+
+def _invalidate_on_commit(user_id, version, is_active=False, using=None):
+    # Until the transaction commits, a request could reload and cache the old row
+    transaction.on_commit(partial(invalidate_user, user_id, version, is_active), using=using)
+    transaction.on_commit(bump_directory_version, using=using)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, using=None, **kwargs):
+    # Logins only touch last_login, which is not part of the token claims
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    _invalidate_on_commit(instance.pk, user_version(instance), instance.is_active, using=using)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, using=None, **kwargs):
+    _invalidate_on_commit(instance.pk, 'deleted', using=using)
+
+
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+def institution_changed(sender, using=None, **kwargs):
+    # Directory entries include the institution name
+    transaction.on_commit(bump_directory_version, using=using)
@@ -1,3 +1,289 @@
-from django.test import TestCase
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from core.benchmarks import EndpointBenchmarkMixin
+from core.fastread import ValuesSerializer
+from core.routers import ReplicaRoutingMiddleware
+from institutions.models import Institution
+from projects.models import Project
+from .authentication import VERSION_KEY, ClaimsJWTAuthentication, user_cache, user_version
+from .bulk_import import POOL_THRESHOLD
+from .directory import search_users
+from .models import User
+from .serializers import UserSerializer, UserValuesSerializer
+from .views import CustomTokenObtainPairSerializer
+
+
+class UserEndpointBenchmark(EndpointBenchmarkMixin, TestCase):
+    def test_user_list(self):
+        self.benchmark('/api/users/', budget=2, name='users-list')
+
+    def test_user_detail(self):
+        self.benchmark(f"/api/users/{self.data['employee'].pk}/", budget=2, name='users-detail')
+
+    def test_user_directory(self):
+        self.benchmark('/api/users/directory/?q=a', budget=1, name='users-directory')
+
+    def test_current_user(self):
+        self.benchmark('/api/auth/user/', budget=1, name='auth-user')
+
+    def test_dashboard_stats_admin(self):
+        self.benchmark('/api/auth/dashboard-stats/', budget=4, name='dashboard-stats-admin')
+
+    def test_dashboard_stats_supervisor(self):
+        self.benchmark('/api/auth/dashboard-stats/', budget=4, user=self.data['supervisor'], name='dashboard-stats-supervisor')
+
+    def test_dashboard_stats_employee(self):
+        self.benchmark('/api/auth/dashboard-stats/', budget=4, user=self.data['employee'], name='dashboard-stats-employee')
+
+    def test_dashboard_stats_observer(self):
+        self.benchmark('/api/auth/dashboard-stats/', budget=3, user=self.data['observer'], name='dashboard-stats-observer')
+
+    def test_reports(self):
+        self.benchmark('/api/auth/reports/', budget=8, name='reports-admin')
+
+
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user('claims', password='secret', role='supervisor')
+
+    def get(self, token, path='/api/auth/dashboard-stats/'):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def authenticate(self, token):
+        auth = ClaimsJWTAuthentication()
+        return auth.get_user(auth.get_validated_token(str(token)))
+
+    def test_request_user_built_from_claims(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.authenticate(token)
+        with self.assertNumQueries(0):
+            request_user = self.authenticate(token)
+        self.assertEqual(request_user.pk, self.user.pk)
+        self.assertEqual(request_user.role, 'supervisor')
+
+    def test_role_change_is_picked_up(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.assertEqual(self.authenticate(token).role, 'supervisor')
+        self.user.role = 'employee'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.authenticate(token).role, 'employee')
+
+    def test_versions_change_when_the_save_commits(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.authenticate(token)
+        self.user.role = 'employee'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+        # Until the commit, other connections still read the old row
+        self.assertEqual(self.authenticate(token).role, 'supervisor')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.authenticate(token).role, 'employee')
+
+    def test_deactivated_user_is_rejected(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.assertEqual(self.get(token).status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.get(token).status_code, 401)
+
+    def test_changes_missed_by_this_worker_expire(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.authenticate(token)
+        # Deactivated where this process's cache did not see it
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.authenticate(token).pk, self.user.pk)
+        later = time.time() + settings.CLAIMS_AUTH['VERSION_TTL'] + 1
+        with mock.patch('time.time', return_value=later), \
+                mock.patch('time.monotonic', return_value=time.monotonic() + settings.CLAIMS_AUTH['VERSION_TTL'] + 1):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(token)
+
+    @override_settings(DB_REPLICAS={'ALIASES': ['replica']})
+    def test_stale_tokens_read_the_primary(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.user.role = 'employee'
+        self.user.save()
+        users = []
+
+        def view(request):
+            # The 'replica' alias does not exist: reading it would raise
+            users.append(self.authenticate(token))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(RequestFactory().get('/api/projects/'))
+        self.assertEqual(users[0].role, 'employee')
+        self.assertEqual(cache.get(VERSION_KEY.format(self.user.pk)), (user_version(self.user), True))
+
+    def test_async_authentication_reads_the_cache_asynchronously(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.authenticate(token)
+        user_cache.clear()
+        request = RequestFactory().get('/api/auth/dashboard-stats/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        shared = mock.Mock(wraps=cache)
+        with mock.patch('users.authentication.cache', shared), self.assertNumQueries(0):
+            user, _ = async_to_sync(ClaimsJWTAuthentication().aauthenticate)(request)
+        self.assertEqual(user.role, 'supervisor')
+        # A blocking get() would stall the event loop on a network cache
+        shared.get.assert_not_called()
+        shared.aget.assert_called_once_with(VERSION_KEY.format(self.user.pk))
+
+
+class UserDirectoryTests(TestCase):
+    def setUp(self):
+        self.jane = User.objects.create_user('jsmith', first_name='Jane', last_name='Smith', role='employee')
+        self.john = User.objects.create_user('jdoe', first_name='John', last_name='Doe', role='supervisor')
+        User.objects.create_user('gone', first_name='Janet', last_name='Old', is_active=False)
+
+    def names(self, *args, **kwargs):
+        return [user['full_name'] for user in search_users(*args, **kwargs)]
+
+    def test_prefixes_ending_at_the_top_of_unicode(self):
+        User.objects.create_user('edge', first_name='Ed\U0010ffff', last_name='Ge\ud7ffx')
+        self.assertEqual(self.names('ed\U0010ffff'), ['Ed\U0010ffff Ge\ud7ffx'])
+        self.assertEqual(self.names('ed ge\ud7ff'), ['Ed\U0010ffff Ge\ud7ffx'])
+        self.assertEqual(self.names('\U0010ffff'), [])
+
+    def test_prefix_search(self):
+        self.assertEqual(self.names('ja'), ['Jane Smith'])
+        self.assertEqual(self.names('SMI'), ['Jane Smith'])
+        self.assertEqual(self.names('jd'), ['John Doe'])
+        self.assertEqual(self.names('jane sm'), ['Jane Smith'])
+        self.assertEqual(self.names('j', role='supervisor'), ['John Doe'])
+
+    def test_other_collations_fall_back_to_like(self):
+        with mock.patch('users.directory._sorts_by_code_point', return_value=False), \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.names('jane sm'), ['Jane Smith'])
+            self.assertEqual(self.names('jd'), ['John Doe'])
+        self.assertIn(' LIKE ', queries[0]['sql'])
+        self.assertNotIn(' < ', queries[0]['sql'])
+
+    def test_results_are_cached_until_users_change(self):
+        self.names('jo')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('jo'), ['John Doe'])
+        self.john.first_name = 'Zed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.john.save()
+        self.assertEqual(self.names('jo'), [])
+
+
+class ValuesSerializerTests(EndpointBenchmarkMixin, TestCase):
+    def test_output_matches_the_model_serializer(self):
+        User.objects.create_user('nameless', role='observer')
+        queryset = User.objects.select_related('institution').order_by('pk')
+        expected = UserSerializer(queryset, many=True).data
+        actual = UserValuesSerializer.render(UserValuesSerializer.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoint_matches(self):
+        client = self.client_for(self.data['admin'])
+        fast = client.get('/api/users/')
+        with override_settings(FAST_READ={'ENABLED': False}):
+            slow = client.get('/api/users/')
+        self.assertEqual(fast.content, slow.content)
+
+    def test_properties_must_be_declared(self):
+        class Incomplete(ValuesSerializer):
+            serializer_class = UserSerializer
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "'full_name' reads 'full_name'"):
+            Incomplete.plan()
+
+
+class PopulateDataTests(TestCase):
+    def test_sample_data_can_be_loaded_again(self):
+        # Earlier versions created the institutions on every run
+        for _ in range(2):
+            Institution.objects.create(name='Main Campus')
+        for _ in range(2):
+            call_command('populate_data', stdout=StringIO())
+        self.assertEqual(Institution.objects.filter(name='Main Campus').count(), 2)
+        self.assertEqual(Institution.objects.filter(name='North Branch').count(), 1)
+        self.assertEqual(Project.objects.count(), 1)
+        self.assertEqual(User.objects.get(username='jane').institution, Institution.objects.filter(name='Main Campus').first())
+
+
+# Fast hashing: the tests are about the import, not the hasher
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserImportTests(TestCase):
+    def setUp(self):
+        self.institution = Institution.objects.create(name='Alpha')
+        self.admin = User.objects.create_user('boss', role='admin')
+        self.client.force_login(self.admin)
+
+    def post(self, rows, **params):
+        return self.client.post(f'/api/users/import/?{urlencode(params)}', rows, content_type='application/json')
+
+    def test_valid_rows_are_created_and_invalid_rows_reported(self):
+        rows = [
+            {'username': 'ann', 'password': 'secret-1', 'role': 'employee', 'institution': self.institution.pk},
+            {'username': 'boss', 'password': 'secret-2'},
+            {'username': 'bob', 'password': 'secret-3', 'institution': 999},
+            {'username': 'ann', 'password': 'secret-4'},
+            {'username': 'cy', 'password': 'secret-5', 'role': 'supervisor'},
+        ]
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 201)
+        result = response.json()
+        self.assertEqual((result['total'], result['created']), (5, 2))
+        self.assertEqual([(error['row'], list(error['errors'])) for error in result['errors']], [
+            (2, ['username']), (3, ['institution']), (4, ['username']),
+        ])
+        ann = User.objects.get(username='ann')
+        self.assertEqual((ann.role, ann.institution), ('employee', self.institution))
+        self.assertTrue(ann.check_password('secret-1'))
+
+    def test_dry_run_only_validates(self):
+        result = self.post([{'username': 'ann', 'password': 'secret-1'}], dry_run='true').json()
+        self.assertEqual((result['valid'], result['created']), (1, 0))
+        self.assertFalse(User.objects.filter(username='ann').exists())
+
+    @override_settings(USER_IMPORT_MAX_ROWS=2)
+    def test_large_imports_go_through_the_command(self):
+        rows = [{'username': f'user{n}', 'password': 'secret'} for n in range(3)]
+        response = self.post(rows)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('import_users', response.json()['detail'])
+
+    def test_only_administrators_import(self):
+        self.client.force_login(User.objects.create_user('worker', role='employee'))
+        self.assertEqual(self.post([{'username': 'ann', 'password': 'secret'}]).status_code, 403)
+
+    @override_settings(USER_IMPORT_WORKERS=4)
+    def test_requests_hash_on_threads(self):
+        rows = [{'username': f'user{n}', 'password': f'secret-{n}'} for n in range(POOL_THRESHOLD)]
+        # Forking from a threaded server would copy locks held by other threads
+        with mock.patch('concurrent.futures.ProcessPoolExecutor', side_effect=AssertionError('forked')):
+            self.assertEqual(self.post(rows).json()['created'], POOL_THRESHOLD)
+        for n, user in enumerate(User.objects.filter(username__startswith='user').order_by('pk')):
+            self.assertTrue(user.check_password(f'secret-{n}'))
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as source:
+            source.write('username,password,role\nann,secret-1,employee\nboss,secret-2,admin\n')
+            source.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_users', source.name, stdout=out, stderr=err)
+        self.assertIn('Created 1 of 2 users (1 rejected)', out.getvalue())
+        self.assertIn('Row 2: username', err.getvalue())
+        self.assertTrue(User.objects.get(username='ann').check_password('secret-1'))
@@ -1,20 +1,37 @@
 from django.shortcuts import render
 from rest_framework import status, viewsets, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
+from core.fastread import FastListMixin
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth import authenticate
+from activity.views import activity_feed
+from .authentication import add_user_claims
+from .bulk_import import import_users, read_rows
+from .directory import search_users
 from .models import User
-from .serializers import UserSerializer, UserCreateSerializer
+from .serializers import UserSerializer, UserCreateSerializer, UserValuesSerializer
+from datetime import timedelta
 from django.db.models import Count, Q
-from projects.models import Project
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from core.async_views import async_api_view, gather_queries, json_response
+from projects.access import scope_to_user
+from projects.models import Project, ProjectAccess
 from tasks.models import Task
 from institutions.models import Institution
 
 # Create your views here.
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Role, institution and version claims let ClaimsJWTAuthentication skip the user query
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         # Add user data to the response
@@ -27,11 +44,14 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def current_user_view(request):
-    serializer = UserSerializer(request.user)
+    # request.user may only carry the token claims, load the full row
+    user = User.objects.select_related('institution').get(pk=request.user.pk)
+    serializer = UserSerializer(user)
     return Response(serializer.data)
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserViewSet(FastListMixin, viewsets.ModelViewSet):
+    queryset = User.objects.select_related('institution')
+    values_serializer_class = UserValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_serializer_class(self):
@@ -39,61 +59,197 @@ class UserViewSet(viewsets.ModelViewSet):
             return UserCreateSerializer
         return UserSerializer
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def dashboard_stats_view(request):
+    @action(detail=False, methods=['get'])
+    def directory(self, request):
+        """Compact active-user list with prefix search (?q=, ?role=, ?institution=, ?limit=)"""
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            institution = request.query_params.get('institution')
+            institution = int(institution) if institution else None
+        except ValueError:
+            return Response({'detail': 'limit and institution must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        results = search_users(
+            request.query_params.get('q', ''),
+            role=request.query_params.get('role'),
+            institution=institution,
+            limit=limit,
+        )
+        return Response(results)
+
+    @action(detail=True, methods=['get'])
+    def activity(self, request, pk=None):
+        """Changes made by the user, newest first"""
+        return activity_feed(request, actor_id=self.get_object().pk)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, JSONParser])
+    def bulk_import(self, request):
+        """Create many users from an uploaded CSV/JSON file or a JSON list"""
+        if request.user.role != 'admin' and not request.user.is_staff:
+            return Response({'detail': 'Only administrators can import users.'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        try:
+            if upload is not None:
+                fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+                rows = read_rows(upload.read(), fmt)
+            elif isinstance(request.data, list):
+                rows = request.data
+            else:
+                rows = request.data.get('users', [])
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'detail': f'Could not read import: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = settings.USER_IMPORT_MAX_ROWS
+        if len(rows) > limit:
+            return Response(
+                {'detail': f'Imports are limited to {limit} users per request; use manage.py import_users for larger files.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        dry_run = request.query_params.get('dry_run') in ('1', 'true')
+        result = import_users(rows, dry_run=dry_run)
+        if dry_run:
+            return Response(result)
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST)
+
+# Look-back of the Reports page periods, in days
+REPORT_PERIODS = {'week': 7, 'month': 30, 'quarter': 90, 'year': 365}
+
+
+def completion_rate(completed, total):
+    """Whole percent, rounded half up like the frontend's Math.round"""
+    return (200 * completed + total) // (2 * total) if total else 0
+
+
+def visible_institutions(user):
+    """Institutions the dashboard and Reports page show ``user``"""
+    if user.role == 'admin':
+        return Institution.objects.all()
+    if user.role in ['supervisor', 'employee']:
+        return Institution.objects.filter(supervisor=user)
+    # Observers: empty without a query
+    return Institution.objects.none()
+
+
+def task_totals(tasks):
+    return tasks.aggregate(
+        total=Count('pk'),
+        completed=Count('pk', filter=Q(status='completed')),
+        in_progress=Count('pk', filter=Q(status='in_progress')),
+    )
+
+
+def task_counts_by(tasks, field):
+    """``{field value: (total, completed)}`` over ``tasks``"""
+    rows = tasks.values(field).annotate(
+        total=Count('pk'),
+        completed=Count('pk', filter=Q(status='completed')),
+    ).order_by()
+    return {row[field]: (row['total'], row['completed']) for row in rows}
+
+
+def tasks_per_week(tasks, field):
+    """``{monday: count}`` of ``tasks`` by the week of their ``field``"""
+    rows = tasks.annotate(week=TruncWeek(field)).values('week').annotate(count=Count('pk')).order_by()
+    return {row['week'].date().isoformat(): row['count'] for row in rows}
+
+
+@async_api_view
+async def dashboard_stats_view(request):
     """Get dashboard statistics for the current user"""
     user = request.user
-    
-    # Get counts based on user role
+
+    # Querysets based on user role
     if user.role == 'admin':
-        total_projects = Project.objects.count()
-        total_tasks = Task.objects.count()
-        institutions_count = Institution.objects.count()
-        completed_tasks = Task.objects.filter(status='completed').count()
-        in_progress_tasks = Task.objects.filter(status='in_progress').count()
+        projects = Project.objects.all()
+        tasks = Task.objects.all()
     elif user.role in ['supervisor', 'employee']:
-        # Filter by user's created projects and tasks assigned to user
-        user_created_projects = Project.objects.filter(created_by=user)
-        user_assigned_tasks = Task.objects.filter(assignee=user)
-        user_projects_from_tasks = Project.objects.filter(tasks__assignee=user).distinct()
-        
-        # Combine projects created by user and projects with tasks assigned to user
-        user_projects = user_created_projects.union(user_projects_from_tasks)
-        total_projects = user_projects.count()
-        
-        # Get all tasks assigned to user or in projects created by user
-        user_tasks = Task.objects.filter(
-            Q(assignee=user) | Q(project__created_by=user)
-        ).distinct()
-        total_tasks = user_tasks.count()
-        completed_tasks = user_tasks.filter(status='completed').count()
-        in_progress_tasks = user_tasks.filter(status='in_progress').count()
-        
-        institutions_count = Institution.objects.filter(supervisor=user).count()
+        # Projects created by the user or with tasks assigned to the user,
+        # kept up to date in ProjectAccess
+        projects = ProjectAccess.objects.filter(user=user)
+        # Tasks assigned to user or in projects created by user
+        # (each task has one project, so the join can't produce duplicates)
+        tasks = Task.objects.filter(Q(assignee=user) | Q(project__created_by=user))
     else:  # observer
         # Read-only access to limited data
-        total_projects = Project.objects.count()
-        total_tasks = Task.objects.count()
-        completed_tasks = Task.objects.filter(status='completed').count()
-        in_progress_tasks = Task.objects.filter(status='in_progress').count()
-        institutions_count = 0
-    
+        projects = Project.objects.all()
+        tasks = Task.objects.all()
+    institutions = visible_institutions(user)
+
+    # Independent queries, each on its own connection
+    totals, total_projects, institutions_count, active_users = await gather_queries(
+        lambda: task_totals(tasks),
+        projects.count,
+        institutions.count,
+        User.objects.filter(is_active=True).count,
+    )
+
     # Calculate overdue tasks (simplified)
     overdue_tasks = 0  # Would need to implement date comparison
-    
-    # Active users count
-    from users.models import User
-    active_users = User.objects.filter(is_active=True).count()
-    
-    stats = {
+
+    return {
         'totalProjects': total_projects,
-        'totalTasks': total_tasks,
-        'completedTasks': completed_tasks,
-        'inProgressTasks': in_progress_tasks,
+        'totalTasks': totals['total'],
+        'completedTasks': totals['completed'],
+        'inProgressTasks': totals['in_progress'],
         'overdueTask': overdue_tasks,
         'institutionsCount': institutions_count,
         'activeUsers': active_users,
     }
-    
-    return Response(stats)
+
+
+@async_api_view
+async def reports_view(request):
+    """
+    Figures for the Reports page over the projects the user can see: task
+    completion overall, per institution (those on the user's dashboard) and
+    per project, and tasks started and completed per week of ?period= (week,
+    month, quarter or year)
+    """
+    period = request.GET.get('period', 'month')
+    if period not in REPORT_PERIODS:
+        return json_response(
+            {'period': [f'Choose one of {", ".join(REPORT_PERIODS)}.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    since = timezone.now() - timedelta(days=REPORT_PERIODS[period])
+    user = request.user
+    projects = scope_to_user(Project.objects.all(), user)
+    tasks = scope_to_user(Task.objects.all(), user, 'project')
+
+    # Independent queries, each on its own connection
+    (
+        totals, active_projects, institutions, by_institution, project_rows, by_project, started, completed,
+    ) = await gather_queries(
+        lambda: task_totals(tasks),
+        projects.filter(status='active').count,
+        lambda: list(visible_institutions(user).order_by('name').values_list('pk', 'name')),
+        lambda: task_counts_by(tasks, 'institution'),
+        lambda: list(projects.values_list('pk', 'title', 'status')),
+        lambda: task_counts_by(tasks, 'project'),
+        lambda: tasks_per_week(tasks.filter(created_at__gte=since), 'created_at'),
+        # Tasks have no completion time; a completed task was last saved when it was completed
+        lambda: tasks_per_week(tasks.filter(status='completed', updated_at__gte=since), 'updated_at'),
+    )
+
+    def progress(total, done):
+        return {'totalTasks': total, 'completedTasks': done, 'completionRate': completion_rate(done, total)}
+
+    return {
+        'period': period,
+        'since': since,
+        **progress(totals['total'], totals['completed']),
+        'activeProjects': active_projects,
+        'institutions': [
+            {'id': pk, 'name': name, **progress(*by_institution.get(pk, (0, 0)))}
+            for pk, name in institutions
+        ],
+        'projects': [
+            {'id': pk, 'title': title, 'status': project_status, **progress(*by_project.get(pk, (0, 0)))}
+            for pk, title, project_status in project_rows
+        ],
+        'weeklyProgress': [
+            {'week': week, 'started': started.get(week, 0), 'completed': completed.get(week, 0)}
+            for week in sorted(started.keys() | completed.keys())
+        ],
+    }